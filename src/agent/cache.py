@@ -0,0 +1,248 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.tools.text import normalize_text
+
+# Números y códigos de curso: si difieren, dos preguntas nunca son "la misma"
+# aunque los embeddings sean casi iguales ("créditos de BMA02" vs "BMA03")
+_LITERALS_RE = re.compile(r"\b\w*\d\w*\b")
+# normalize_text quita los operadores: "20 + 5" y "20 - 5" quedarían iguales
+_EXPRESSION_RE = re.compile(r"[\d+\-*/^%.,()]")
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    query: str
+    route: str
+    response: str
+    trace_steps: list
+    latency: float
+    created: float
+    literals: frozenset
+    context_hash: str = None
+    vector: np.ndarray = None
+    hits: int = 0
+
+
+@dataclass
+class CacheHit:
+    entry: CacheEntry
+    kind: str  # "exact" | "semantic"
+    similarity: float = 1.0
+    info: dict = field(default_factory=dict)
+
+
+class ResponseCache:
+    """
+    Cache de respuestas del agente delante de AgentEngine.run.
+
+    - Tier exacto: llave = herramienta + normalize_text(query) (minúsculas,
+      sin tildes ni puntuación) + la secuencia de dígitos y operadores si la
+      query tiene números, válido para cualquier herramienta.
+    - Tier semántico (opcional, `embed` != None): coseno entre embeddings
+      MiniLM de la query y de las entradas cacheadas, solo para preguntas que
+      van al RAG, con los mismos números/códigos y para las que la
+      recuperación devolvió exactamente el mismo contexto. Se consulta
+      después de correr la herramienta (milisegundos) y evita la generación
+      del LLM, que es lo caro. Así "ciclo de Cálculo Integral" nunca reutiliza
+      la respuesta de "ciclo de Cálculo Diferencial" aunque los embeddings
+      estén muy cerca. La calculadora no se reutiliza por similitud.
+    - Las rutas de `uncached_routes` (la verificación) no se cachean: su
+      respuesta depende del historial del alumno, que cambia sin que cambie
+      la pregunta.
+
+    Las entradas expiran a los `ttl` segundos, se descartan por LRU al pasar
+    de `capacity` y todo el cache se vacía cuando cambia `version` (p. ej.
+    rag.index_version tras reindexar los PDFs).
+    """
+
+    def __init__(
+        self,
+        capacity=512,
+        ttl=3600.0,
+        embed=None,
+        threshold=0.92,
+        semantic_routes=("rag",),
+        uncached_routes=("verification",),
+        clock=time.monotonic,
+    ):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.embed = embed
+        self.threshold = threshold
+        self.semantic_routes = set(semantic_routes)
+        self.uncached_routes = set(uncached_routes)
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = None
+        self.counters = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "saved_latency_s": 0.0,
+        }
+
+    def key(self, query: str, route: str) -> str:
+        key = f"{route}|{normalize_text(query)}"
+        if any(ch.isdigit() for ch in query):
+            key += "|" + "".join(_EXPRESSION_RE.findall(query))
+        return key
+
+    def cacheable(self, plan) -> bool:
+        """False si alguna herramienta del plan no se cachea."""
+        return self.uncached_routes.isdisjoint(plan)
+
+    def check_version(self, version):
+        """
+        Vacía el cache si cambió la versión del índice. Mientras el índice no
+        ha cargado la versión es None y, al conocerse, se adopta sin vaciar.
+        """
+        with self._lock:
+            if version == self.version:
+                return
+            if self.version is not None and self._entries:
+                self.counters["invalidations"] += 1
+                self._entries.clear()
+            self.version = version
+
+    def lookup(self, query: str, route: str):
+        """Tier exacto: CacheHit o None. `route` = herramienta que respondería."""
+        if not self.cacheable([route]):
+            return None
+        key = self.key(query, route)
+        with self._lock:
+            self._expire(self.clock())
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._hit(entry, "exact", 1.0)
+        if not self._semantic_enabled(route):
+            self._count_miss()
+        return None
+
+    def lookup_semantic(self, query: str, route: str, context: str):
+        """Tier semántico, con el contexto ya recuperado para esta query."""
+        if not self._semantic_enabled(route):
+            return None
+        literals = _literals(normalize_text(query))
+        context_hash = _hash(context)
+        with self._lock:
+            self._expire(self.clock())
+            candidates = [
+                e
+                for e in self._entries.values()
+                if e.route == route
+                and e.vector is not None
+                and e.context_hash == context_hash
+                and e.literals == literals
+            ]
+        if not candidates:
+            return self._count_miss()
+
+        q_vec = self._embed(query)
+        sims = np.vstack([e.vector for e in candidates]) @ q_vec
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return self._count_miss()
+        with self._lock:
+            # Pudo expirar o salir por LRU mientras se calculaba el embedding
+            if self._entries.get(candidates[best].key) is not candidates[best]:
+                self.counters["misses"] += 1
+                return None
+            return self._hit(candidates[best], "semantic", float(sims[best]))
+
+    def store(
+        self, query: str, route: str, response: str, trace_steps, latency, context=None
+    ):
+        if not self.cacheable([route]):
+            return
+        key = self.key(query, route)
+        vector = None
+        if self._semantic_enabled(route) and context is not None:
+            vector = self._embed(query)
+        entry = CacheEntry(
+            key=key,
+            query=query,
+            route=route,
+            response=response,
+            trace_steps=trace_steps,
+            latency=latency,
+            created=self.clock(),
+            literals=_literals(normalize_text(query)),
+            context_hash=None if context is None else _hash(context),
+            vector=vector,
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def record_saving(self, hit: CacheHit, latency: float):
+        """Latencia ahorrada por un hit = latencia original - la del hit."""
+        saved = max(0.0, hit.entry.latency - latency)
+        with self._lock:
+            self.counters["saved_latency_s"] += saved
+        hit.info = {
+            "hit": hit.kind,
+            "similarity": round(hit.similarity, 4),
+            "cached_query": hit.entry.query,
+            "saved_latency_seconds": round(saved, 4),
+            "hit_rate": round(self.stats()["hit_rate"], 4),
+        }
+        return hit.info
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+            out["entries"] = len(self._entries)
+        hits = out["exact_hits"] + out["semantic_hits"]
+        total = hits + out["misses"]
+        out["hit_rate"] = hits / total if total else 0.0
+        return out
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _embed(self, query):
+        vec = np.asarray(self.embed(query), dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _expire(self, now):
+        if self.ttl is None:
+            return
+        stale = [k for k, e in self._entries.items() if now - e.created > self.ttl]
+        for k in stale:
+            del self._entries[k]
+
+    def _hit(self, entry, kind, similarity):
+        entry.hits += 1
+        self._entries.move_to_end(entry.key)
+        self.counters[f"{kind}_hits"] += 1
+        return CacheHit(entry=entry, kind=kind, similarity=similarity)
+
+    def _semantic_enabled(self, route):
+        return self.embed is not None and route in self.semantic_routes
+
+    def _count_miss(self):
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def _literals(normalized_query: str) -> frozenset:
+    return frozenset(_LITERALS_RE.findall(normalized_query))
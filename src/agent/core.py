@@ -1,65 +1,386 @@
-import re
+import contextvars
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from src.agent.cache import ResponseCache
+from src.agent.registry import ToolRegistry
+from src.agent.router import IntentClassifier, Router
+from src.config import Config
+from src.query import QueryIntent
+from src.utils import tracing
 from src.utils.logger import AgentLogger
 
 
 class AgentEngine:
-    def __init__(self, llm_service, tools: list):
+    def __init__(self, llm_service, tools, cache=None, router=None):
+        """
+        `tools` es una lista de herramientas ya construidas o un ToolRegistry
+        con componentes que cargan en segundo plano; `llm_service` puede ser
+        un proxy del registro (registry.proxy("llm")).
+        """
         self.llm = llm_service
-        self.tools = {t.name: t for t in tools}
+        self.tools = tools if isinstance(tools, ToolRegistry) else ToolRegistry(tools)
         self.logger = AgentLogger()
+        self.cache = cache if cache is not None else self._default_cache()
+        self.router = router if router is not None else self._default_router()
+        # Pool para los planes con varias herramientas (se crea al primer uso)
+        self._pool = None
+        self._pool_lock = threading.Lock()
 
-    def run(self, query: str):
+    def _default_router(self):
+        course_codes = self._is_course_code if "verification" in self.tools else None
+        if not (Config.ROUTER_CLASSIFIER and "rag" in self.tools):
+            return Router(course_codes=course_codes)
+        # Mismo MiniLM del RAG; los ejemplos se embeben en la primera query
+        return Router(
+            IntentClassifier(
+                self._embed_query, threshold=Config.ROUTER_CLASSIFIER_THRESHOLD
+            ),
+            course_codes=course_codes,
+        )
+
+    def _is_course_code(self, code: str) -> bool:
+        """
+        ¿La verificación conoce `code`? Con VERIFICATION_SOURCE="records" el
+        grafo es el plan de los PDFs (BMA02, CC0A1...). Solo se consulta si
+        la query tiene candidatos a código, y espera a que la herramienta
+        termine de cargar.
+        """
+        try:
+            graph = getattr(self.tools["verification"], "graph", None)
+        except Exception:
+            # Si no cargó, la query sigue por las reglas de siempre
+            return False
+        return graph is not None and code in graph
+
+    def _default_cache(self):
+        if not Config.RESPONSE_CACHE:
+            return None
+        # El RAG se resuelve recién al embeber (después de haberlo usado)
+        semantic = Config.RESPONSE_CACHE_SEMANTIC and "rag" in self.tools
+        return ResponseCache(
+            capacity=Config.RESPONSE_CACHE_SIZE,
+            ttl=Config.RESPONSE_CACHE_TTL_S,
+            embed=self._embed_query if semantic else None,
+            threshold=Config.RESPONSE_CACHE_THRESHOLD,
+        )
+
+    def _embed_query(self, query: str):
+        # Mismos embeddings MiniLM (y mismo LRU de queries) que el RAG
+        return self.tools["rag"].embedding_cache.encode_query(query)[0]
+
+    def run(self, query: str, student_id=None):
+        """
+        Respuesta y latencia de `query`. `student_id`: alumno cuyo historial
+        usa la verificación (StudentStore); sin él, el historial por defecto.
+        """
         start_time = time.time()
-        response, trace_steps = self._execute_explicit_workflow(query)
-        latency = time.time() - start_time
-        self.logger.log_interaction(query, trace_steps, response, latency)
+        trace = self._start_trace("agent.run")
+        with tracing.activate(trace):
+            intent = self._route(query)
+            full_context = None
+            hit = self._cache_lookup(query, intent)
+            if hit is not None:
+                response, trace_steps = hit.entry.response, hit.entry.trace_steps
+            else:
+                response, trace_steps, full_context, hit = (
+                    self._execute_explicit_workflow(query, intent, student_id)
+                )
+            latency = time.time() - start_time
+            cache_info = self._cache_update(
+                query, intent, hit, response, trace_steps, latency, full_context
+            )
+        # Sin streaming el usuario ve la respuesta completa de una vez
+        self.logger.log_interaction(
+            query,
+            self._traced_steps(trace_steps, trace),
+            response,
+            latency,
+            latency,
+            cache=cache_info,
+        )
         return response, latency
 
-    def _execute_explicit_workflow(self, query: str):
+    def run_stream(self, query: str, student_id=None):
+        """
+        Igual que run, pero genera la respuesta como fragmentos de texto a
+        medida que el LLM los produce. Al terminar se registran en el log la
+        latencia total y el time-to-first-token (también quedan en
+        self.last_latency / self.last_ttft).
+        """
+        start_time = time.time()
+        trace = self._start_trace("agent.run_stream")
+        # La traza solo se activa en los tramos sin yield: el consumidor del
+        # generador puede estar en otro contexto entre fragmento y fragmento
+        with tracing.activate(trace):
+            intent = self._route(query)
+            full_context = None
+            hit = self._cache_lookup(query, intent)
+            if hit is not None:
+                trace_steps = hit.entry.trace_steps
+            else:
+                full_context, trace_steps = self._call_tools(query, intent, student_id)
+                hit = self._cache_semantic(query, intent, full_context)
+        if hit is not None:
+            deltas = iter([hit.entry.response])
+        else:
+            deltas = self._stream_llm(query, full_context)
+            if trace is not None:
+                llm_span = tracing.Span("llm", stream=True)
+                trace.children.append(llm_span)
+                deltas = tracing.traced_iter(llm_span, deltas)
+
+        ttft = None
+        parts = []
+        for delta in deltas:
+            if ttft is None:
+                ttft = time.time() - start_time
+            parts.append(delta)
+            yield delta
+
+        response = "".join(parts)
+        latency = time.time() - start_time
+        if hit is None and trace is not None:
+            llm_span.finish()
+        self.last_latency = latency
+        self.last_ttft = latency if ttft is None else ttft
+        with tracing.activate(trace):
+            cache_info = self._cache_update(
+                query, intent, hit, response, trace_steps, latency, full_context
+            )
+        self.logger.log_interaction(
+            query,
+            self._traced_steps(trace_steps, trace),
+            response,
+            latency,
+            self.last_ttft,
+            cache=cache_info,
+        )
+
+    def _start_trace(self, name):
+        return tracing.Trace(name) if Config.TRACING else None
+
+    def _traced_steps(self, trace_steps, trace):
+        """
+        steps_trace del log: los pasos de las herramientas y, al final, el
+        árbol de spans de esta consulta (un hit del cache reusa los pasos de
+        la consulta original, pero la traza es siempre la de esta).
+        """
+        if trace is None:
+            return trace_steps
+        return trace_steps + [{"trace": trace.finish().to_dict()}]
+
+    def _cacheable(self, intent):
+        """Sin cache o con una herramienta que no se cachea en el plan (la
+        verificación depende del historial del alumno, no solo de la
+        pregunta) no se busca ni se guarda nada."""
+        return self.cache is not None and self.cache.cacheable(intent.plan)
+
+    def _cache_lookup(self, query, intent):
+        if not self._cacheable(intent):
+            return None
+        route = intent.route
+        # Si se reindexaron los PDFs, las respuestas del RAG ya no valen. Solo
+        # una pregunta del RAG espera a que el índice termine de cargar.
+        with tracing.span("cache.lookup"):
+            rag = self.tools["rag"] if route == "rag" else self.tools.peek("rag")
+            if rag is not None:
+                self.cache.check_version(getattr(rag, "index_version", None))
+            return self.cache.lookup(query, route)
+
+    def _cache_semantic(self, query, intent, context):
+        """Pregunta parecida ya respondida con este mismo contexto: sin LLM."""
+        if not self._cacheable(intent):
+            return None
+        with tracing.span("cache.semantic"):
+            return self.cache.lookup_semantic(query, intent.route, context)
+
+    def _cache_update(
+        self, query, intent, hit, response, trace_steps, latency, context=None
+    ):
+        """Guarda la respuesta (si fue un miss) y devuelve la info para el log."""
+        if not self._cacheable(intent):
+            return None
+        route = intent.route
+        if hit is not None:
+            return self.cache.record_saving(hit, latency)
+        if response:
+            with tracing.span("cache.store"):
+                self.cache.store(query, route, response, trace_steps, latency, context)
+        return {
+            "hit": None,
+            "saved_latency_seconds": 0.0,
+            "hit_rate": round(self.cache.stats()["hit_rate"], 4),
+        }
+
+    def _stream_llm(self, query, context):
+        # LLMs sin streaming (p. ej. MockLLMService): un solo fragmento
+        if hasattr(self.llm, "stream_response"):
+            yield from self.llm.stream_response(query, context)
+        else:
+            yield self.llm.generate_response(query, context)
+
+    def _context_budget(self, query: str, intent: QueryIntent):
+        """
+        Presupuesto de tokens del LLM para el contexto, para que el RAG no
+        devuelva registros que nunca entrarían al prompt. En un plan con
+        varias herramientas se reserva lugar para las salidas de las demás
+        (corren en paralelo: no se conoce su largo). Los LLMs sin tokenizer
+        (MockLLMService) no ponen límite.
+        """
+        if not hasattr(self.llm, "context_budget"):
+            return {}
+        others = len(intent.plan) - 1
+        reserve = others * Config.TOOL_CONTEXT_RESERVE_TOKENS
+        return {
+            "max_tokens": max(0, self.llm.context_budget(query) - reserve),
+            "count_tokens": self.llm.count_tokens,
+        }
+
+    def _execute_explicit_workflow(
+        self, query: str, intent: QueryIntent, student_id=None
+    ):
+        full_context, trace_steps = self._call_tools(query, intent, student_id)
+
+        hit = self._cache_semantic(query, intent, full_context)
+        if hit is not None:
+            final_answer = hit.entry.response
+        else:
+            # Generar respuesta final usando el contexto de la herramienta seleccionada
+            with tracing.span("llm"):
+                final_answer = self.llm.generate_response(query, full_context)
+
+        return final_answer, trace_steps, full_context, hit
+
+    def _route(self, query: str) -> QueryIntent:
+        """
+        Query parseada una sola vez y herramienta que la va a responder
+        (reglas precompiladas y, si está activo, el clasificador).
+        """
+        with tracing.span("router") as span:
+            intent = self.router.route(query)
+            if span is not None:
+                span.attrs.update(route=intent.route, source=intent.source)
+        return intent
+
+    def _call_tools(self, query: str, intent=None, student_id=None):
+        """
+        Corre las herramientas del plan del router y junta sus salidas (en el
+        orden del plan) en el contexto del LLM. Con una sola herramienta se
+        corre en este hilo; si la query necesita varias (p. ej. verificación
+        + RAG) se corren en paralelo, cada una con su timeout.
+        """
+        # ROUTER EXPLICITO (run ya lo resolvió)
+        if intent is None:
+            intent = self._route(query)
+
+        if len(intent.plan) == 1:
+            tool_output = self._run_tool(intent.route, query, intent, student_id)
+            results = [(intent.route, tool_output, None)]
+        else:
+            results = self._run_plan(query, intent, student_id)
+
         context_messages = []
         trace_steps = []
+        for route, tool_output, failure in results:
+            if failure is not None:
+                # No entra al contexto del LLM, pero queda en el log
+                trace_steps.append(
+                    {"tool": route, "output": tool_output, failure: True}
+                )
+                continue
+            context_messages.append(self._tool_context(route, tool_output))
+            trace_steps.append({"tool": route, "output": tool_output})
 
-        # ROUTER EXPLICITO
-
-        # VERIFICACIÓN: Solo si hay un código de curso explícito
-        course_match = re.search(r"\b[A-Z]{2}\d{3}\b", query.upper())
+        full_context = "\n".join(context_messages)
+        return full_context, trace_steps
 
-        if course_match:
+    def _run_tool(self, route: str, query: str, intent: QueryIntent, student_id=None):
+        if route == "verification":
             print("--> Triggering Verification Tool")
-            tool_output = self.tools["verification"].run(query)
+            with tracing.span("tool.verification"):
+                tool_output = self.tools["verification"].run(
+                    query, intent=intent, student_id=student_id
+                )
             print(f"[DEBUG] Tool Output: {tool_output}")
-            # Limpiamos el output para el LLM
-            context_messages.append(f"{tool_output}")
-            trace_steps.append({"tool": "verification", "output": tool_output})
 
         # CALCULADORA
-        elif "calcular" in query.lower() or re.search(r"\d+\s*[\+\-\*\/]", query):
-            # ... (código existente) ...
+        elif route == "calculator":
             print("--> Triggering Calculator Tool")
-            tool_output = self.tools["calculator"].run(query)
+            with tracing.span("tool.calculator"):
+                tool_output = self.tools["calculator"].run(query, intent=intent)
             print(f"[DEBUG] Tool Output: {tool_output}")
-            context_messages.append(f"El resultado es: {tool_output}")  # Texto simple
-            trace_steps.append({"tool": "calculator", "output": tool_output})
 
         # RAG
         else:
             print("RAG Tool")
 
-            tool_output = self.tools["rag"].run(query, k=3, alpha=0.45)
+            with tracing.span("tool.rag"):
+                tool_output = self.tools["rag"].run(
+                    query,
+                    k=3,
+                    alpha=0.45,
+                    intent=intent,
+                    **self._context_budget(query, intent),
+                )
 
             clean_debug = tool_output.replace("\n", " ")[:150]
             print(f"[DEBUG] Tool Output: {clean_debug}...")
 
-            context_messages.append(tool_output)
-            trace_steps.append({"tool": "rag", "output": tool_output})
+        return tool_output
 
-        full_context = "\n".join(context_messages)
+    def _tool_context(self, route: str, tool_output: str) -> str:
+        """Cómo entra la salida de cada herramienta al contexto del LLM."""
+        if route == "calculator":
+            return f"El resultado es: {tool_output}"  # Texto simple
+        # Limpiamos el output para el LLM
+        return f"{tool_output}"
 
-        # Generar respuesta final usando el contexto de la herramienta seleccionada
-        final_answer = self.llm.generate_response(query, full_context)
+    def _run_plan(self, query: str, intent: QueryIntent, student_id=None):
+        """
+        Herramientas independientes en paralelo: la query cuesta lo que la
+        más lenta y no la suma. Cada una tiene su timeout (TOOL_TIMEOUTS_S),
+        contado desde que se lanza el plan; la que no responde o falla queda
+        como (ruta, mensaje, "timeout" | "error") sin tumbar a las demás. Los
+        componentes se resuelven antes (la carga perezosa del índice no cuenta
+        como timeout).
+        """
+        self.tools.wait(intent.plan)
 
-        # Log
-        self.logger.log_interaction(query, trace_steps, final_answer, 0)
+        with tracing.span("tools.plan", tools=list(intent.plan)):
+            started = time.perf_counter()
+            futures = [
+                # copy_context: los spans de cada herramienta quedan en esta traza
+                self._tool_pool().submit(
+                    contextvars.copy_context().run,
+                    self._run_tool,
+                    route,
+                    query,
+                    intent,
+                    student_id,
+                )
+                for route in intent.plan
+            ]
+            results = []
+            for route, future in zip(intent.plan, futures):
+                timeout = Config.TOOL_TIMEOUTS_S.get(route, Config.TOOL_TIMEOUT_S)
+                remaining = max(0.0, started + timeout - time.perf_counter())
+                try:
+                    results.append((route, future.result(timeout=remaining), None))
+                except FuturesTimeout:
+                    # El hilo sigue hasta terminar; su resultado se descarta
+                    future.cancel()
+                    message = f"Error: {route} no respondió en {timeout:g}s."
+                    results.append((route, message, "timeout"))
+                except Exception as e:
+                    results.append((route, f"Error: {route} falló: {e}", "error"))
+        return results
 
-        return final_answer, trace_steps
+    def _tool_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=Config.TOOL_WORKERS, thread_name_prefix="tool"
+                )
+        return self._pool
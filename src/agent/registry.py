@@ -0,0 +1,147 @@
+import threading
+import time
+from collections.abc import Mapping
+
+
+class LazyComponent:
+    """
+    Un componente (LLM, índice RAG, herramienta) que se construye una sola vez
+    con `factory()`, en un hilo de fondo (`start`) o en el primer `get`. Los
+    imports pesados (torch, transformers, faiss...) van dentro de la factory,
+    así que importar este módulo no los carga.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.instance = None
+        self.error = None
+        self.load_seconds = None
+
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._started = False
+
+    @property
+    def state(self) -> str:
+        if self._done.is_set():
+            return "error" if self.error is not None else "ready"
+        return "loading" if self._started else "pending"
+
+    def start(self):
+        """Empieza a construir el componente en un hilo daemon (idempotente)."""
+        if self._claim():
+            threading.Thread(
+                target=self._build, name=f"warmup-{self.name}", daemon=True
+            ).start()
+
+    def get(self, timeout=None):
+        """Instancia lista; bloquea si se está cargando, la construye si no."""
+        if self._claim():
+            self._build()
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"'{self.name}' sigue cargando tras {timeout}s")
+        if self.error is not None:
+            raise RuntimeError(
+                f"No se pudo cargar '{self.name}': {self.error}"
+            ) from self.error
+        return self.instance
+
+    def peek(self):
+        """Instancia si ya está lista, sin esperar ni disparar la carga."""
+        return self.instance if self.state == "ready" else None
+
+    def _claim(self) -> bool:
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+            return True
+
+    def _build(self):
+        start = time.time()
+        try:
+            self.instance = self.factory()
+        except Exception as e:
+            self.error = e
+        self.load_seconds = time.time() - start
+        self._done.set()
+
+
+class ToolRegistry(Mapping):
+    """
+    Registro perezoso de componentes por nombre. Se comporta como el dict
+    `{tool.name: tool}` que usa AgentEngine, pero `registry["rag"]` solo
+    espera al índice RAG: una pregunta de la calculadora no se bloquea por
+    el RAG aunque este siga cargando en segundo plano.
+
+    `in` y `len` no disparan cargas; `peek(name)` devuelve None si el
+    componente aún no está listo.
+    """
+
+    def __init__(self, tools=()):
+        self._components = {}
+        for tool in tools:
+            self.add(tool)
+
+    def register(self, name, factory):
+        self._components[name] = LazyComponent(name, factory)
+        return self._components[name]
+
+    def add(self, tool, name=None):
+        """Registra una instancia ya construida (p. ej. CalculatorTool())."""
+        component = self.register(name or tool.name, lambda: tool)
+        component.get()
+        return component
+
+    def start(self, names=None):
+        """Carga en paralelo, en hilos de fondo, los componentes indicados."""
+        for name in names or list(self._components):
+            self._components[name].start()
+
+    def wait(self, names=None, timeout=None):
+        """Espera a que terminen de cargar; devuelve status()."""
+        for name in names or list(self._components):
+            component = self._components[name]
+            component.start()
+            component._done.wait(timeout)
+        return self.status()
+
+    def peek(self, name):
+        component = self._components.get(name)
+        return component.peek() if component is not None else None
+
+    def proxy(self, name):
+        """Objeto que delega sus atributos al componente cuando se usan."""
+        return LazyProxy(self._components[name])
+
+    def status(self) -> dict:
+        return {
+            name: {"state": c.state, "load_seconds": c.load_seconds}
+            for name, c in self._components.items()
+        }
+
+    def __getitem__(self, name):
+        return self._components[name].get()
+
+    def __contains__(self, name):
+        return name in self._components
+
+    def __iter__(self):
+        return iter(self._components)
+
+    def __len__(self):
+        return len(self._components)
+
+
+class LazyProxy:
+    """
+    Representa a un componente que todavía puede estar cargando (p. ej. el
+    LLM): el primer acceso a un atributo espera a que esté listo.
+    """
+
+    def __init__(self, component):
+        self._component = component
+
+    def __getattr__(self, attr):
+        return getattr(self._component.get(), attr)
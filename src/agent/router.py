@@ -0,0 +1,165 @@
+import threading
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from src.query import QueryIntent, extract_intent
+
+
+def parse_query(query: str, course_codes=None) -> QueryIntent:
+    """
+    extract_intent + la ruta que eligen las reglas (RULES). `course_codes`
+    (código -> bool) son los códigos que conoce la verificación (p. ej. el
+    plan de estudios cargado de los PDFs): el primer candidato que conoce es
+    el código de curso aunque no tenga la forma del catálogo (BMA02, CC0A1).
+    """
+    intent = extract_intent(query)
+    if course_codes is not None:
+        known = next((c for c in intent.code_candidates if course_codes(c)), None)
+        if known is not None:
+            intent = replace(intent, course_code=known)
+    plan = match_rules(intent)
+    if not plan:
+        return replace(intent, source="default")  # RAG
+    return replace(intent, route=plan[0], plan=plan)
+
+
+# Reglas en orden de prioridad: la primera que se cumple elige la ruta y
+# todas las que se cumplen forman el plan
+RULES = (
+    # VERIFICACIÓN: solo si hay un código de curso explícito
+    ("verification", lambda intent: intent.course_code is not None),
+    # CALCULADORA
+    ("calculator", lambda intent: intent.asks_calculation),
+    # RAG: datos del plan de estudios (y siempre si nada más calzó)
+    ("rag", lambda intent: intent.asks_course_info),
+)
+DEFAULT_ROUTE = "rag"
+
+# Lo que cada ruta necesita encontrar en la query para poder responder: el
+# clasificador no manda a la calculadora una query sin operación
+CAN_ANSWER = {
+    "verification": lambda intent: intent.course_code is not None,
+    "calculator": lambda intent: intent.expression is not None
+    and any(op in intent.expression for op in "+-*/"),
+}
+
+
+def match_rules(intent: QueryIntent) -> tuple:
+    """Rutas de todas las reglas que calzan, en orden de prioridad."""
+    return tuple(route for route, predicate in RULES if predicate(intent))
+
+
+# Ejemplos por ruta para el clasificador por embeddings
+ROUTE_EXAMPLES = {
+    "calculator": [
+        "cuánto es 20 más 5",
+        "multiplica 3 por 3",
+        "divide 20 entre 2",
+        "suma de 15 y 27",
+    ],
+    "verification": [
+        "puedo matricularme en CS202",
+        "cumplo los prerrequisitos de AI301",
+        "estoy habilitado para llevar CS102",
+    ],
+    "rag": [
+        "cuántos créditos tiene Física I",
+        "a qué ciclo pertenece Cálculo Integral",
+        "cuál es el pre-requisito de Base de Datos",
+        "qué cursos hay en el segundo ciclo",
+    ],
+}
+
+
+class IntentClassifier:
+    """
+    Clasificador por embeddings: coseno de la query contra el centroide de
+    los ejemplos de cada ruta. `embed(texto) -> vector` es el MiniLM que ya
+    cargó el RAG; los ejemplos se embeben recién en la primera consulta.
+    """
+
+    def __init__(self, embed, examples=None, threshold=0.5):
+        self.embed = embed
+        self.examples = examples or ROUTE_EXAMPLES
+        self.threshold = threshold
+        self._routes = None
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def predict(self, query: str):
+        """(ruta, coseno) de la ruta más parecida, o (None, coseno) bajo el umbral."""
+        routes, centroids = self._fit()
+        scores = centroids @ self._unit(self.embed(query))
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        return (routes[best] if score >= self.threshold else None), score
+
+    def _fit(self):
+        with self._lock:
+            if self._centroids is None:
+                routes = list(self.examples)
+                centroids = [
+                    self._unit(np.mean([self._unit(self.embed(q)) for q in qs], axis=0))
+                    for qs in self.examples.values()
+                ]
+                self._routes, self._centroids = routes, np.stack(centroids)
+        return self._routes, self._centroids
+
+    def _unit(self, vec):
+        vec = np.asarray(vec, dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+
+class Router:
+    """
+    Router del agente: parse_query + tabla de reglas y, opcionalmente, un
+    IntentClassifier que solo decide las queries que ninguna regla tomó (y
+    solo puede elegir una ruta que tenga con qué responder, CAN_ANSWER). El
+    tiempo de ruteo se mide aparte del de las herramientas (stats()).
+    """
+
+    def __init__(self, classifier=None, course_codes=None):
+        self.classifier = classifier
+        self.course_codes = course_codes
+        self.metrics = {
+            "queries": 0,
+            "classified": 0,
+            "compound": 0,
+            "total_route_s": 0.0,
+        }
+        self.route_counts = {}
+        self._lock = threading.Lock()
+
+    def route(self, query: str) -> QueryIntent:
+        t0 = time.perf_counter()
+        intent = parse_query(query, self.course_codes)
+        classified = False
+        if self.classifier is not None and intent.source == "default":
+            route, _score = self.classifier.predict(query)
+            can_answer = CAN_ANSWER.get(route, lambda intent: True)
+            if route not in (None, DEFAULT_ROUTE) and can_answer(intent):
+                intent = replace(
+                    intent, route=route, plan=(route,), source="classifier"
+                )
+                classified = True
+        elapsed = time.perf_counter() - t0
+
+        with self._lock:
+            self.metrics["queries"] += 1
+            self.metrics["classified"] += int(classified)
+            self.metrics["total_route_s"] += elapsed
+            self.metrics["compound"] += int(len(intent.plan) > 1)
+            for route in intent.plan:
+                self.route_counts[route] = self.route_counts.get(route, 0) + 1
+        return intent
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.metrics)
+            out["routes"] = dict(self.route_counts)
+        queries = out["queries"]
+        out["avg_route_us"] = 1e6 * out["total_route_s"] / queries if queries else 0.0
+        return out
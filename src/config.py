@@ -4,6 +4,18 @@ import os
 class Config:
     # Modelo PreEntrenado
     LLM_MODEL_ID = "google/flan-t5-large"
+    # Backend de inferencia: "torch" (fp32) | "int8" (cuantización dinámica)
+    # | "onnx" (ONNX Runtime con KV-cache, requiere optimum[onnxruntime])
+    LLM_BACKEND = "torch"
+    # Tokens de entrada del encoder (flan-t5 se entrenó con 512): la pregunta
+    # y la plantilla se descuentan y el resto es el presupuesto del contexto
+    LLM_MAX_INPUT_TOKENS = 512
+
+    # Micro-batching de generación: las llamadas concurrentes que llegan dentro
+    # de la ventana se generan juntas (hasta LLM_MAX_BATCH_SIZE prompts)
+    LLM_BATCHING = True
+    LLM_MAX_BATCH_SIZE = 8
+    LLM_BATCH_WAIT_MS = 10
 
     # Modelo de Embeddings
     EMBEDDING_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
@@ -12,7 +24,107 @@ class Config:
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     DATA_PATH = os.path.join(BASE_DIR, "data")
     LOG_DIR = os.path.join(BASE_DIR, "logs")
+    INDEX_DIR = os.path.join(BASE_DIR, "index")
+    EMBEDDING_CACHE_DIR = os.path.join(BASE_DIR, "cache", "embeddings")
+    LLM_ONNX_DIR = os.path.join(BASE_DIR, "cache", "onnx")
+
+    # Ingesta de PDFs: procesos para extract_tables (None = todos los cores)
+    INGEST_WORKERS = None
+    INGEST_PAGES_PER_TASK = 4
 
     # Parámetros RAG
     CHUNK_SIZE = 500
     K_RETRIEVAL = 2
+    # Índice denso: "flat" (exacto) | "ivf_flat" | "hnsw" | "ivf_pq"
+    FAISS_INDEX_TYPE = "flat"
+    FAISS_ANN_MIN_DOCS = 5000  # por debajo se usa flat aunque se pida ANN
+    FAISS_NLIST = 256  # IVF: número de celdas
+    FAISS_NPROBE = 16  # IVF: celdas visitadas por búsqueda
+    FAISS_HNSW_M = 32
+    FAISS_EF_CONSTRUCTION = 80
+    FAISS_EF_SEARCH = 64
+    FAISS_PQ_M = 48  # IVF-PQ: subvectores (debe dividir la dimensión, 384)
+    FAISS_PQ_NBITS = 8
+
+    # Candidatos por lado (dense / sparse) antes de fusionar el ranking híbrido
+    HYBRID_CANDIDATES = 50
+
+    # Snapshot del índice RAG (chunks + embeddings + FAISS + BM25) en INDEX_DIR
+    USE_INDEX_SNAPSHOT = True
+    # Si cambian PDFs, reprocesa solo los archivos nuevos/modificados
+    INCREMENTAL_INDEX = True
+
+    # Cache de embeddings: LRU de queries en memoria + tier de documentos en disco
+    USE_EMBEDDING_CACHE = True
+    QUERY_CACHE_SIZE = 1024
+
+    # Componentes que src/main.py empieza a cargar en segundo plano al
+    # arrancar (el resto se construye en su primer uso)
+    WARMUP_COMPONENTS = ("llm", "rag")
+
+    # Cache de respuestas del agente (llave = query normalizada). El tier
+    # semántico reutiliza respuestas del RAG con similitud coseno >= umbral.
+    RESPONSE_CACHE = True
+    RESPONSE_CACHE_SIZE = 512
+    RESPONSE_CACHE_TTL_S = 3600
+    RESPONSE_CACHE_SEMANTIC = True
+    RESPONSE_CACHE_THRESHOLD = 0.92
+
+    # Servidor HTTP (src/server.py)
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8000
+    SERVER_WORKERS = 4  # consultas en paralelo (hilos del executor)
+    SERVER_MAX_QUEUE = 32  # consultas esperando; más allá se responde 503
+    SERVER_REQUEST_TIMEOUT_S = 120
+    SERVER_IDLE_TIMEOUT_S = 30  # conexiones keep-alive sin actividad
+    SERVER_MAX_BODY_BYTES = 64 * 1024
+    # Modo multi-proceso (pre-fork): workers que comparten el índice RAG
+    SERVER_PROCESSES = 1
+    SERVER_BACKLOG = 256
+    SERVER_STATS_INTERVAL_S = 60  # tabla de memoria por worker en el padre
+
+    # Logger (escritura en segundo plano de logs/execution.jsonl)
+    LOG_QUEUE_SIZE = 10000  # entradas en cola; si se llena se descartan
+    LOG_BATCH_SIZE = 64  # se escribe al juntar este número de entradas...
+    LOG_FLUSH_INTERVAL_S = 1.0  # ...o al pasar este tiempo
+    LOG_MAX_BYTES = 50 * 1024 * 1024  # rotación por tamaño (0 = desactivada)
+    LOG_ROTATE_INTERVAL_S = 0  # rotación por tiempo (0 = desactivada)
+    LOG_COMPRESS = True  # gzip de los archivos rotados
+    LOG_BACKUP_COUNT = 5
+
+    # Router: reglas precompiladas (src/agent/router.py) y, opcional, un
+    # clasificador por embeddings MiniLM para las queries sin regla
+    ROUTER_CLASSIFIER = False
+    ROUTER_CLASSIFIER_THRESHOLD = 0.6
+
+    # Planes con varias herramientas ("¿Puedo llevar CS202 y cuántos créditos
+    # tiene?"): se corren en paralelo, cada una con su timeout
+    TOOL_WORKERS = 4
+    TOOL_TIMEOUT_S = 30.0
+    TOOL_TIMEOUTS_S = {"calculator": 5.0, "verification": 5.0}
+    # Tokens que el RAG deja libres por cada otra herramienta del plan (sus
+    # salidas van al mismo contexto que los registros del RAG)
+    TOOL_CONTEXT_RESERVE_TOKENS = 64
+
+    # Verificación de prerrequisitos: "mock" (catálogo de ejemplo de
+    # VerificationTool) o "records" (grafo con los cursos que extrae el RAG;
+    # VERIFICATION_UNIVERSIDAD limita a una universidad con el mismo alias
+    # que los filtros del RAG, p. ej. "UNI"; un alias sin tag es un error)
+    VERIFICATION_SOURCE = "mock"
+    VERIFICATION_UNIVERSIDAD = None
+    # Historial por alumno en SQLite (src/tools/student_store.py)
+    STUDENT_STORE = False
+    STUDENT_DB_PATH = os.path.join(BASE_DIR, "data", "students.sqlite3")
+    STUDENT_DB_POOL_SIZE = 4
+    STUDENT_CACHE_SIZE = 4096  # historiales en el LRU
+    STUDENT_BATCH_SIZE = 5000  # alumnos por bloque en las consultas de cohorte
+
+    # Calculadora (src/tools/expression.py): cotas por evaluación
+    CALC_MAX_STEPS = 256  # operaciones del programa compilado
+    CALC_MAX_INT_BITS = 4096  # tamaño de cualquier entero intermedio
+    CALC_MAX_EXPONENT = 10000
+    CALC_TIME_BUDGET_S = 0.05
+    CALC_CACHE_SIZE = 1024  # expresiones compiladas (LRU)
+
+    # Trazas por etapa (router, herramientas, RAG, LLM) en el steps_trace
+    TRACING = True
@@ -0,0 +1,60 @@
+import os
+
+import torch
+from transformers import AutoModelForSeq2SeqLM
+
+LLM_BACKENDS = ("torch", "int8", "onnx")
+
+
+def load_seq2seq_model(model_id: str, backend: str, onnx_dir: str = None):
+    """
+    Carga el generador según Config.LLM_BACKEND:
+
+    - "torch": AutoModelForSeq2SeqLM en fp32 (el comportamiento original)
+    - "int8": el mismo modelo con cuantización dinámica int8 de las capas
+      nn.Linear (pesos int8, activaciones cuantizadas al vuelo). Casi todo
+      el peso de flan-t5 está en esas capas.
+    - "onnx": encoder/decoder exportados a ONNX Runtime con optimum, con el
+      decoder "with past" para reutilizar el KV-cache entre tokens. La
+      exportación se hace una vez y se guarda en `onnx_dir`.
+
+    Todos exponen .generate() con los mismos argumentos.
+    """
+    if backend not in LLM_BACKENDS:
+        raise ValueError(
+            f"LLM_BACKEND desconocido: {backend} (opciones: {LLM_BACKENDS})"
+        )
+
+    if backend == "onnx":
+        return _load_onnx(model_id, onnx_dir)
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_id)
+    model.eval()
+    if backend == "int8":
+        model = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+
+def _load_onnx(model_id, onnx_dir):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError(
+            "LLM_BACKEND='onnx' requiere optimum con onnxruntime: "
+            "pip install 'optimum[onnxruntime]'"
+        ) from e
+
+    export_dir = None
+    if onnx_dir:
+        export_dir = os.path.join(onnx_dir, model_id.replace("/", "__"))
+        if os.path.exists(os.path.join(export_dir, "config.json")):
+            print(f"Loading ONNX export from {export_dir}...")
+            return ORTModelForSeq2SeqLM.from_pretrained(export_dir, use_cache=True)
+
+    print(f"Exporting {model_id} to ONNX (solo la primera vez)...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_id, export=True, use_cache=True)
+    if export_dir:
+        model.save_pretrained(export_dir)
+    return model
@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from src.utils import tracing
+
+
+class GenerationBatcher:
+    """
+    Micro-batching de generación: las llamadas concurrentes a `generate` se
+    encolan y un hilo worker las agrupa en lotes de hasta `max_batch_size`
+    prompts. Cuando llega el primer prompt se espera como mucho `max_wait_ms`
+    a que lleguen más. Cada lote se resuelve con una sola llamada a
+    `generate_batch(prompts) -> [textos]` y cada resultado vuelve a su caller
+    a través de un Future.
+
+    Con un solo usuario el costo extra es la ventana de espera; con varios,
+    el encoder-decoder procesa todos los prompts en un solo forward padded.
+
+    Si el caller tiene una traza activa, se le agregan la espera en cola
+    (`llm.queue_wait`) y el span del lote (`llm.batch`, compartido por todos
+    los prompts del lote) con lo que `generate_batch` haya medido adentro.
+    """
+
+    def __init__(self, generate_batch, max_batch_size=8, max_wait_ms=10.0):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.metrics = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "max_batch_size": 0,
+            "total_wait_s": 0.0,
+            "max_wait_s": 0.0,
+            "total_generate_s": 0.0,
+        }
+
+        self._worker = threading.Thread(
+            target=self._loop, name="generation-batcher", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, prompt: str) -> Future:
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("GenerationBatcher cerrado")
+            self._queue.put(
+                (prompt, future, time.perf_counter(), tracing.current_span())
+            )
+        return future
+
+    def generate(self, prompt: str, timeout=None) -> str:
+        return self.submit(prompt).result(timeout=timeout)
+
+    def close(self):
+        """Procesa lo que queda en la cola y detiene el worker."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.metrics)
+        out["queue_depth"] = self._queue.qsize()
+        batches = out["batches"]
+        requests = out["requests"]
+        out["avg_batch_size"] = requests / batches if batches else 0.0
+        out["avg_wait_ms"] = 1000 * out["total_wait_s"] / requests if requests else 0.0
+        out["max_wait_ms"] = 1000 * out["max_wait_s"]
+        out["avg_generate_ms"] = (
+            1000 * out["total_generate_s"] / batches if batches else 0.0
+        )
+        return out
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = (
+                        self._queue.get(timeout=remaining)
+                        if remaining > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch):
+        prompts = [prompt for prompt, _future, _t, _span in batch]
+        started = time.perf_counter()
+        waits = [started - t for _prompt, _future, t, _span in batch]
+        batch_span = tracing.Span("llm.batch", size=len(batch))
+        try:
+            with tracing.activate(batch_span):
+                outputs = self.generate_batch(prompts)
+            if len(outputs) != len(prompts):
+                raise RuntimeError(
+                    f"generate_batch devolvió {len(outputs)} salidas "
+                    f"para {len(prompts)} prompts"
+                )
+            error = None
+        except Exception as e:
+            outputs, error = None, e
+        elapsed = time.perf_counter() - started
+        batch_span.finish()
+
+        with self._lock:
+            m = self.metrics
+            m["requests"] += len(batch)
+            m["batches"] += 1
+            m["errors"] += 0 if error is None else len(batch)
+            m["max_batch_size"] = max(m["max_batch_size"], len(batch))
+            m["total_wait_s"] += sum(waits)
+            m["max_wait_s"] = max(m["max_wait_s"], max(waits))
+            m["total_generate_s"] += elapsed
+
+        for i, (_prompt, future, t, parent) in enumerate(batch):
+            # Antes de resolver el Future: el caller sigue bloqueado esperando
+            if parent is not None:
+                wait_span = tracing.Span("llm.queue_wait", start=t).finish(started)
+                parent.children.extend([wait_span, batch_span])
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(outputs[i])
@@ -1,35 +1,138 @@
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+import threading
+
+import torch
+from transformers import AutoTokenizer, TextIteratorStreamer
 from src.config import Config
+from src.llm.backends import load_seq2seq_model
+from src.llm.batcher import GenerationBatcher
+from src.tools.text import split_records, take_within_budget
+from src.utils import tracing
+
+# Mismos parámetros que el pipeline text2text-generation original
+GENERATION_KWARGS = {
+    "max_new_tokens": 100,
+    "do_sample": False,
+    "repetition_penalty": 1.2,
+}
+DECODE_KWARGS = {"skip_special_tokens": True, "clean_up_tokenization_spaces": False}
 
 
 class LLMService:
-    def __init__(self):
-        print(f"Loading Model {Config.LLM_MODEL_ID} on CPU...")
+    def __init__(self, backend=None):
+        self.backend = backend or Config.LLM_BACKEND
+        print(f"Loading Model {Config.LLM_MODEL_ID} on CPU ({self.backend})...")
 
         self.tokenizer = AutoTokenizer.from_pretrained(Config.LLM_MODEL_ID)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(Config.LLM_MODEL_ID)
-
-        self.pipe = pipeline(
-            "text2text-generation",
-            model=self.model,
-            tokenizer=self.tokenizer,
+        self.model = load_seq2seq_model(
+            Config.LLM_MODEL_ID, self.backend, onnx_dir=Config.LLM_ONNX_DIR
         )
 
-    def generate_response(self, query: str, context: str) -> str:
-
-        safe_context = context[:1200]
+        # Las llamadas concurrentes se agrupan en un solo generate() padded
+        self.batcher = None
+        if Config.LLM_BATCHING:
+            self.batcher = GenerationBatcher(
+                self._generate_batch,
+                max_batch_size=Config.LLM_MAX_BATCH_SIZE,
+                max_wait_ms=Config.LLM_BATCH_WAIT_MS,
+            )
 
-        input_text = (
-            f"Información: {safe_context}\n\n"
+    def _template(self, query: str, context: str) -> str:
+        return (
+            f"Información: {context}\n\n"
             f"Instrucción: Responde la pregunta usando solo la información anterior.\n"
             f"Pregunta: {query}\n"
             f"Respuesta:"
         )
 
-        output = self.pipe(
-            input_text,
-            max_new_tokens=100,
-            do_sample=False,
-            repetition_penalty=1.2,
-        )
-        return output[0]["generated_text"]
+    def build_prompt(self, query: str, context: str) -> str:
+        safe_context = self.pack_context(context, self.context_budget(query))
+        return self._template(query, safe_context)
+
+    def count_tokens(self, texts):
+        """Tokens de cada texto según el tokenizer del modelo (sin </s>)."""
+        if not texts:
+            return []
+        encoded = self.tokenizer(list(texts), add_special_tokens=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def context_budget(self, query: str) -> int:
+        """
+        Tokens que quedan para el contexto: el límite del encoder menos la
+        plantilla con la pregunta y el </s> final.
+        """
+        overhead = self.count_tokens([self._template(query, "")])[0] + 1
+        return max(0, Config.LLM_MAX_INPUT_TOKENS - overhead)
+
+    def pack_context(self, context: str, budget: int) -> str:
+        """
+        Mete registros enteros (en el orden de relevancia en que llegan) hasta
+        llenar el presupuesto. Solo si el primero no cabe se corta por tokens.
+        """
+        records, sep = split_records(context or "")
+        if not records:
+            return ""
+        lengths = self.count_tokens(records)
+        kept = records[: take_within_budget(lengths, budget)]
+        if lengths[0] > budget:
+            ids = self.tokenizer(kept[0], add_special_tokens=False)["input_ids"]
+            kept[0] = self.tokenizer.decode(ids[:budget], **DECODE_KWARGS)
+        return sep.join(kept)
+
+    def generate_response(self, query: str, context: str) -> str:
+        with tracing.span("llm.prompt"):
+            input_text = self.build_prompt(query, context)
+
+        if self.batcher is not None:
+            return self.batcher.generate(input_text)
+        return self._generate_batch([input_text])[0]
+
+    def stream_response(self, query: str, context: str):
+        """
+        Generador de fragmentos de texto a medida que se decodifican los tokens
+        (TextIteratorStreamer). La concatenación es igual a generate_response.
+        No pasa por el batcher: el streamer solo admite un prompt a la vez.
+        """
+        with tracing.span("llm.prompt"):
+            input_text = self.build_prompt(query, context)
+        with tracing.span("llm.tokenize"):
+            inputs = self.tokenizer([input_text], return_tensors="pt")
+        streamer = TextIteratorStreamer(self.tokenizer, **DECODE_KWARGS)
+        errors = []
+
+        def worker():
+            try:
+                with torch.inference_mode():
+                    self.model.generate(
+                        **inputs, streamer=streamer, **GENERATION_KWARGS
+                    )
+            except Exception as e:
+                errors.append(e)
+                streamer.end()  # desbloquea al consumidor
+
+        thread = threading.Thread(target=worker, name="llm-stream", daemon=True)
+        thread.start()
+        # generate y decode van intercalados: un solo span para los dos
+        generate_span = tracing.child("llm.generate", stream=True)
+        for delta in streamer:
+            if delta:
+                yield delta
+        thread.join()
+        generate_span.finish()
+        if errors:
+            raise errors[0]
+
+    def batch_stats(self) -> dict:
+        """Métricas del batcher (cola, tamaño de lote, espera)."""
+        return self.batcher.stats() if self.batcher is not None else {}
+
+    def _generate_batch(self, prompts):
+        """
+        Un solo generate() para varios prompts (padding a la derecha + attention
+        mask).
+        """
+        with tracing.span("llm.tokenize"):
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        with tracing.span("llm.generate"), torch.inference_mode():
+            output_ids = self.model.generate(**inputs, **GENERATION_KWARGS)
+        with tracing.span("llm.decode", tokens=int(output_ids.shape[-1])):
+            return self.tokenizer.batch_decode(output_ids, **DECODE_KWARGS)
@@ -1,26 +1,74 @@
 import os
-from src.llm.model_loader import LLMService
-from src.tools.calculator import CalculatorTool
-from src.tools.rag import RAGTool
-from src.tools.verification import VerificationTool  # <--- Importación Correcta
 from src.agent.core import AgentEngine
+from src.agent.registry import ToolRegistry
 from src.config import Config
 
 
+# Cada factory importa su módulo al construir el componente: torch,
+# transformers, sentence_transformers y faiss no se cargan al arrancar.
+def load_llm():
+    from src.llm.model_loader import LLMService
+
+    return LLMService()
+
+
+def load_rag():
+    from src.tools.rag import RAGTool
+
+    return RAGTool()
+
+
+def load_calculator():
+    from src.tools.calculator import CalculatorTool
+
+    return CalculatorTool()
+
+
+def load_verification(registry=None):
+    from src.tools.verification import VerificationTool
+
+    kwargs = {}
+    if Config.VERIFICATION_SOURCE == "records" and registry is not None:
+        from src.tools.prereq_graph import PrereqGraph
+
+        # El grafo sale de los cursos del RAG (código + Pre-requisito)
+        records = registry["rag"].records
+        kwargs["graph"] = PrereqGraph.from_records(
+            records, universidad=Config.VERIFICATION_UNIVERSIDAD
+        )
+    if Config.STUDENT_STORE:
+        from src.tools.student_store import StudentStore
+
+        kwargs["store"] = StudentStore(
+            Config.STUDENT_DB_PATH,
+            pool_size=Config.STUDENT_DB_POOL_SIZE,
+            cache_size=Config.STUDENT_CACHE_SIZE,
+        )
+    return VerificationTool(**kwargs)
+
+
+def build_registry():
+    registry = ToolRegistry()
+    registry.register("llm", load_llm)
+    registry.register("rag", load_rag)
+    registry.register("calculator", load_calculator)
+    registry.register("verification", lambda: load_verification(registry))
+    return registry
+
+
 def main():
     # Directorio de logs
     os.makedirs(Config.LOG_DIR, exist_ok=True)
 
     print("Iniciando Agente")
 
-    # Inicializar LLM service
-    llm_service = LLMService()
-
-    # Inicializar Herramientas
-    tools = [CalculatorTool(), RAGTool(), VerificationTool()]
+    # LLM e índice RAG cargan en paralelo mientras la consola ya acepta
+    # preguntas; cada pregunta espera solo a los componentes que usa
+    registry = build_registry()
+    registry.start(Config.WARMUP_COMPONENTS)
 
     # Inicializar Agente
-    agent = AgentEngine(llm_service, tools)
+    agent = AgentEngine(registry.proxy("llm"), registry)
 
     print("\nSistema listo. Escribe 'exit' para salir.")
     print("-" * 50)
@@ -32,9 +80,15 @@ def main():
             break
 
         try:
-            response, latency = agent.run(user_query)
-            print(f"Agent> {response}")
-            print(f"[Meta] Latency: {latency:.4f}s | Logs saved.")
+            # La respuesta se imprime a medida que el LLM la genera
+            print("Agent> ", end="", flush=True)
+            for delta in agent.run_stream(user_query):
+                print(delta, end="", flush=True)
+            print()
+            print(
+                f"[Meta] Latency: {agent.last_latency:.4f}s | "
+                f"TTFT: {agent.last_ttft:.4f}s | Logs saved."
+            )
         except Exception as e:
             print(f"Error: {e}")
         print("-" * 50)
@@ -0,0 +1,146 @@
+import re
+from dataclasses import dataclass
+
+from src.tools.text import normalize_text
+
+# Parseo de la query compartido por el router y las herramientas (no depende
+# de ninguno de los dos)
+
+# Código del catálogo de verificación (sobre la query en mayúsculas): CS102
+COURSE_CODE_RE = re.compile(r"\b[A-Z]{2}\d{3}\b")
+# Candidatos a código del plan de estudios: BMA02, CC0A1, CM2A1. Tienen al
+# menos un dígito, así "PUEDO" o "TIENE" no cuentan; quien los usa (RAG,
+# verificación) se queda con el primero que conoce
+CODE_CANDIDATE_RE = re.compile(r"\b([A-Za-z]{2,4}[0-9A-Za-z]{2,4})\b")
+# Operación aritmética ("20 +") y tramos de expresión ("20 + 5", "(3*3)")
+ARITHMETIC_OP_RE = re.compile(r"\d+\s*[\+\-\*\/]")
+EXPRESSION_RE = re.compile(r"[\d\+\-\*\/\.\(\)\s]+")
+# Preguntas sobre datos del plan de estudios (query normalizada): hacen que
+# el RAG entre al plan aunque otra regla ya haya calzado ("¿Puedo llevar
+# CS202 y cuántos créditos tiene?"). "prerrequisitos" es de verificación.
+COURSE_INFO_RE = re.compile(
+    r"\b(creditos?|ciclos?|obligatori[oa]s?|electiv[oa]s?|pre requisitos?)\b"
+)
+
+# Listados por ciclo (sobre la query normalizada, en este orden)
+CYCLES = {
+    "primer ciclo": "Primer ciclo",
+    "segundo ciclo": "Segundo ciclo",
+    "tercer ciclo": "Tercer ciclo",
+    "cuarto ciclo": "Cuarto ciclo",
+    "quinto ciclo": "Quinto ciclo",
+    "sexto ciclo": "Sexto ciclo",
+    "setimo ciclo": "Sétimo ciclo",
+    "septimo ciclo": "Sétimo ciclo",
+    "octavo ciclo": "Octavo ciclo",
+    "noveno ciclo": "Noveno ciclo",
+    "decimo ciclo": "Décimo ciclo",
+}
+LIST_MARKERS = (
+    "que cursos hay",
+    "cuales cursos",
+    "cuáles cursos",
+    "lista",
+    "listame",
+    "muéstrame",
+    "mostrar",
+)
+ELECTIVES = {
+    "electivos de especialidad": "Electivo de Especialidad",
+    "electivos complementarios": "Electivo Complementario",
+}
+# Alias de universidad (palabras de la query normalizada) -> filtro de RAG
+UNIVERSITIES = {
+    "UNI": ("uni", "universidad nacional de ingenieria"),
+    "San Marcos": ("san marcos", "unmsm"),
+    "UPC": ("upc",),
+    "UCSP": ("ucsp", "san pablo"),
+}
+_UNIVERSITY_RES = {
+    name: re.compile(r"\b(" + "|".join(re.escape(a) for a in aliases) + r")\b")
+    for name, aliases in UNIVERSITIES.items()
+}
+
+
+@dataclass(frozen=True)
+class QueryIntent:
+    """
+    La query parseada una sola vez: lo que cada herramienta necesita de ella
+    (las herramientas la reciben como `intent=` y no vuelven a aplicar sus
+    regex) y la ruta que eligió el router (src/agent/router.py).
+
+    `plan` son todas las herramientas que la query necesita, en orden de
+    prioridad; `route` es la primera (la que usa el cache como llave).
+    """
+
+    query: str
+    normalized: str
+    route: str = "rag"
+    plan: tuple = ("rag",)
+    source: str = "rules"  # "rules" | "default" (ninguna regla) | "classifier"
+    course_code: str = None  # verificación
+    code_candidates: tuple = ()  # match exacto del RAG / códigos del plan
+    expression: str = None  # calculadora
+    asks_calculation: bool = False
+    asks_course_info: bool = False
+    cycle: str = None
+    wants_list: bool = False
+    elective_type: str = None
+    universidad: str = None
+
+    def filters(self) -> dict:
+        """Filtros de RAGTool.run detectados en la query (no se aplican solos)."""
+        out = {"universidad": self.universidad, "ciclo": self.cycle}
+        if self.wants_list:
+            out["tipo"] = self.elective_type
+        return {k: v for k, v in out.items() if v is not None}
+
+
+def find_course_code(query: str):
+    m = COURSE_CODE_RE.search((query or "").upper())
+    return m.group(0) if m else None
+
+
+def find_code_candidates(query: str) -> tuple:
+    """Todos los candidatos a código (en mayúsculas, sin repetir, en orden)."""
+    found = CODE_CANDIDATE_RE.findall(query or "")
+    return tuple(
+        dict.fromkeys(c.upper() for c in found if any(ch.isdigit() for ch in c))
+    )
+
+
+def extract_expression(query: str):
+    """El tramo de expresión más largo que tiene algún dígito, o None."""
+    spans = [m for m in EXPRESSION_RE.findall(query) if any(c.isdigit() for c in m)]
+    return max(spans, key=len).strip() if spans else None
+
+
+def _first_match(normalized: str, table: dict):
+    for key, value in table.items():
+        if key in normalized:
+            return value
+    return None
+
+
+def extract_intent(query: str) -> QueryIntent:
+    """Todos los campos de la query, sin ruta (la elige el router)."""
+    query = query or ""
+    normalized = normalize_text(query)
+    universidad = next(
+        (name for name, r in _UNIVERSITY_RES.items() if r.search(normalized)), None
+    )
+    return QueryIntent(
+        query=query,
+        normalized=normalized,
+        course_code=find_course_code(query),
+        code_candidates=find_code_candidates(query),
+        expression=extract_expression(query),
+        asks_calculation=(
+            "calcular" in query.lower() or ARITHMETIC_OP_RE.search(query) is not None
+        ),
+        asks_course_info=COURSE_INFO_RE.search(normalized) is not None,
+        cycle=_first_match(normalized, CYCLES),
+        wants_list=any(m in normalized for m in LIST_MARKERS),
+        elective_type=_first_match(normalized, ELECTIVES),
+        universidad=universidad,
+    )
@@ -0,0 +1,419 @@
+"""
+Servidor HTTP/JSON asíncrono para AgentEngine (solo librería estándar).
+
+    python -m src.server --port 8000
+
+Endpoints:
+    POST /query   {"query": "...", "student_id": "..." (opcional)}
+                  -> {"response", "latency_seconds", "queue_seconds"}
+    GET  /health  el proceso responde (+ métricas de cola, cache y batcher)
+    GET  /ready   200 cuando el LLM y el índice RAG terminaron de cargar, 503 si no
+
+El event loop solo parsea HTTP; la recuperación y la generación (CPU-bound)
+corren en un ThreadPoolExecutor sobre un único AgentEngine compartido. Los
+modelos e índices se cargan una sola vez y solo se leen. Las generaciones
+concurrentes del LLM las agrupa su GenerationBatcher en un solo generate().
+
+Con `--processes N` (Linux/macOS) el proceso padre carga el índice RAG una
+vez (ver src/tools/shared_index.py), abre el socket y hace fork de N
+workers que lo comparten; cada uno corre su propio event loop y su LLM.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from src.config import Config
+from src.utils.procstats import memory_stats
+
+
+class AgentServer:
+    """
+    Back-pressure: como mucho `workers` consultas corriendo y `max_queue`
+    esperando; el resto recibe 503 con Retry-After. Cada consulta tiene un
+    timeout (504). El hilo de una consulta vencida termina igual y recién
+    entonces libera su lugar, así la cola refleja el trabajo real.
+    """
+
+    def __init__(
+        self,
+        agent,
+        registry=None,
+        workers=None,
+        max_queue=None,
+        timeout_s=None,
+        warmup=None,
+    ):
+        self.agent = agent
+        self.registry = registry
+        self.workers = workers or Config.SERVER_WORKERS
+        self.max_queue = Config.SERVER_MAX_QUEUE if max_queue is None else max_queue
+        self.timeout_s = timeout_s or Config.SERVER_REQUEST_TIMEOUT_S
+        self.warmup = tuple(Config.WARMUP_COMPONENTS if warmup is None else warmup)
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="agent-worker"
+        )
+        self.pending = 0  # corriendo + en cola (solo se toca desde el loop)
+        self.metrics = {
+            "requests": 0,
+            "completed": 0,
+            "errors": 0,
+            "rejected": 0,
+            "timeouts": 0,
+        }
+        self.started = time.time()
+
+    # Rutas
+    async def dispatch(self, method: str, path: str, body: bytes):
+        """(status, payload, headers extra) para una petición."""
+        path = path.split("?", 1)[0]
+        if path == "/health" and method == "GET":
+            return 200, self.health(), {}
+        if path == "/ready" and method == "GET":
+            ready, payload = self.readiness()
+            return (200 if ready else 503), payload, {}
+        if path == "/query":
+            if method != "POST":
+                return 405, {"error": "Usar POST"}, {"Allow": "POST"}
+            return await self.query(body)
+        return 404, {"error": f"Ruta desconocida: {path}"}, {}
+
+    async def query(self, body: bytes):
+        try:
+            payload = json.loads(body or b"{}")
+            query = payload["query"]
+            if not isinstance(query, str) or not query.strip():
+                raise ValueError
+            # Alumno cuyo historial usa la verificación (StudentStore)
+            student_id = payload.get("student_id")
+            if student_id is not None and not isinstance(student_id, str):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            return (
+                400,
+                {"error": 'Se esperaba JSON {"query": "...", "student_id": "..."}'},
+                {},
+            )
+
+        self.metrics["requests"] += 1
+        if self.pending >= self.workers + self.max_queue:
+            self.metrics["rejected"] += 1
+            return 503, {"error": "Servidor saturado"}, {"Retry-After": "1"}
+
+        self.pending += 1
+        submitted = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, self._run_agent, query, submitted, student_id
+        )
+        future.add_done_callback(self._release)
+        try:
+            response, latency, queued = await asyncio.wait_for(
+                asyncio.shield(future), self.timeout_s
+            )
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            return 504, {"error": f"Sin respuesta en {self.timeout_s}s"}, {}
+        except Exception as e:
+            self.metrics["errors"] += 1
+            return 500, {"error": str(e)}, {}
+
+        self.metrics["completed"] += 1
+        return (
+            200,
+            {
+                "response": response,
+                "latency_seconds": round(latency, 4),
+                "queue_seconds": round(queued, 4),
+            },
+            {},
+        )
+
+    def health(self) -> dict:
+        out = {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "workers": self.workers,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(0, self.pending - self.workers),
+            "max_queue": self.max_queue,
+            **self.metrics,
+            "memory": memory_stats(),
+        }
+        if getattr(self.agent, "cache", None) is not None:
+            out["response_cache"] = self.agent.cache.stats()
+        llm = self._loaded("llm")
+        if llm is not None and hasattr(llm, "batch_stats"):
+            out["llm_batcher"] = llm.batch_stats()
+        if getattr(self.agent, "router", None) is not None:
+            out["router"] = self.agent.router.stats()
+        if getattr(self.agent, "logger", None) is not None:
+            out["logger"] = self.agent.logger.stats()
+        return out
+
+    def readiness(self):
+        if self.registry is None:
+            return True, {"ready": True}
+        status = self.registry.status()
+        components = {n: status[n] for n in self.warmup if n in status}
+        ready = all(c["state"] == "ready" for c in components.values())
+        return ready, {"ready": ready, "components": components}
+
+    # HTTP/1.1 mínimo (keep-alive, Content-Length)
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), Config.SERVER_IDLE_TIMEOUT_S
+                    )
+                except (
+                    asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError,
+                    asyncio.TimeoutError,
+                    ConnectionError,
+                ):
+                    return
+
+                request = parse_head(head)
+                if request is None:
+                    await write_response(writer, 400, {"error": "HTTP inválido"}, {})
+                    return
+                method, path, version, headers = request
+
+                length = int(headers.get("content-length", "0"))
+                if length > Config.SERVER_MAX_BODY_BYTES:
+                    await write_response(writer, 413, {"error": "Body muy grande"}, {})
+                    return
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload, extra = await self.dispatch(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close" and (
+                    version == "HTTP/1.1"
+                    or headers.get("connection", "").lower() == "keep-alive"
+                )
+                extra["Connection"] = "keep-alive" if keep_alive else "close"
+                await write_response(writer, status, payload, extra)
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=None, port=None, sock=None):
+        """asyncio.Server escuchando en host:port (o en un socket ya abierto)."""
+        if sock is not None:
+            return await asyncio.start_server(self.handle_connection, sock=sock)
+        return await asyncio.start_server(
+            self.handle_connection,
+            host or Config.SERVER_HOST,
+            Config.SERVER_PORT if port is None else port,
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_agent(self, query, submitted, student_id=None):
+        queued = time.perf_counter() - submitted
+        response, latency = self.agent.run(query, student_id=student_id)
+        return response, latency, queued
+
+    def _release(self, future):
+        self.pending -= 1
+        if not future.cancelled():
+            future.exception()  # marcada como leída aunque el cliente ya se fue
+
+    def _loaded(self, name):
+        if self.registry is not None:
+            return self.registry.peek(name)
+        return self.agent.llm if name == "llm" else None
+
+
+def parse_head(head: bytes):
+    """(método, ruta, versión, headers en minúsculas) o None si es inválido."""
+    try:
+        lines = head.decode("latin-1").split("\r\n")
+        method, path, version = lines[0].split(" ")
+    except ValueError:
+        return None
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if not headers.get("content-length", "0").isdigit():
+        return None
+    return method.upper(), path, version, headers
+
+
+async def write_response(writer, status, payload, headers):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    lines = [
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+        "Content-Type: application/json; charset=utf-8",
+        f"Content-Length: {len(body)}",
+    ]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+def build_agent(shared_index=None):
+    """
+    Registro perezoso + agente, igual que la consola (src/main.py). Con
+    `shared_index` el RAG adopta los artefactos cargados por el padre.
+    """
+    from src.agent.core import AgentEngine
+    from src.main import build_registry
+
+    registry = build_registry()
+    if shared_index is not None:
+
+        def load_shared_rag():
+            from src.tools.rag import RAGTool
+
+            return RAGTool(snapshot=shared_index)
+
+        registry.register("rag", load_shared_rag)
+    registry.start(Config.WARMUP_COMPONENTS)
+    return AgentEngine(registry.proxy("llm"), registry), registry
+
+
+async def serve(host=None, port=None, workers=None, sock=None, shared_index=None):
+    os.makedirs(Config.LOG_DIR, exist_ok=True)
+    agent, registry = build_agent(shared_index)
+    app = AgentServer(agent, registry, workers=workers)
+    server = await app.start(host, port, sock=sock)
+    host, port = server.sockets[0].getsockname()[:2]
+    print(
+        f"[Server] pid {os.getpid()} escuchando en http://{host}:{port} "
+        f"({app.workers} hilos)"
+    )
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        app.close()
+
+
+def serve_prefork(host, port, processes, workers=None):
+    """
+    Proceso padre del modo multi-proceso: carga el índice compartido, abre
+    el socket, hace fork de `processes` workers y los vuelve a lanzar si
+    mueren. Cada SERVER_STATS_INTERVAL_S imprime RSS/PSS/compartida de cada
+    worker. Ctrl+C o SIGTERM detienen a todos.
+    """
+    if not hasattr(os, "fork"):
+        raise SystemExit("--processes > 1 necesita os.fork (Linux/macOS)")
+
+    from src.tools.shared_index import load_shared_index
+
+    os.makedirs(Config.LOG_DIR, exist_ok=True)
+    shared_index = load_shared_index()
+    sock = socket.create_server((host, port), backlog=Config.SERVER_BACKLOG)
+    print(f"[Server] Padre {os.getpid()}: {processes} workers en http://{host}:{port}")
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        sys.stdout.flush()  # si no, el hijo repite lo que quedó en el buffer
+        pid = os.fork()
+        if pid == 0:
+            # Worker: el padre se encarga de Ctrl+C; SIGTERM lo termina
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                asyncio.run(
+                    serve(workers=workers, sock=sock, shared_index=shared_index)
+                )
+            except BaseException as e:
+                print(f"[Server] Worker {os.getpid()} terminó: {e!r}", flush=True)
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(_signum, _frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(processes):
+        spawn()
+
+    next_stats = time.time() + Config.SERVER_STATS_INTERVAL_S
+    while not stopping:
+        time.sleep(0.5)
+        while children:
+            pid, _status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            children.discard(pid)
+            if not stopping:
+                print(f"[Server] Worker {pid} murió; lanzando otro")
+                spawn()
+        if time.time() >= next_stats:
+            print_worker_memory(sorted(children))
+            next_stats = time.time() + Config.SERVER_STATS_INTERVAL_S
+
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+
+
+def print_worker_memory(pids):
+    """RSS cuenta dos veces lo compartido; la suma de PSS es la memoria real."""
+    rows = [(pid, memory_stats(pid)) for pid in pids]
+    print(
+        f"{'Worker':<8} | {'RSS MB':>8} | {'PSS MB':>8} | {'Compartida':>10} | {'Privada':>8}"
+    )
+    for pid, m in rows:
+        print(
+            f"{pid:<8} | {m.get('rss_mb', 0):>8.1f} | {m.get('pss_mb', 0):>8.1f} | "
+            f"{m.get('shared_mb', 0):>10.1f} | {m.get('private_mb', 0):>8.1f}"
+        )
+    total_rss = sum(m.get("rss_mb", 0) for _pid, m in rows)
+    total_pss = sum(m.get("pss_mb", 0) for _pid, m in rows)
+    print(f"Total: RSS {total_rss:.1f} MB | PSS {total_pss:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP del agente")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=Config.SERVER_WORKERS, help="hilos por proceso"
+    )
+    parser.add_argument("--processes", type=int, default=Config.SERVER_PROCESSES)
+    args = parser.parse_args()
+    if args.processes > 1:
+        serve_prefork(args.host, args.port, args.processes, args.workers)
+        return
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -6,5 +6,9 @@ class BaseTool(ABC):
         self.name = name
 
     @abstractmethod
-    def run(self, input_text: str) -> str:
+    def run(self, input_text: str, intent=None) -> str:
+        """
+        `intent`: QueryIntent (src/query.py) con la query ya parseada por el
+        router; sin él la herramienta la parsea sola.
+        """
         pass
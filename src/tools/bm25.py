@@ -0,0 +1,234 @@
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+# score_postings_batch usa un acumulador denso de n_queries * n_docs celdas
+# solo si no es mucho más grande que el número de postings a sumar, y parte
+# el batch para que no pase de ACCUMULATOR_CELLS (~2 MB de float64)
+DENSE_ACCUMULATOR_RATIO = 8
+ACCUMULATOR_CELLS = 1 << 18
+
+# Lo que se guarda en disco: arreglos .npy (mapeables) + parámetros y vocab
+ARRAYS = ("doc_ids", "indptr", "doc_len", "impacts", "idf", "max_impact")
+PARAMS = ("k1", "b", "epsilon", "n_docs", "avgdl", "average_idf", "all_idf_positive")
+META_FILE = "bm25.json"
+
+
+class BM25Index:
+    """
+    BM25 Okapi sobre un índice invertido en formato CSR.
+
+    Reproduce la fórmula de rank_bm25.BM25Okapi (idf ATIRE con piso
+    epsilon * idf_promedio para idf negativos) pero precalcula por posting el
+    "impacto" tf*(k1+1) / (tf + k1*(1-b+b*dl/avgdl)); el score de una query es
+    sum(idf * impacto) y solo toca los postings de sus términos, no el corpus.
+
+    postings del término t: doc_ids[indptr[t]:indptr[t+1]] (ordenados por doc)
+    """
+
+    def __init__(self, tokenized_corpus, k1=1.5, b=0.75, epsilon=0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.n_docs = len(tokenized_corpus)
+
+        self.vocab = {}
+        term_ids, doc_ids, tfs = [], [], []
+        doc_len = np.zeros(self.n_docs, dtype="float64")
+        for d, tokens in enumerate(tokenized_corpus):
+            doc_len[d] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(d)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype="int64")
+        order = np.argsort(term_ids, kind="stable")  # conserva el orden por doc
+        self.doc_ids = np.asarray(doc_ids, dtype="int32")[order]
+        tf = np.asarray(tfs, dtype="float64")[order]
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        self.indptr = np.concatenate([[0], np.cumsum(df)]).astype("int64")
+
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.mean()) if self.n_docs else 0.0
+        norm = k1 * (1 - b + b * doc_len / (self.avgdl or 1.0))
+        self.impacts = tf * (k1 + 1) / (tf + norm[self.doc_ids])
+
+        # idf igual que BM25Okapi._calc_idf
+        idf = np.log(self.n_docs - df + 0.5) - np.log(df + 0.5)
+        self.average_idf = float(idf.mean()) if idf.size else 0.0
+        idf[idf < 0] = self.epsilon * self.average_idf
+        self.idf = idf
+
+        # Cota superior por término (MaxScore)
+        self.max_impact = (
+            np.maximum.reduceat(self.impacts, self.indptr[:-1])
+            if self.impacts.size
+            else np.zeros(0)
+        )
+        self.all_idf_positive = bool((idf > 0).all())
+
+    def save(self, directory):
+        """Un .npy por arreglo del índice y un JSON con parámetros y vocab."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        meta = {p: getattr(self, p) for p in PARAMS}
+        meta["vocab"] = list(self.vocab)  # orden de inserción = id de término
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Inverso de save. Con `mmap` los arreglos quedan mapeados de solo
+        lectura: varios procesos que cargan el mismo índice comparten las
+        páginas en el page cache del sistema.
+        """
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls.__new__(cls)
+        for p in PARAMS:
+            setattr(index, p, meta[p])
+        index.vocab = {term: i for i, term in enumerate(meta["vocab"])}
+        for name in ARRAYS:
+            path = os.path.join(directory, f"{name}.npy")
+            setattr(index, name, np.load(path, mmap_mode="r" if mmap else None))
+        return index
+
+    def _query_terms(self, tokens):
+        """(ids de término, peso = repeticiones * idf) de los términos conocidos."""
+        counts = Counter(t for t in tokens if t in self.vocab)
+        if not counts:
+            return np.zeros(0, dtype="int64"), np.zeros(0)
+        ids = np.fromiter((self.vocab[t] for t in counts), dtype="int64")
+        reps = np.fromiter(counts.values(), dtype="float64")
+        return ids, reps * self.idf[ids]
+
+    def _postings(self, term, mask=None):
+        lo, hi = self.indptr[term], self.indptr[term + 1]
+        docs, impacts = self.doc_ids[lo:hi], self.impacts[lo:hi]
+        if mask is not None:
+            keep = mask[docs]
+            docs, impacts = docs[keep], impacts[keep]
+        return docs, impacts
+
+    def score_postings(self, tokens, mask=None):
+        """
+        Scores de los documentos que contienen algún término de la query.
+        Devuelve (doc_ids ordenados, scores); el resto del corpus tiene score 0.
+
+        `mask` (bool, n_docs) restringe el scoring a los documentos en True;
+        los idf siguen siendo los del corpus completo.
+        """
+        return self.score_postings_batch([tokens], mask)[0]
+
+    def score_postings_batch(self, token_lists, mask=None):
+        """
+        score_postings de varias queries con los postings de un bloque de
+        queries concatenados bajo la llave (query, doc) y acumulados con un
+        único bincount. Las sumas se hacen en el mismo orden que query por
+        query, así que los scores son idénticos. Devuelve una lista de
+        (doc_ids, scores) por query.
+        """
+        # Bloques de queries cuyo acumulador (queries x docs) quepa en cache
+        block = max(1, ACCUMULATOR_CELLS // max(self.n_docs, 1))
+        out = []
+        for lo in range(0, len(token_lists), block):
+            out.extend(self._score_block(token_lists[lo : lo + block], mask))
+        return out
+
+    def _score_block(self, token_lists, mask):
+        q_parts, d_parts, c_parts = [], [], []
+        for q, tokens in enumerate(token_lists):
+            ids, weights = self._query_terms(tokens)
+            for term, w in zip(ids, weights):
+                docs, impacts = self._postings(term, mask)
+                q_parts.append(np.full(docs.size, q, dtype="int64"))
+                d_parts.append(docs)
+                c_parts.append(w * impacts)
+
+        n_queries = len(token_lists)
+        if not d_parts:
+            return [(np.zeros(0, dtype="int64"), np.zeros(0))] * n_queries
+
+        keys = np.concatenate(q_parts) * self.n_docs + np.concatenate(d_parts)
+        contrib = np.concatenate(c_parts)
+        n_keys = n_queries * self.n_docs
+        if n_keys <= DENSE_ACCUMULATOR_RATIO * keys.size:
+            # Muchos postings por celda posible: acumulador denso, sin sort
+            touched = np.bincount(keys, minlength=n_keys) > 0
+            scores = np.bincount(keys, weights=contrib, minlength=n_keys)
+            uniq = np.flatnonzero(touched)
+            scores = scores[uniq]
+        else:
+            uniq, inverse = np.unique(keys, return_inverse=True)
+            scores = np.bincount(inverse, weights=contrib)
+        owner, docs = np.divmod(uniq, self.n_docs)
+        bounds = np.searchsorted(owner, np.arange(n_queries + 1))
+        return [
+            (docs[bounds[q] : bounds[q + 1]], scores[bounds[q] : bounds[q + 1]])
+            for q in range(n_queries)
+        ]
+
+    def get_scores(self, tokens, mask=None):
+        """Vector denso (n_docs,) compatible con BM25Okapi.get_scores."""
+        scores = np.zeros(self.n_docs)
+        docs, vals = self.score_postings(tokens, mask)
+        scores[docs] = vals
+        return scores
+
+    def top_k(self, tokens, k, mask=None):
+        """
+        Top-k exacto por (score desc, doc asc) con poda tipo MaxScore: los
+        términos se procesan de mayor a menor cota; cuando la suma de cotas de
+        los que faltan ya no alcanza al k-ésimo candidato, ningún documento
+        nuevo puede entrar y los términos restantes solo se buscan (binary
+        search sobre sus postings) para los candidatos ya vistos.
+
+        Solo devuelve documentos con algún término de la query (y dentro de
+        `mask`, si se da).
+        """
+        if not self.all_idf_positive:
+            # Con idf <= 0 las cotas dejan de ser válidas: ranking sin poda
+            docs, vals = self.score_postings(tokens, mask)
+            top = np.lexsort((docs, -vals))[:k]
+            return docs[top], vals[top]
+
+        ids, weights = self._query_terms(tokens)
+        if ids.size == 0 or k <= 0:
+            return np.zeros(0, dtype="int64"), np.zeros(0)
+
+        bounds = weights * self.max_impact[ids]
+        order = np.argsort(-bounds, kind="stable")
+        ids, weights, bounds = ids[order], weights[order], bounds[order]
+        rest = np.concatenate([np.cumsum(bounds[::-1])[::-1], [0.0]])
+
+        cand = np.zeros(0, dtype="int64")
+        scores = np.zeros(0)
+        for i, (term, w) in enumerate(zip(ids, weights)):
+            post_docs, post_imp = self._postings(term, mask)
+            if post_docs.size == 0:
+                continue
+            theta = (
+                np.partition(scores, scores.size - k)[scores.size - k]
+                if scores.size >= k
+                else -np.inf
+            )
+            if theta > rest[i]:
+                # Término no esencial: solo actualiza candidatos existentes
+                pos = np.searchsorted(post_docs, cand)
+                pos_ok = np.minimum(pos, post_docs.size - 1)
+                hit = (pos < post_docs.size) & (post_docs[pos_ok] == cand)
+                scores[hit] += w * post_imp[pos[hit]]
+                continue
+
+            merged = np.concatenate([cand, post_docs.astype("int64")])
+            contrib = np.concatenate([scores, w * post_imp])
+            cand, inverse = np.unique(merged, return_inverse=True)
+            scores = np.bincount(inverse, weights=contrib)
+
+        top = np.lexsort((cand, -scores))[:k]
+        return cand[top], scores[top]
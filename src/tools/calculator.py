@@ -1,24 +1,40 @@
-import re
+from src.query import extract_expression
 from src.tools.base import BaseTool
+from src.tools.expression import evaluate, evaluate_batch
 
 
 class CalculatorTool(BaseTool):
     def __init__(self):
         super().__init__(name="calculator")
 
-    def run(self, input_text: str) -> str:
+    def run(self, input_text: str, intent=None) -> str:
         # Extraer expresión matemática simple
         # Regex busca patrones como "20 + 5" o "3*3"
-        matches = re.findall(r"[\d\+\-\*\/\.\(\)\s]+", input_text)
-        valid_exprs = [m for m in matches if any(char.isdigit() for char in m)]
+        if intent is not None:
+            expr = intent.expression
+        else:
+            expr = extract_expression(input_text)
 
-        if not valid_exprs:
+        if expr is None:
             return "No calculation found."
 
-        expr = max(valid_exprs, key=len).strip()
-
+        # Evaluador por AST (sin eval), con cotas de tamaño y tiempo
         try:
-            result = eval(expr, {"__builtins__": None}, {})
-            return str(result)
+            return self._format(evaluate(expr))
         except Exception as e:
-            return f"Error in calculation: {e}"
+            return self._format(e)
+
+    def run_batch(self, inputs) -> list:
+        """run() de varias entradas; las expresiones se evalúan en lote."""
+        exprs = [extract_expression(text) for text in inputs]
+        found = [expr for expr in exprs if expr is not None]
+        values = iter(evaluate_batch(found))
+        return [
+            "No calculation found." if expr is None else self._format(next(values))
+            for expr in exprs
+        ]
+
+    def _format(self, value) -> str:
+        if isinstance(value, Exception):
+            return f"Error in calculation: {value}"
+        return str(value)
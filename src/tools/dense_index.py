@@ -0,0 +1,107 @@
+import faiss
+import numpy as np
+
+from src.config import Config
+
+DENSE_INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# FAISS recomienda ~39 puntos de entrenamiento por centroide
+MIN_POINTS_PER_CENTROID = 39
+
+
+def dense_index_spec() -> dict:
+    """Parámetros de construcción; si cambian, hay que reconstruir el índice."""
+    kind = Config.FAISS_INDEX_TYPE
+    spec = {"type": kind, "min_docs": Config.FAISS_ANN_MIN_DOCS}
+    if kind in ("ivf_flat", "ivf_pq"):
+        spec["nlist"] = Config.FAISS_NLIST
+    if kind == "ivf_pq":
+        spec["pq_m"] = Config.FAISS_PQ_M
+        spec["pq_nbits"] = Config.FAISS_PQ_NBITS
+    if kind == "hnsw":
+        spec["m"] = Config.FAISS_HNSW_M
+        spec["ef_construction"] = Config.FAISS_EF_CONSTRUCTION
+    return spec
+
+
+def build_dense_index(embeddings):
+    """
+    Construye (y entrena si hace falta) el índice denso según
+    Config.FAISS_INDEX_TYPE. Todos usan producto interno sobre vectores
+    normalizados (= coseno). Con pocos documentos se usa IndexFlatIP: un ANN
+    no aporta nada y el entrenamiento de IVF/PQ sería inestable.
+    """
+    n_docs, dim = embeddings.shape
+    kind = Config.FAISS_INDEX_TYPE
+    if kind not in DENSE_INDEX_TYPES:
+        raise ValueError(
+            f"FAISS_INDEX_TYPE desconocido: {kind} (opciones: {DENSE_INDEX_TYPES})"
+        )
+
+    min_docs = Config.FAISS_ANN_MIN_DOCS
+    if kind == "ivf_pq":
+        # Cada sub-cuantizador de PQ tiene 2^nbits centroides que entrenar
+        min_docs = max(min_docs, MIN_POINTS_PER_CENTROID * 2**Config.FAISS_PQ_NBITS)
+
+    if kind == "flat" or n_docs < min_docs:
+        index = faiss.IndexFlatIP(dim)
+
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(
+            dim, Config.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT
+        )
+        index.hnsw.efConstruction = Config.FAISS_EF_CONSTRUCTION
+
+    else:
+        nlist = max(1, min(Config.FAISS_NLIST, n_docs // MIN_POINTS_PER_CENTROID))
+        quantizer = faiss.IndexFlatIP(dim)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(
+                quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            if dim % Config.FAISS_PQ_M != 0:
+                raise ValueError(
+                    f"FAISS_PQ_M={Config.FAISS_PQ_M} debe dividir la dimensión {dim}"
+                )
+            index = faiss.IndexIVFPQ(
+                quantizer,
+                dim,
+                nlist,
+                Config.FAISS_PQ_M,
+                Config.FAISS_PQ_NBITS,
+                faiss.METRIC_INNER_PRODUCT,
+            )
+        index.train(embeddings)
+
+    index.add(embeddings)
+    configure_search(index)
+    return index
+
+
+def configure_search(index):
+    """Parámetros de búsqueda (no se persisten de forma fiable en el snapshot)."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = Config.FAISS_NPROBE
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = Config.FAISS_EF_SEARCH
+    return index
+
+
+def search_params(index, mask):
+    """
+    SearchParameters que restringen la búsqueda a los documentos con
+    mask[i] = True (IDSelectorBitmap). Los parámetros de IVF/HNSW se repiten
+    porque los SearchParameters reemplazan a los del índice.
+    """
+    sel = faiss.IDSelectorBitmap(np.packbits(mask, bitorder="little"))
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=sel, nprobe=Config.FAISS_NPROBE)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=Config.FAISS_EF_SEARCH)
+    return faiss.SearchParameters(sel=sel)
+
+
+def is_exact(index) -> bool:
+    return isinstance(index, faiss.IndexFlat)
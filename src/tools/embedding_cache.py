@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.filelock import file_lock
+
+# Serializa los appends al tier en disco entre procesos
+LOCK_FILE = ".lock"
+
+
+def _l2_normalize(vecs):
+    vecs = np.ascontiguousarray(vecs, dtype="float32")
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+def normalize_for_key(text: str) -> str:
+    """Normalización mínima para la llave: NFC + espacios colapsados.
+    No se quitan tildes ni mayúsculas porque el modelo sí las distingue."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings (ya normalizados L2) direccionado por contenido:
+    llave = sha1(model_id + texto normalizado).
+
+    - Queries: LRU en memoria de tamaño `query_capacity`.
+    - Documentos: tier en disco append-only (`vectors.f32` + `keys.txt`) que se
+      lee como np.memmap, así un chunk ya visto nunca vuelve a pasar por el
+      transformer aunque cambie el snapshot del índice.
+    """
+
+    def __init__(self, embedder, model_id, cache_dir=None, query_capacity=1024):
+        self.embedder = embedder
+        self.model_id = model_id
+        self.query_capacity = query_capacity
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {
+            "query_hits": 0,
+            "query_misses": 0,
+            "doc_hits": 0,
+            "doc_misses": 0,
+        }
+
+        self.cache_dir = None
+        self._doc_rows = {}
+        self._doc_vectors = None  # memmap (tier en disco)
+        self._mem_vectors = None  # sin cache_dir: solo en memoria
+        self._dim = None
+        self._disk_sizes = None  # (keys.txt, vectors.f32) tras la última lectura
+        if cache_dir:
+            slug = hashlib.sha1(model_id.encode("utf-8")).hexdigest()[:12]
+            self.cache_dir = os.path.join(cache_dir, slug)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._open_doc_tier()
+
+    def key(self, text: str) -> str:
+        payload = f"{self.model_id}\0{normalize_for_key(text)}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    # Queries (LRU en memoria)
+    def encode_query(self, text: str):
+        """Vector (1, d) normalizado de la query."""
+        return self.encode_queries([text])
+
+    def encode_queries(self, texts):
+        keys = [self.key(t) for t in texts]
+        out = [None] * len(texts)
+        missing = {}
+
+        with self._lock:
+            for i, k in enumerate(keys):
+                vec = self._queries.get(k)
+                if vec is not None:
+                    self._queries.move_to_end(k)
+                    self.counters["query_hits"] += 1
+                    out[i] = vec
+                else:
+                    self.counters["query_misses"] += 1
+                    missing.setdefault(k, []).append(i)
+
+        if missing:
+            # Un solo forward pass para todas las queries no cacheadas
+            miss_keys = list(missing)
+            miss_texts = [texts[missing[k][0]] for k in miss_keys]
+            vecs = _l2_normalize(self._encode(miss_texts))
+            with self._lock:
+                for k, vec in zip(miss_keys, vecs):
+                    self._queries[k] = vec
+                    self._queries.move_to_end(k)
+                    for i in missing[k]:
+                        out[i] = vec
+                while len(self._queries) > self.query_capacity:
+                    self._queries.popitem(last=False)
+
+        return np.vstack(out).astype("float32")
+
+    # Documentos (tier en disco, memory-mapped)
+    def encode_documents(self, texts):
+        """Matriz (n, d) normalizada; solo se embeben los textos no vistos."""
+        if not texts:
+            return np.zeros((0, self._dim or 0), dtype="float32")
+        keys = [self.key(t) for t in texts]
+
+        with self._lock:
+            missing = {}
+            for i, k in enumerate(keys):
+                if k in self._doc_rows or k in missing:
+                    continue
+                missing[k] = i
+
+            hits = len(texts) - len(missing)
+            self.counters["doc_hits"] += hits
+            self.counters["doc_misses"] += len(missing)
+
+        # El forward pass va fuera del lock: encode_query no espera a un build
+        if missing:
+            vecs = _l2_normalize(self._encode([texts[i] for i in missing.values()]))
+
+        with self._lock:
+            if missing:
+                self._append_docs(list(missing), vecs)
+            rows = np.fromiter((self._doc_rows[k] for k in keys), dtype="int64")
+            store = self._doc_vectors if self.cache_dir else self._mem_vectors
+            return np.ascontiguousarray(store[rows], dtype="float32")
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+            out["query_entries"] = len(self._queries)
+            out["doc_entries"] = len(self._doc_rows)
+        q_total = out["query_hits"] + out["query_misses"]
+        d_total = out["doc_hits"] + out["doc_misses"]
+        out["query_hit_rate"] = out["query_hits"] / q_total if q_total else 0.0
+        out["doc_hit_rate"] = out["doc_hits"] / d_total if d_total else 0.0
+        return out
+
+    def _encode(self, texts):
+        return self.embedder.encode(texts, convert_to_numpy=True)
+
+    def _paths(self):
+        return (
+            os.path.join(self.cache_dir, "meta.json"),
+            os.path.join(self.cache_dir, "keys.txt"),
+            os.path.join(self.cache_dir, "vectors.f32"),
+        )
+
+    def _open_doc_tier(self):
+        with file_lock(os.path.join(self.cache_dir, LOCK_FILE)):
+            self._load_doc_tier()
+
+    def _load_doc_tier(self):
+        """Lee el tier en disco (con el lock de archivo tomado)."""
+        meta_path, keys_path, vec_path = self._paths()
+        if not (os.path.exists(meta_path) and os.path.exists(keys_path)):
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model_id") != self.model_id:
+            return
+        self._dim = int(meta["dim"])
+        with open(keys_path, "r", encoding="utf-8") as f:
+            keys = f.read().split()
+
+        # Si un proceso murió a mitad de un append, se descartan las filas
+        # incompletas para que llaves y vectores vuelvan a estar alineados
+        n_rows = min(len(keys), os.path.getsize(vec_path) // (4 * self._dim))
+        if n_rows != len(keys) or os.path.getsize(vec_path) != n_rows * 4 * self._dim:
+            keys = keys[:n_rows]
+            with open(vec_path, "r+b") as f:
+                f.truncate(n_rows * 4 * self._dim)
+            with open(keys_path, "w", encoding="utf-8") as f:
+                f.write("".join(k + "\n" for k in keys))
+        self._doc_rows = {k: i for i, k in enumerate(keys)}
+        self._map_vectors(len(keys))
+        self._disk_sizes = self._tier_sizes()
+
+    def _tier_sizes(self):
+        _meta, keys_path, vec_path = self._paths()
+        return tuple(
+            os.path.getsize(p) if os.path.exists(p) else -1
+            for p in (keys_path, vec_path)
+        )
+
+    def _map_vectors(self, n_rows):
+        _meta, _keys, vec_path = self._paths()
+        if n_rows == 0:
+            self._doc_vectors = np.zeros((0, self._dim or 0), dtype="float32")
+            return
+        self._doc_vectors = np.memmap(
+            vec_path, dtype="float32", mode="r", shape=(n_rows, self._dim)
+        )
+
+    def _append_docs(self, keys, vecs):
+        """Publica vectores nuevos (con self._lock tomado); otro hilo u otro
+        proceso pudo haber agregado alguna de las llaves mientras tanto."""
+        if self.cache_dir is None:
+            fresh = [j for j, k in enumerate(keys) if k not in self._doc_rows]
+            base = len(self._doc_rows)
+            for n, j in enumerate(fresh):
+                self._doc_rows[keys[j]] = base + n
+            prev, vecs = self._mem_vectors, vecs[fresh]
+            self._mem_vectors = vecs if prev is None else np.vstack([prev, vecs])
+            return
+
+        meta_path, keys_path, vec_path = self._paths()
+        # Los appends de varios procesos se serializan: si no, las filas de
+        # vectors.f32 y las líneas de keys.txt pueden quedar desalineadas
+        with file_lock(os.path.join(self.cache_dir, LOCK_FILE)):
+            if self._tier_sizes() != self._disk_sizes:
+                # Otro proceso escribió desde la última lectura
+                self._load_doc_tier()
+            if self._dim is None:
+                self._dim = int(vecs.shape[1])
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model_id": self.model_id, "dim": self._dim}, f)
+                for path in (keys_path, vec_path):
+                    open(path, "wb").close()
+
+            fresh = [j for j, k in enumerate(keys) if k not in self._doc_rows]
+            if fresh:
+                keys = [keys[j] for j in fresh]
+                # Primero los vectores y después las llaves: una llave nunca
+                # apunta a una fila que no está escrita.
+                with open(vec_path, "ab") as f:
+                    f.write(
+                        np.ascontiguousarray(vecs[fresh], dtype="float32").tobytes()
+                    )
+                with open(keys_path, "a", encoding="utf-8") as f:
+                    f.write("".join(k + "\n" for k in keys))
+
+                base = len(self._doc_rows)
+                for j, k in enumerate(keys):
+                    self._doc_rows[k] = base + j
+                self._map_vectors(len(self._doc_rows))
+            self._disk_sizes = self._tier_sizes()
@@ -0,0 +1,205 @@
+import ast
+import operator
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from src.config import Config
+
+# Nodos permitidos: números, + - * / // ** y signo. Todo lo demás (llamadas,
+# nombres, tuplas, `...`) se rechaza al compilar.
+BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: operator.pow,
+}
+UNARY_OPS = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+# Equivalentes vectorizados (** no se vectoriza: es la operación con cotas)
+NUMPY_OPS = {
+    operator.add: np.add,
+    operator.sub: np.subtract,
+    operator.mul: np.multiply,
+    operator.truediv: np.true_divide,
+    operator.floordiv: np.floor_divide,
+    operator.neg: np.negative,
+    operator.pos: np.positive,
+}
+# En float64 los enteros son exactos hasta 2**53; más allá el lote cae al
+# camino escalar para dar exactamente lo mismo que Python
+EXACT_LIMIT = 2.0**53
+# Grupos más chicos que esto no compensan el costo fijo de NumPy
+MIN_VECTOR_GROUP = 8
+
+
+class ExpressionError(ValueError):
+    """Expresión fuera de lo permitido (nodo, tamaño o presupuesto)."""
+
+
+class Program:
+    """
+    Expresión compilada a un programa de pila (postfijo).
+
+    `ops`: tupla de (operador, aridad) o (None, 0) para cargar la siguiente
+    constante de `consts`. `template` es el programa sin los valores de las
+    constantes (y el tipo del resultado): dos expresiones con la misma forma
+    ("20 + 5", "3 + 4") se evalúan juntas en evaluate_batch.
+    """
+
+    __slots__ = ("ops", "consts", "template", "is_float", "vectorizable")
+
+    def __init__(self, ops, consts):
+        self.ops = tuple(ops)
+        self.consts = tuple(consts)
+        kinds = {fn for fn, _ in self.ops}
+        # Python da float si hay una división o alguna constante float
+        self.is_float = operator.truediv in kinds or any(
+            isinstance(c, float) for c in self.consts
+        )
+        self.template = (self.ops, self.is_float)
+        self.vectorizable = operator.pow not in kinds and all(
+            abs(c) < EXACT_LIMIT for c in self.consts
+        )
+
+    def run(self):
+        deadline = time.perf_counter() + Config.CALC_TIME_BUDGET_S
+        stack, consts = [], iter(self.consts)
+        for fn, arity in self.ops:
+            if fn is None:
+                stack.append(next(consts))
+            elif arity == 1:
+                stack.append(fn(stack.pop()))
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                if fn is operator.pow:
+                    _check_power(a, b)
+                stack.append(fn(a, b))
+            _check_size(stack[-1])
+            if time.perf_counter() > deadline:
+                raise ExpressionError("time budget exceeded")
+        return stack[0]
+
+
+def _check_size(value):
+    if isinstance(value, int) and value.bit_length() > Config.CALC_MAX_INT_BITS:
+        raise ExpressionError("integer result too large")
+
+
+def _check_power(base, exponent):
+    if abs(exponent) > Config.CALC_MAX_EXPONENT:
+        raise ExpressionError("exponent too large")
+    # Con enteros el costo crece con el tamaño del resultado: se estima antes
+    if isinstance(base, int) and isinstance(exponent, int) and abs(base) > 1:
+        if base.bit_length() * exponent > Config.CALC_MAX_INT_BITS:
+            raise ExpressionError("integer result too large")
+
+
+@lru_cache(maxsize=Config.CALC_CACHE_SIZE)
+def compile_expression(expr: str) -> Program:
+    """
+    Parsea (con ast, así los errores de sintaxis son los mismos SyntaxError
+    que daría eval) y valida `expr` una sola vez: cacheado por texto.
+    """
+    tree = ast.parse(expr, "<string>", mode="eval")
+    # Conteo iterativo antes de recorrer recursivamente
+    if sum(1 for _ in ast.walk(tree)) > 2 * Config.CALC_MAX_STEPS:
+        raise ExpressionError("expression too complex")
+    ops, consts = [], []
+    _emit(tree.body, ops, consts)
+    if len(ops) > Config.CALC_MAX_STEPS:
+        raise ExpressionError("expression too complex")
+    return Program(ops, consts)
+
+
+def _emit(node, ops, consts):
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        _check_size(node.value)
+        ops.append((None, 0))
+        consts.append(node.value)
+    elif isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+        _emit(node.left, ops, consts)
+        _emit(node.right, ops, consts)
+        ops.append((BINARY_OPS[type(node.op)], 2))
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPS:
+        _emit(node.operand, ops, consts)
+        ops.append((UNARY_OPS[type(node.op)], 1))
+    else:
+        raise ExpressionError(f"unsupported expression: {type(node).__name__}")
+
+
+def evaluate(expr: str):
+    """Valor de `expr` (int o float, como eval) o la excepción correspondiente."""
+    return compile_expression(expr).run()
+
+
+def evaluate_batch(exprs) -> list:
+    """
+    Evalúa varias expresiones: las que comparten forma se calculan juntas
+    con NumPy (una columna por constante). Devuelve, por expresión, su valor
+    o la excepción que daría evaluate(); las filas que en float64 no darían
+    exactamente lo mismo (división por cero, no finitos, enteros > 2**53) y
+    las que usan ** se evalúan por el camino escalar.
+    """
+    exprs = list(exprs)
+    results = [None] * len(exprs)
+    # Cada expresión se parsea una sola vez, también las que caen a escalar
+    programs, groups, scalar = {}, {}, []
+    for i, expr in enumerate(exprs):
+        try:
+            program = programs[i] = compile_expression(expr)
+        except Exception as e:
+            results[i] = e
+            continue
+        if program.vectorizable:
+            groups.setdefault(program.template, []).append((i, program))
+        else:
+            scalar.append(i)
+
+    for template, members in groups.items():
+        if len(members) < MIN_VECTOR_GROUP:
+            scalar.extend(i for i, _ in members)
+            continue
+        values, bad = _run_vectorized(
+            members[0][1].ops,
+            np.array([p.consts for _, p in members], dtype="float64"),
+        )
+        as_type = float if members[0][1].is_float else int
+        for (i, _), value, fallback in zip(members, values.tolist(), bad.tolist()):
+            if fallback:
+                scalar.append(i)
+            else:
+                results[i] = as_type(value)
+
+    for i in scalar:
+        try:
+            results[i] = programs[i].run()
+        except Exception as e:
+            results[i] = e
+    return results
+
+
+def _run_vectorized(ops, consts):
+    """(valores, filas a recalcular en escalar) de un lote (filas x constantes)."""
+    n_rows = consts.shape[0]
+    bad = np.zeros(n_rows, dtype=bool)
+    stack, column = [], 0
+    with np.errstate(all="ignore"):
+        for fn, arity in ops:
+            if fn is None:
+                value = consts[:, column]
+                column += 1
+            elif arity == 1:
+                value = NUMPY_OPS[fn](stack.pop())
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                if fn in (operator.truediv, operator.floordiv):
+                    bad |= b == 0
+                value = NUMPY_OPS[fn](a, b)
+            bad |= ~np.isfinite(value) | (np.abs(value) >= EXACT_LIMIT)
+            stack.append(value)
+    return stack[0], bad
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from collections.abc import Sequence
+
+import faiss
+import numpy as np
+
+from src.tools.bm25 import BM25Index
+from src.utils.filelock import file_lock
+
+# Subir este número cuando cambie el formato de los chunks o de los artefactos
+INDEX_FORMAT_VERSION = 3
+
+MANIFEST_FILE = "manifest.json"
+DOCUMENTS_TABLE = "documents"  # documents.bin + documents.offsets.npy
+SOURCES_TABLE = "sources"
+EMBEDDINGS_FILE = "embeddings.npy"
+FAISS_FILE = "dense.faiss"
+BM25_DIR = "bm25"
+
+# Cada snapshot vive en su propio directorio `v-<fingerprint>-<sufijo>` dentro
+# de INDEX_DIR; CURRENT tiene el nombre del vigente y se reemplaza de forma
+# atómica. Los directorios en construcción empiezan con TMP_PREFIX.
+CURRENT_FILE = "CURRENT"
+VERSION_PREFIX = "v-"
+TMP_PREFIX = ".tmp-"
+BUILD_LOCK_FILE = ".build.lock"
+PUBLISH_LOCK_FILE = ".publish.lock"
+# Un directorio temporal más viejo que esto es de un build que murió
+STALE_TMP_S = 24 * 3600
+
+
+class MappedStrings(Sequence):
+    """
+    Lista de strings de solo lectura sobre un blob UTF-8 mapeado en memoria
+    (`<name>.bin`) y sus offsets (`<name>.offsets.npy`). Cada string se
+    decodifica al pedirlo, así los procesos que abren la misma tabla
+    comparten las páginas del archivo en vez de tener cada uno su lista.
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.offsets = np.load(
+            os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r"
+        )
+        with open(os.path.join(directory, f"{name}.bin"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap no acepta archivos vacíos
+            self.blob = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.blob[self.offsets[i] : self.offsets[i + 1]].decode("utf-8")
+
+
+def write_string_table(directory: str, name: str, strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="int64")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def hash_pdf_files(data_dir: str) -> dict:
+    """{filename: sha256} de los PDFs del directorio de datos (orden estable)."""
+    if not os.path.exists(data_dir):
+        return {}
+    return {
+        filename: file_sha256(os.path.join(data_dir, filename))
+        for filename in sorted(os.listdir(data_dir))
+        if filename.endswith(".pdf")
+    }
+
+
+def index_fingerprint(model_id: str, file_hashes: dict) -> str:
+    """Versión del índice: cambia si cambia el modelo, el formato o algún PDF."""
+    payload = json.dumps(
+        {
+            "format_version": INDEX_FORMAT_VERSION,
+            "model_id": model_id,
+            "files": file_hashes,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def is_snapshot_valid(manifest: dict, model_id: str, file_hashes: dict) -> bool:
+    return (
+        manifest.get("format_version") == INDEX_FORMAT_VERSION
+        and manifest.get("model_id") == model_id
+        and manifest.get("files") == file_hashes
+    )
+
+
+def can_update_incrementally(manifest: dict, model_id: str) -> bool:
+    """Los chunks del snapshot se pueden reutilizar si el modelo y formato coinciden."""
+    return (
+        manifest.get("format_version") == INDEX_FORMAT_VERSION
+        and manifest.get("model_id") == model_id
+    )
+
+
+def diff_file_hashes(old_hashes: dict, new_hashes: dict):
+    """
+    Compara los hashes del snapshot con los actuales.
+    Devuelve (archivos a (re)extraer, archivos cuyos chunks hay que eliminar).
+    """
+    to_extract = [f for f, h in new_hashes.items() if old_hashes.get(f) != h]
+    stale = {f for f, h in old_hashes.items() if new_hashes.get(f) != h}
+    return to_extract, stale
+
+
+def snapshot_lock(index_dir: str):
+    """
+    Lock del build del índice entre procesos: quien lo tiene construye y los
+    demás, al obtenerlo, vuelven a intentar cargar lo que aquél publicó.
+    """
+    return file_lock(os.path.join(index_dir, BUILD_LOCK_FILE))
+
+
+def current_snapshot_dir(index_dir: str):
+    """
+    Directorio del snapshot vigente según CURRENT, o `index_dir` si tiene el
+    formato anterior (artefactos sueltos), o None.
+    """
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        name = ""
+    if name:
+        return os.path.join(index_dir, name)
+    if os.path.exists(os.path.join(index_dir, MANIFEST_FILE)):
+        return index_dir
+    return None
+
+
+def save_snapshot(
+    index_dir,
+    model_id,
+    file_hashes,
+    documents,
+    sources,
+    embeddings,
+    index,
+    bm25,
+    dense_spec=None,
+):
+    """
+    Escribe el snapshot en un directorio temporal propio y lo publica
+    reemplazando CURRENT (os.replace, atómico también en Windows): un
+    proceso que carga a la vez ve el snapshot anterior o el nuevo completo,
+    y dos builders nunca comparten directorio.
+
+    Todo queda en formato mapeable: textos como tablas de strings, embeddings
+    y arreglos de BM25 como .npy. Solo FAISS y el vocabulario BM25 se leen
+    al heap de cada proceso.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=TMP_PREFIX, dir=index_dir)
+
+    manifest = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "model_id": model_id,
+        "files": file_hashes,
+        "fingerprint": index_fingerprint(model_id, file_hashes),
+        "num_chunks": len(documents),
+        "dim": int(embeddings.shape[1]),
+        "dense_index": dense_spec or {"type": "flat"},
+    }
+
+    try:
+        write_string_table(tmp_dir, DOCUMENTS_TABLE, documents)
+        write_string_table(tmp_dir, SOURCES_TABLE, sources)
+        np.save(os.path.join(tmp_dir, EMBEDDINGS_FILE), embeddings)
+        faiss.write_index(index, os.path.join(tmp_dir, FAISS_FILE))
+        bm25.save(os.path.join(tmp_dir, BM25_DIR))
+        # El manifest va al final: sin manifest el snapshot está incompleto
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    suffix = os.path.basename(tmp_dir)[len(TMP_PREFIX) :]
+    version = f"{VERSION_PREFIX}{manifest['fingerprint']}-{suffix}"
+    with file_lock(os.path.join(index_dir, PUBLISH_LOCK_FILE)):
+        os.rename(tmp_dir, os.path.join(index_dir, version))
+        previous = current_snapshot_dir(index_dir)
+        _replace_current(index_dir, version)
+        # Se conserva el anterior: un proceso pudo haber leído CURRENT justo
+        # antes del cambio y estar abriendo sus archivos
+        keep = {version, os.path.basename(previous or "")}
+        _remove_old_snapshots(index_dir, keep)
+    return manifest
+
+
+def _replace_current(index_dir, version):
+    tmp_path = os.path.join(index_dir, f"{CURRENT_FILE}.{os.getpid()}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    for attempt in range(50):
+        try:
+            os.replace(tmp_path, os.path.join(index_dir, CURRENT_FILE))
+            return
+        except PermissionError:
+            # Windows: un lector tiene CURRENT abierto en este instante
+            if attempt == 49:
+                raise
+            time.sleep(0.05)
+
+
+def _remove_old_snapshots(index_dir, keep):
+    """
+    Borra versiones viejas, temporales abandonados y los artefactos del
+    formato anterior. Lo que sigue mapeado (Windows) se deja para la próxima.
+    """
+    now = time.time()
+    for name in os.listdir(index_dir):
+        path = os.path.join(index_dir, name)
+        if name.startswith(VERSION_PREFIX) and name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+        elif name.startswith(TMP_PREFIX) and now - os.path.getmtime(path) > STALE_TMP_S:
+            shutil.rmtree(path, ignore_errors=True)
+    legacy = [
+        MANIFEST_FILE,
+        f"{DOCUMENTS_TABLE}.bin",
+        f"{DOCUMENTS_TABLE}.offsets.npy",
+        f"{SOURCES_TABLE}.bin",
+        f"{SOURCES_TABLE}.offsets.npy",
+        EMBEDDINGS_FILE,
+        FAISS_FILE,
+    ]
+    for name in legacy:
+        try:
+            os.remove(os.path.join(index_dir, name))
+        except OSError:
+            pass
+    shutil.rmtree(os.path.join(index_dir, BM25_DIR), ignore_errors=True)
+
+
+def load_manifest(index_dir: str):
+    """Manifest del snapshot vigente de `index_dir`, o None."""
+    snapshot_dir = current_snapshot_dir(index_dir)
+    return _read_manifest(snapshot_dir) if snapshot_dir else None
+
+
+def _read_manifest(snapshot_dir: str):
+    path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_snapshot(index_dir: str):
+    """
+    Devuelve un dict con manifest, documents, sources, embeddings, index y bm25,
+    o None si el snapshot no existe o está corrupto.
+    """
+    # CURRENT se lee una sola vez: todo sale del mismo directorio de versión
+    snapshot_dir = current_snapshot_dir(index_dir)
+    if snapshot_dir is None:
+        return None
+    manifest = _read_manifest(snapshot_dir)
+    if manifest is None or manifest.get("format_version") != INDEX_FORMAT_VERSION:
+        return None
+
+    try:
+        documents = MappedStrings(snapshot_dir, DOCUMENTS_TABLE)
+        sources = MappedStrings(snapshot_dir, SOURCES_TABLE)
+        # mmap: los vectores completos solo se usan para re-rankear candidatos,
+        # así que no hace falta tenerlos residentes en RAM
+        embeddings = np.load(os.path.join(snapshot_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        index = faiss.read_index(os.path.join(snapshot_dir, FAISS_FILE))
+        bm25 = BM25Index.load(os.path.join(snapshot_dir, BM25_DIR))
+    except Exception as e:
+        print(f"[RAG] Snapshot inválido en {snapshot_dir}: {e}")
+        return None
+
+    num_chunks = len(documents)
+    if num_chunks != manifest.get("num_chunks") or index.ntotal != num_chunks:
+        return None
+
+    return {
+        "manifest": manifest,
+        "documents": documents,
+        "sources": sources,
+        "embeddings": embeddings,
+        "index": index,
+        "bm25": bm25,
+    }
@@ -0,0 +1,93 @@
+"""
+Extracción de tablas de los PDFs en paralelo.
+
+Este módulo solo depende de pdfplumber para que los procesos hijos (spawn)
+arranquen rápido sin importar torch/faiss. Aquí solo se hace el trabajo
+CPU-bound (page.extract_tables); la máquina de estados de cabeceras y
+columnas se aplica después, en orden, en RAGTool._rows_to_chunks.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import pdfplumber
+
+
+def clean_table_rows(tables):
+    """Aplana las tablas de una página en filas limpias (sin filas vacías)."""
+    rows = []
+    for table in tables or []:
+        for row in table:
+            clean_row = [str(c).replace("\n", " ").strip() if c else "" for c in row]
+            if any(clean_row):
+                rows.append(clean_row)
+    return rows
+
+
+def extract_page_rows(file_path: str, start: int, end: int):
+    """Filas de las páginas [start, end) de un PDF. Se ejecuta en un worker."""
+    rows = []
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages[start:end]:
+            rows.extend(clean_table_rows(page.extract_tables()))
+    return rows
+
+
+def count_pages(file_path: str) -> int:
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def _run_task(task):
+    file_path, start, end = task
+    try:
+        return extract_page_rows(file_path, start, end), None
+    except Exception as e:
+        return [], f"{e}"
+
+
+def extract_rows(file_paths, workers=None, pages_per_task=4):
+    """
+    Devuelve {file_path: (filas en orden de página, error o None)}.
+
+    Cada PDF se parte en bloques de `pages_per_task` páginas que se reparten
+    en un pool de procesos; los resultados se reensamblan en el orden original
+    (archivo, página), así que la salida es idéntica a la extracción serial.
+    Si un bloque falla, se conservan las filas de los bloques anteriores del
+    mismo archivo y se descarta el resto (igual que el loop serial original).
+    """
+    workers = workers or os.cpu_count() or 1
+
+    tasks, errors = [], {}
+    for file_path in file_paths:
+        try:
+            n_pages = count_pages(file_path)
+        except Exception as e:
+            errors[file_path] = f"{e}"
+            continue
+        for start in range(0, n_pages, pages_per_task):
+            tasks.append((file_path, start, min(start + pages_per_task, n_pages)))
+
+    if workers <= 1 or len(tasks) <= 1:
+        results = map(_run_task, tasks)
+        return _assemble(file_paths, tasks, results, errors)
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(tasks)), mp_context=ctx
+    ) as ex:
+        results = list(ex.map(_run_task, tasks))
+    return _assemble(file_paths, tasks, results, errors)
+
+
+def _assemble(file_paths, tasks, results, errors):
+    rows_by_file = {fp: [] for fp in file_paths}
+    for (file_path, _start, _end), (rows, error) in zip(tasks, results):
+        if file_path in errors:
+            continue
+        if error is not None:
+            errors[file_path] = error
+            continue
+        rows_by_file[file_path].extend(rows)
+    return {fp: (rows_by_file[fp], errors.get(fp)) for fp in file_paths}
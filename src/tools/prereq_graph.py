@@ -0,0 +1,249 @@
+import re
+
+import numpy as np
+
+# Códigos dentro del campo "Pre-requisito" ("CC211 CM2H1", "Ninguno")
+PREREQ_CODE_RE = re.compile(r"\b[A-Z]{2,3}[0-9][0-9A-Z]{1,2}\b")
+
+
+class PrereqCycleError(ValueError):
+    """El grafo de prerrequisitos tiene un ciclo (nadie podría llevar esos cursos)."""
+
+
+class PrereqGraph:
+    """
+    Grafo de prerrequisitos con los cursos como bits.
+
+    Al construirse calcula el orden topológico (Kahn; un ciclo es un error de
+    carga) y, para cada curso, dos bitsets de `n_words` palabras uint64:
+    sus prerrequisitos directos y la clausura transitiva (todo lo que hay
+    que aprobar antes). Un historial de alumno es otro bitset, así que las
+    consultas para muchos alumnos son AND/OR/NOT vectorizados sobre una
+    matriz (alumnos x palabras). Se asume que quien aprobó un curso aprobó
+    también sus requisitos.
+
+    `prereqs`: {código: [códigos de sus prerrequisitos directos]}. Los
+    prerrequisitos que no son cursos del catálogo también quedan como nodos
+    (sin requisitos propios).
+    """
+
+    def __init__(self, prereqs: dict, names=None):
+        codes = list(prereqs)
+        for reqs in prereqs.values():
+            codes.extend(r for r in reqs if r not in prereqs)
+        self.codes = list(dict.fromkeys(codes))
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.names = dict(names or {})
+        # Orden original de los requisitos (para los mensajes)
+        self.prereqs = {code: list(prereqs.get(code, [])) for code in self.codes}
+
+        n = len(self.codes)
+        self.n_words = max(1, (n + 63) // 64)
+        self.direct = np.zeros((n, self.n_words), dtype=np.uint64)
+        for code, reqs in self.prereqs.items():
+            self.direct[self.index[code]] = self.encode_one(reqs)
+
+        self.order = self._topological_order()
+        self.rank = np.empty(n, dtype="int64")
+        self.rank[self.order] = np.arange(n)
+
+        # Clausura: en orden topológico los requisitos ya están cerrados
+        self.closure = np.zeros_like(self.direct)
+        for i in self.order:
+            acc = self.direct[i].copy()
+            for code in self.prereqs[self.codes[i]]:
+                acc |= self.closure[self.index[code]]
+            self.closure[i] = acc
+
+    @classmethod
+    def from_catalog(cls, catalog: dict):
+        """Desde el formato {código: {"name", "prereqs"}} de VerificationTool."""
+        return cls(
+            {code: c["prereqs"] for code, c in catalog.items()},
+            names={code: c["name"] for code, c in catalog.items()},
+        )
+
+    @classmethod
+    def from_records(cls, records, universidad=None):
+        """
+        Desde los cursos de un RecordStore (código + Pre-requisito).
+        `universidad` es un alias ("UNI", "San Marcos") que se resuelve con
+        RecordStore.match_tags; si no calza con ningún tag es un error. Si un
+        código aparece más de una vez se queda la primera fila.
+        """
+        tags = None
+        if universidad is not None:
+            tags = set(records.match_tags(universidad))
+            if not tags:
+                raise ValueError(
+                    f"La universidad {universidad!r} no calza con ningún tag "
+                    f"de los registros: {', '.join(records.tags()) or '(ninguno)'}"
+                )
+        prereqs, names = {}, {}
+        for i in range(records.n_docs):
+            rec = records.record(i)
+            code = rec["codigo"]
+            if not code or code in prereqs:
+                continue
+            if tags is not None and rec["tag"] not in tags:
+                continue
+            prereqs[code] = PREREQ_CODE_RE.findall(rec["requisito"] or "")
+            names[code] = rec["nombre"]
+        return cls(prereqs, names=names)
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def __len__(self):
+        return len(self.codes)
+
+    # Bitsets
+
+    def encode_one(self, codes) -> np.ndarray:
+        row = np.zeros(self.n_words, dtype=np.uint64)
+        for code in codes:
+            i = self.index.get(code)
+            if i is not None:
+                row[i // 64] |= np.uint64(1) << np.uint64(i % 64)
+        return row
+
+    def encode(self, histories) -> np.ndarray:
+        """
+        Matriz (alumnos x palabras) con los cursos aprobados de cada uno,
+        completada con la clausura de lo aprobado.
+        """
+        rows, cols = [], []
+        n_students = 0
+        for s, history in enumerate(histories):
+            n_students += 1
+            for code in history:
+                i = self.index.get(code)
+                if i is not None:
+                    rows.append(s)
+                    cols.append(i)
+        out = np.zeros((n_students, self.n_words), dtype=np.uint64)
+        cols = np.asarray(cols, dtype=np.uint64)
+        bits = np.left_shift(np.uint64(1), cols % np.uint64(64))
+        np.bitwise_or.at(out, (np.asarray(rows, dtype="int64"), cols // 64), bits)
+
+        # Quien aprobó un curso aprobó también todo lo que exige
+        passed = self._bits(out)
+        for i in np.flatnonzero(passed.any(axis=0) & self.closure.any(axis=1)):
+            out[passed[:, i]] |= self.closure[i]
+        return out
+
+    def decode(self, row) -> list:
+        """Códigos de un bitset, en orden topológico."""
+        bits = np.unpackbits(
+            np.ascontiguousarray(row, dtype=np.uint64).view(np.uint8),
+            bitorder="little",
+        )[: len(self.codes)]
+        ids = np.flatnonzero(bits)
+        return [self.codes[i] for i in ids[np.argsort(self.rank[ids], kind="stable")]]
+
+    def _decode_rows(self, matrix) -> list:
+        """decode de cada fila de una matriz de bitsets."""
+        in_order = self._bits(matrix)[:, self.order]
+        codes = np.asarray(self.codes, dtype=object)[self.order]
+        return [codes[row].tolist() for row in in_order]
+
+    def _bits(self, matrix) -> np.ndarray:
+        """(alumnos x palabras) -> (alumnos x cursos) booleano."""
+        m = np.ascontiguousarray(matrix, dtype=np.uint64)
+        bits = np.unpackbits(m.view(np.uint8), axis=-1, bitorder="little")
+        return bits[..., : len(self.codes)].astype(bool)
+
+    # Consultas en bloque (una fila por alumno)
+
+    def eligible(self, histories) -> np.ndarray:
+        """
+        (alumnos x cursos) booleano: cursos que cada alumno puede llevar ya
+        (no aprobados y con todos los requisitos directos aprobados).
+        """
+        passed = self.encode(histories)
+        # Requisitos directos que le faltan a cada alumno para cada curso
+        lacking = self.direct[None, :, :] & ~passed[:, None, :]
+        ready = ~lacking.any(axis=-1)
+        return ready & ~self._bits(passed)
+
+    def can_take(self, code, histories) -> np.ndarray:
+        """
+        Vector booleano (uno por alumno): quién puede llevar `code` ya. Solo
+        mira la fila del curso, así que escala a cohortes grandes.
+        """
+        i = self.index[code]
+        passed = self.encode(histories)
+        lacking = (self.direct[i][None, :] & ~passed).any(axis=1)
+        taken = (passed[:, i // 64] >> np.uint64(i % 64)) & np.uint64(1)
+        return ~lacking & (taken == 0)
+
+    def eligible_courses(self, histories) -> list:
+        """Códigos de eligible() por alumno, en orden topológico."""
+        codes = np.asarray(self.codes, dtype=object)[self.order]
+        return [codes[row].tolist() for row in self.eligible(histories)[:, self.order]]
+
+    def missing_chain(self, code, histories) -> list:
+        """
+        Para cada alumno, todo lo que le falta aprobar antes de `code`
+        (clausura transitiva menos su historial), en orden topológico.
+        """
+        missing = self.closure[self.index[code]][None, :] & ~self.encode(histories)
+        return self._decode_rows(missing)
+
+    def path_to(self, code, histories) -> list:
+        """
+        Ruta más corta a `code` por alumno: los cursos que faltan (incluido
+        `code` si no lo aprobó) agrupados por ciclo, llevando en cada ciclo
+        todo lo que ya se puede. El número de ciclos es la cadena más larga
+        de requisitos pendientes. Lista vacía si ya lo aprobó.
+        """
+        target = self.index[code]
+        passed = self._bits(self.encode(histories))
+        needed = self._bits(self.closure[target][None, :])[0]
+        needed[target] = True
+
+        # Ciclo en que se puede llevar cada curso (0 = ya aprobado o no hace
+        # falta), calculado en orden topológico para todos los alumnos a la vez
+        term = np.zeros(passed.shape, dtype="int64")
+        for i in self.order:
+            if not needed[i]:
+                continue
+            reqs = [self.index[r] for r in self.prereqs[self.codes[i]]]
+            after = term[:, reqs].max(axis=1) if reqs else 0
+            term[:, i] = np.where(passed[:, i], 0, after + 1)
+
+        ids = self.order[needed[self.order]]
+        paths = []
+        for row in term[:, ids]:
+            steps = [[] for _ in range(row.max())]
+            for i, t in zip(ids, row):
+                if t:
+                    steps[t - 1].append(self.codes[i])
+            paths.append(steps)
+        return paths
+
+    def _topological_order(self) -> np.ndarray:
+        n = len(self.codes)
+        indegree = np.zeros(n, dtype="int64")
+        dependents = [[] for _ in range(n)]
+        for code, reqs in self.prereqs.items():
+            for r in reqs:
+                indegree[self.index[code]] += 1
+                dependents[self.index[r]].append(self.index[code])
+
+        queue = [i for i in range(n) if indegree[i] == 0]
+        order = []
+        while queue:
+            i = queue.pop(0)
+            order.append(i)
+            for j in dependents[i]:
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    queue.append(j)
+
+        if len(order) < n:
+            stuck = sorted(self.codes[i] for i in range(n) if indegree[i] > 0)
+            raise PrereqCycleError(
+                f"Ciclo en los prerrequisitos entre: {', '.join(stuck)}"
+            )
+        return np.asarray(order, dtype="int64")
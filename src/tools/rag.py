@@ -1,96 +1,272 @@
+import hashlib
 import os
 import re
-import unicodedata
 import numpy as np
-import faiss
-import pdfplumber
-from rank_bm25 import BM25Okapi
 from sentence_transformers import SentenceTransformer
 
 from src.tools.base import BaseTool
+from src.tools.text import count_words, normalize_text, take_within_budget, tokenize
+from src.tools.bm25 import BM25Index
+from src.tools.dense_index import (
+    build_dense_index,
+    configure_search,
+    dense_index_spec,
+    is_exact,
+    search_params,
+)
+from src.tools.embedding_cache import EmbeddingCache
+from src.tools.records import RecordStore, format_course_record
 from src.config import Config
-
-STOPWORDS_ES = {
-    "que",
-    "de",
-    "la",
-    "el",
-    "en",
-    "y",
-    "a",
-    "los",
-    "las",
-    "un",
-    "una",
-    "es",
-    "del",
-    "al",
-    "por",
-    "para",
-    "cual",
-    "cuales",
-    "cuál",
-    "cuáles",
-    "qué",
-    "hay",
-    "son",
-    "donde",
-    "dónde",
-    "pertenece",
-    "pertenecen",
-    "curso",
-    "cursos",
-    "uni",
-    "obligatorio",
-    "electivo",
-    "electivos",
-    "obligatoria",
-    "obligatorios",
+from src.query import extract_intent
+from src.utils import tracing
+from src.tools.index_store import (
+    can_update_incrementally,
+    diff_file_hashes,
+    hash_pdf_files,
+    index_fingerprint,
+    is_snapshot_valid,
+    load_snapshot,
+    save_snapshot,
+    snapshot_lock,
+)
+
+# En este caso para el E1 solo se usará un PDF del plan de estudio de la UNI
+UNI_MAP = {
+    "sanMarcos": "[UNMSM San Marcos]",
+    "2018-N6": "[UNI Universidad Nacional de Ingenieria]",
+    "FDM": "[UPC]",
+    "Plan-estudios": "[UCSP]",
 }
 
+# Fuente del documento de relleno cuando no hay PDFs que indexar
+ERROR_SOURCE = "<error>"
 
-def normalize_text(s: str) -> str:
-    """Lowercase + sin tildes + sin puntuación (mantiene letras/números)."""
-    s = (s or "").lower()
-    s = unicodedata.normalize("NFD", s)
-    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")  # quita tildes
-    s = re.sub(r"[^a-z0-9]+", " ", s)  # quita puntuación
-    return s.strip()
-
-
-def tokenize(s: str):
-    """Tokens para BM25: normaliza y filtra stopwords."""
-    toks = normalize_text(s).split()
-    return [t for t in toks if t and t not in STOPWORDS_ES]
+NO_ELECTIVES = {
+    "Electivo de Especialidad": "No encontré electivos de especialidad.",
+    "Electivo Complementario": "No encontré electivos complementarios.",
+}
 
 
 class RAGTool(BaseTool):
-    def __init__(self, preloaded_docs=None):
+    def __init__(self, preloaded_docs=None, snapshot=None):
+        """
+        `preloaded_docs`: corpus inyectado (tests), indexado en memoria.
+        `snapshot`: artefactos ya cargados por otro proceso (ver
+        shared_index.load_shared_index), para los workers del servidor
+        pre-fork; si no, se carga o construye el snapshot de INDEX_DIR.
+        """
         super().__init__(name="rag")
         self.data_dir = Config.DATA_PATH
+        self.index_dir = Config.INDEX_DIR
 
         print("[RAG] Inicializando RAG Híbrido con Lógica de Ciclos/Electivos...")
 
+        self.embedder = SentenceTransformer(Config.EMBEDDING_MODEL_ID)
+        # Los corpus inyectados (tests) no escriben el tier de disco
+        self.embedding_cache = EmbeddingCache(
+            self.embedder,
+            Config.EMBEDDING_MODEL_ID,
+            cache_dir=(
+                None
+                if preloaded_docs or not Config.USE_EMBEDDING_CACHE
+                else Config.EMBEDDING_CACHE_DIR
+            ),
+            query_capacity=Config.QUERY_CACHE_SIZE,
+        )
+
         if preloaded_docs:
-            self.documents = preloaded_docs
+            # Corpus inyectado (tests): se indexa en memoria, sin snapshot
+            self.documents = list(preloaded_docs)
+            self.sources = ["<preloaded>"] * len(self.documents)
+            corpus_hash = hashlib.sha256(
+                "\n".join(self.documents).encode("utf-8")
+            ).hexdigest()
+            self.index_version = index_fingerprint(
+                Config.EMBEDDING_MODEL_ID, {"<preloaded>": corpus_hash}
+            )
+            self._build_indexes(self._encode_documents(self.documents))
+        elif snapshot is not None:
+            self._adopt_snapshot(snapshot)
         else:
-            self.documents = self._load_pdfs()
+            self._load_or_build_index()
+
+        # Campos estructurados (código, ciclo, tipo, universidad) + índices hash
+        self.records = (snapshot or {}).get("records") or RecordStore(self.documents)
+
+        print(f"[RAG] Indexados {len(self.documents)} fragmentos enriquecidos.")
+
+    def _load_or_build_index(self):
+        """
+        Reutiliza el snapshot en disco si fue construido con los mismos PDFs
+        y el mismo modelo de embeddings; si no, parsea, embebe y lo guarda.
+        """
+        file_hashes = hash_pdf_files(self.data_dir)
+        self.index_version = index_fingerprint(Config.EMBEDDING_MODEL_ID, file_hashes)
+
+        if not Config.USE_INDEX_SNAPSHOT:
+            self._build_index(file_hashes)
+            return
+
+        snapshot = load_snapshot(self.index_dir)
+        if self._is_current(snapshot, file_hashes):
+            print(f"[RAG] Snapshot {self.index_version} cargado desde disco.")
+            self._adopt_snapshot(snapshot)
+            return
+
+        # Un solo proceso construye a la vez; el que esperaba vuelve a cargar
+        # por si el otro ya publicó el snapshot que necesita
+        with snapshot_lock(self.index_dir):
+            self._load_or_build_locked(file_hashes)
+
+    def _is_current(self, snapshot, file_hashes):
+        return (
+            snapshot is not None
+            and is_snapshot_valid(
+                snapshot["manifest"], Config.EMBEDDING_MODEL_ID, file_hashes
+            )
+            and snapshot["manifest"].get("dense_index") == dense_index_spec()
+        )
+
+    def _load_or_build_locked(self, file_hashes):
+        snapshot = load_snapshot(self.index_dir)
+        if snapshot and is_snapshot_valid(
+            snapshot["manifest"], Config.EMBEDDING_MODEL_ID, file_hashes
+        ):
+            print(f"[RAG] Snapshot {self.index_version} cargado desde disco.")
+            self._adopt_snapshot(snapshot)
+            if snapshot["manifest"].get("dense_index") != dense_index_spec():
+                # Cambió el tipo/parámetros del índice denso: se reconstruye
+                # desde los embeddings guardados, sin volver a embeber.
+                print(f"[RAG] Reconstruyendo índice denso {dense_index_spec()}")
+                self.index = build_dense_index(self.embeddings)
+                self._save_snapshot(file_hashes)
+            return
+
+        if (
+            snapshot
+            and Config.INCREMENTAL_INDEX
+            and can_update_incrementally(
+                snapshot["manifest"], Config.EMBEDDING_MODEL_ID
+            )
+        ):
+            self._update_index(snapshot, file_hashes)
+            return
+
+        self._build_index(file_hashes)
+
+    def _build_index(self, file_hashes):
+        self.documents, self.sources = self._load_files(list(file_hashes))
+
+        has_docs = bool(self.documents)
+        if not has_docs:
+            self.documents = ["Error: No se pudieron cargar documentos."]
+            self.sources = [ERROR_SOURCE]
+
+        self._build_indexes(self._encode_documents(self.documents))
+
+        if Config.USE_INDEX_SNAPSHOT and has_docs:
+            self._save_snapshot(file_hashes)
+            print(f"[RAG] Snapshot {self.index_version} guardado en {self.index_dir}")
+
+    def _adopt_snapshot(self, snapshot):
+        """Usa los artefactos de un snapshot (textos y arreglos mapeados)."""
+        self.index_version = snapshot["manifest"]["fingerprint"]
+        self.documents = snapshot["documents"]
+        self.sources = snapshot["sources"]
+        self.embeddings = snapshot["embeddings"]
+        self.bm25 = snapshot["bm25"]
+        self.index = configure_search(snapshot["index"])
+
+    def _update_index(self, snapshot, file_hashes):
+        """
+        Reindexado incremental: solo se extraen y embeben los PDFs nuevos o
+        modificados; los chunks de PDFs eliminados/modificados se quitan de FAISS
+        y el resto del snapshot se reutiliza tal cual.
+        """
+        to_extract, stale = diff_file_hashes(snapshot["manifest"]["files"], file_hashes)
+        print(
+            f"[RAG] Actualización incremental: {len(to_extract)} PDF(s) a procesar, "
+            f"{len(stale)} PDF(s) con chunks obsoletos."
+        )
+
+        sources = snapshot["sources"]
+        # El documento de error de un snapshot sin PDFs tampoco se conserva
+        keep = [
+            i
+            for i, src in enumerate(sources)
+            if src not in stale and src != ERROR_SOURCE
+        ]
+        removed = np.setdiff1d(np.arange(len(sources)), keep).astype("int64")
+
+        # Solo IndexFlat compacta los ids al eliminar (conservando el orden);
+        # IVF/HNSW se reconstruyen al final desde los embeddings.
+        update_in_place = (
+            is_exact(snapshot["index"])
+            and snapshot["manifest"].get("dense_index") == dense_index_spec()
+        )
+        self.index = snapshot["index"]
+        if removed.size and update_in_place:
+            self.index.remove_ids(removed)
+        self.documents = [snapshot["documents"][i] for i in keep]
+        self.sources = [sources[i] for i in keep]
+        embeddings = snapshot["embeddings"][keep]
+
+        new_docs, new_sources = self._load_files(to_extract)
+
+        if new_docs:
+            new_embeddings = self._encode_documents(new_docs)
+            if update_in_place:
+                self.index.add(new_embeddings)
+            embeddings = np.vstack([embeddings, new_embeddings])
+            self.documents.extend(new_docs)
+            self.sources.extend(new_sources)
 
         if not self.documents:
+            # Se eliminaron todos los PDFs: no hay nada que conservar
             self.documents = ["Error: No se pudieron cargar documentos."]
+            self.sources = [ERROR_SOURCE]
+            self._build_indexes(self._encode_documents(self.documents))
+            # Se guarda igual: si no, el manifest viejo sigue listando los PDFs
+            # y cada arranque vuelve a calcular el mismo diff
+            self._save_snapshot(file_hashes)
+            print(f"[RAG] Snapshot {self.index_version} sin PDFs en {self.index_dir}")
+            return
+
+        self.embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if not update_in_place:
+            self.index = build_dense_index(self.embeddings)
+        # Las estadísticas de BM25 (idf, avgdl) son globales: se recalculan
+        # sobre los tokens, sin volver a tocar los PDFs ni el embedder.
+        self.bm25 = BM25Index([tokenize(doc) for doc in self.documents])
+
+        self._save_snapshot(file_hashes)
+        print(f"[RAG] Snapshot {self.index_version} actualizado en {self.index_dir}")
+
+    def _save_snapshot(self, file_hashes):
+        save_snapshot(
+            self.index_dir,
+            Config.EMBEDDING_MODEL_ID,
+            file_hashes,
+            self.documents,
+            self.sources,
+            self.embeddings,
+            self.index,
+            self.bm25,
+            dense_spec=dense_index_spec(),
+        )
 
+    def _encode_documents(self, documents):
+        # Vectores ya normalizados L2; los chunks vistos antes salen del cache
+        return self.embedding_cache.encode_documents(documents)
+
+    def _build_indexes(self, embeddings):
         # Embeddings
-        self.embedder = SentenceTransformer(Config.EMBEDDING_MODEL_ID)
-        embeddings = self.embedder.encode(self.documents, convert_to_numpy=True)
-        faiss.normalize_L2(embeddings)
-        self.index = faiss.IndexFlatIP(embeddings.shape[1])
-        self.index.add(embeddings)
+        self.embeddings = embeddings
+        self.index = build_dense_index(embeddings)
 
         # BM25 (Sparse) con tokenización mejorada
         tokenized_corpus = [tokenize(doc) for doc in self.documents]
-        self.bm25 = BM25Okapi(tokenized_corpus)
-
-        print(f"[RAG] Indexados {len(self.documents)} fragmentos enriquecidos.")
+        self.bm25 = BM25Index(tokenized_corpus)
 
     def _detect_header_map(self, row_norm):
         """
@@ -149,176 +325,169 @@ class RAGTool(BaseTool):
         return bool(re.fullmatch(r"[A-Z]{2,4}[0-9A-Z]{2,4}", s))
 
     def _load_pdfs(self):
-        chunks = []
-        # En este caso para el E1 solo se usará un PDF del plan de estudio de la UNI
-        uni_map = {
-            "sanMarcos": "[UNMSM San Marcos]",
-            "2018-N6": "[UNI Universidad Nacional de Ingenieria]",
-            "FDM": "[UPC]",
-            "Plan-estudios": "[UCSP]",
-        }
-
         if not os.path.exists(self.data_dir):
             return []
 
-        for filename in os.listdir(self.data_dir):
-            if not filename.endswith(".pdf"):
-                continue
+        filenames = sorted(f for f in os.listdir(self.data_dir) if f.endswith(".pdf"))
+        chunks, _sources = self._load_files(filenames)
+        return chunks
+
+    def _load_pdf(self, filename):
+        """Extrae los chunks estructurados de un único PDF."""
+        chunks, _sources = self._load_files([filename])
+        return chunks
 
-            file_path = os.path.join(self.data_dir, filename)
+    def _load_files(self, filenames):
+        """
+        Extrae las tablas de varios PDFs en un pool de procesos y arma los chunks
+        en orden (archivo, página). Devuelve (chunks, source de cada chunk).
+        """
+        # pdfplumber solo hace falta al (re)indexar, no al cargar el snapshot
+        from src.tools.pdf_extract import extract_rows
+
+        paths = [os.path.join(self.data_dir, f) for f in filenames]
+        extracted = extract_rows(
+            paths,
+            workers=Config.INGEST_WORKERS,
+            pages_per_task=Config.INGEST_PAGES_PER_TASK,
+        )
 
+        chunks, sources = [], []
+        for filename, file_path in zip(filenames, paths):
             tag = "[GENERAL]"
-            for key, val in uni_map.items():
+            for key, val in UNI_MAP.items():
                 if key in filename:
                     tag = val
                     break
 
-            try:
-                print(f"Procesando {filename} como {tag}...")
-
-                with pdfplumber.open(file_path) as pdf:
-                    current_header = "Desconocido"  # state
-                    colmap = None  # mapeo de columnas detectado
-
-                    for page in pdf.pages:
-                        tables = page.extract_tables() or []
-                        if not tables:
-                            continue
-
-                        for table in tables:
-                            for row in table:
-                                clean_row = [
-                                    str(c).replace("\n", " ").strip() if c else ""
-                                    for c in row
-                                ]
-                                if not any(clean_row):
-                                    continue
-
-                                row_norm = [normalize_text(c) for c in clean_row]
-                                first_cell = row_norm[0] if row_norm else ""
-
-                                # DETECCIÓN DE HEADERS DE SECCIÓN (ciclos / electivos)
-                                # "Primer ciclo", "Tercer ciclo", etc.
-                                if "ciclo" in first_cell and "total" not in first_cell:
-                                    # guarda el texto original
-                                    current_header = (
-                                        clean_row[0] if clean_row[0] else "Ciclo"
-                                    )
-                                    continue
-
-                                if "electivos de especialidad" in first_cell:
-                                    current_header = "ELECTIVOS DE ESPECIALIDAD"
-                                    continue
-
-                                if "electivos complementarios" in first_cell:
-                                    current_header = "ELECTIVOS COMPLEMENTARIOS"
-                                    continue
-
-                                # DETECCIÓN DE CABECERA DE COLUMNAS
-                                newmap = self._detect_header_map(row_norm)
-                                if newmap:
-                                    colmap = newmap
-                                    continue
-
-                                if first_cell in {"total", "totales"}:
-                                    continue
-
-                                # EXTRACCIÓN PRINCIPAL
-                                if "UNI" in tag:
-
-                                    if colmap is None:
-                                        # Busca una celda que parezca código
-                                        code_idx = None
-                                        for i, cell in enumerate(clean_row):
-                                            if self._looks_like_code(cell):
-                                                code_idx = i
-                                                break
-                                        if code_idx is None:
-                                            continue
-                                        # asumimos nombre al lado
-                                        nombre_idx = (
-                                            code_idx + 1
-                                            if code_idx + 1 < len(clean_row)
-                                            else None
-                                        )
-                                        if nombre_idx is None:
-                                            continue
-                                        codigo = clean_row[code_idx]
-                                        nombre = clean_row[nombre_idx]
-                                        creditos = "N/A"
-                                        requisito = "Ninguno"
-                                    else:
-                                        codigo = (
-                                            clean_row[colmap["codigo"]]
-                                            if colmap["codigo"] < len(clean_row)
-                                            else ""
-                                        )
-                                        nombre = (
-                                            clean_row[colmap["nombre"]]
-                                            if colmap["nombre"] < len(clean_row)
-                                            else ""
-                                        )
-                                        creditos_raw = (
-                                            clean_row[colmap["creditos"]]
-                                            if colmap["creditos"] < len(clean_row)
-                                            else ""
-                                        )
-                                        creditos = self._clean_credits(creditos_raw)
-
-                                        req_raw = ""
-                                        if "req" in colmap and colmap["req"] < len(
-                                            clean_row
-                                        ):
-                                            req_raw = clean_row[colmap["req"]]
-                                        requisito = self._clean_req(req_raw)
-
-                                    # Validación básica
-                                    if (
-                                        not codigo
-                                        or "codigo" in normalize_text(codigo)
-                                        or "código" in normalize_text(codigo)
-                                    ):
-                                        continue
-                                    if "total" in normalize_text(codigo):
-                                        continue
-                                    if len(codigo.strip()) < 4:
-                                        continue
-                                    if not nombre:
-                                        continue
-
-                                    # ASIGNACIÓN DE TIPO DE CURSO
-                                    tipo_curso = "Desconocido"
-                                    ciclo_info = current_header
-
-                                    if "ciclo" in normalize_text(current_header):
-                                        tipo_curso = "Obligatorio"
-                                    elif "especialidad" in normalize_text(
-                                        current_header
-                                    ):
-                                        tipo_curso = "Electivo de Especialidad"
-                                        ciclo_info = "Electivos"
-                                    elif "complementarios" in normalize_text(
-                                        current_header
-                                    ):
-                                        tipo_curso = "Electivo Complementario"
-                                        ciclo_info = "Electivos"
-
-                                    structured_text = (
-                                        f"{tag} Curso: {nombre} ({codigo}) | "
-                                        f"Ubicación: {ciclo_info} | "
-                                        f"Tipo: {tipo_curso} | "
-                                        f"Créditos: {creditos} | "
-                                        f"Pre-requisito: {requisito}"
-                                    )
-                                    chunks.append(structured_text)
-
-                                else:
-                                    # Otros documentos
-                                    row_text = " | ".join(clean_row)
-                                    chunks.append(f"{tag} {row_text}")
-
-            except Exception as e:
-                print(f"Error reading {filename}: {e}")
+            print(f"Procesando {filename} como {tag}...")
+            rows, error = extracted[file_path]
+            file_chunks = self._rows_to_chunks(rows, tag)
+            if error:
+                print(f"Error reading {filename}: {error}")
+
+            chunks.extend(file_chunks)
+            sources.extend([filename] * len(file_chunks))
+
+        return chunks, sources
+
+    def _rows_to_chunks(self, rows, tag):
+        """
+        Recorre las filas de un PDF en orden de página. El estado (cabecera de
+        sección y mapeo de columnas) se arrastra entre páginas, por eso esta
+        parte es secuencial aunque la extracción de tablas sea paralela.
+        """
+        chunks = []
+        current_header = "Desconocido"  # state
+        colmap = None  # mapeo de columnas detectado
+
+        for clean_row in rows:
+            row_norm = [normalize_text(c) for c in clean_row]
+            first_cell = row_norm[0] if row_norm else ""
+
+            # DETECCIÓN DE HEADERS DE SECCIÓN (ciclos / electivos)
+            # "Primer ciclo", "Tercer ciclo", etc.
+            if "ciclo" in first_cell and "total" not in first_cell:
+                # guarda el texto original
+                current_header = clean_row[0] if clean_row[0] else "Ciclo"
+                continue
+
+            if "electivos de especialidad" in first_cell:
+                current_header = "ELECTIVOS DE ESPECIALIDAD"
+                continue
+
+            if "electivos complementarios" in first_cell:
+                current_header = "ELECTIVOS COMPLEMENTARIOS"
+                continue
+
+            # DETECCIÓN DE CABECERA DE COLUMNAS
+            newmap = self._detect_header_map(row_norm)
+            if newmap:
+                colmap = newmap
+                continue
+
+            if first_cell in {"total", "totales"}:
+                continue
+
+            # EXTRACCIÓN PRINCIPAL
+            if "UNI" in tag:
+
+                if colmap is None:
+                    # Busca una celda que parezca código
+                    code_idx = None
+                    for i, cell in enumerate(clean_row):
+                        if self._looks_like_code(cell):
+                            code_idx = i
+                            break
+                    if code_idx is None:
+                        continue
+                    # asumimos nombre al lado
+                    nombre_idx = code_idx + 1 if code_idx + 1 < len(clean_row) else None
+                    if nombre_idx is None:
+                        continue
+                    codigo = clean_row[code_idx]
+                    nombre = clean_row[nombre_idx]
+                    creditos = "N/A"
+                    requisito = "Ninguno"
+                else:
+                    codigo = (
+                        clean_row[colmap["codigo"]]
+                        if colmap["codigo"] < len(clean_row)
+                        else ""
+                    )
+                    nombre = (
+                        clean_row[colmap["nombre"]]
+                        if colmap["nombre"] < len(clean_row)
+                        else ""
+                    )
+                    creditos_raw = (
+                        clean_row[colmap["creditos"]]
+                        if colmap["creditos"] < len(clean_row)
+                        else ""
+                    )
+                    creditos = self._clean_credits(creditos_raw)
+
+                    req_raw = ""
+                    if "req" in colmap and colmap["req"] < len(clean_row):
+                        req_raw = clean_row[colmap["req"]]
+                    requisito = self._clean_req(req_raw)
+
+                # Validación básica
+                if (
+                    not codigo
+                    or "codigo" in normalize_text(codigo)
+                    or "código" in normalize_text(codigo)
+                ):
+                    continue
+                if "total" in normalize_text(codigo):
+                    continue
+                if len(codigo.strip()) < 4:
+                    continue
+                if not nombre:
+                    continue
+
+                # ASIGNACIÓN DE TIPO DE CURSO
+                tipo_curso = "Desconocido"
+                ciclo_info = current_header
+
+                if "ciclo" in normalize_text(current_header):
+                    tipo_curso = "Obligatorio"
+                elif "especialidad" in normalize_text(current_header):
+                    tipo_curso = "Electivo de Especialidad"
+                    ciclo_info = "Electivos"
+                elif "complementarios" in normalize_text(current_header):
+                    tipo_curso = "Electivo Complementario"
+                    ciclo_info = "Electivos"
+
+                structured_text = format_course_record(
+                    tag, nombre, codigo, ciclo_info, tipo_curso, creditos, requisito
+                )
+                chunks.append(structured_text)
+
+            else:
+                # Otros documentos
+                row_text = " | ".join(clean_row)
+                chunks.append(f"{tag} {row_text}")
 
         return chunks
 
@@ -326,105 +495,355 @@ class RAGTool(BaseTool):
         arr = np.array(scores, dtype="float32")
         if arr.size == 0:
             return arr
-        mx, mn = arr.max(), arr.min()
-        if mx == mn:
-            return np.ones_like(arr)
-        return (arr - mn) / (mx - mn)
-
-    def _extract_code_from_query(self, query: str):
-        # Captura códigos tipo CC202, CC0A1, BMA02, etc.
-        m = re.search(r"\b([A-Za-z]{2,4}[0-9A-Za-z]{2,4})\b", query or "")
-        return m.group(1).upper() if m else None
-
-    def run(self, query: str, k=3, alpha=0.45) -> str:
+        return self._min_max(arr, arr.min(), arr.max())
+
+    def run(
+        self,
+        query: str,
+        k=3,
+        alpha=0.45,
+        filters=None,
+        max_tokens=None,
+        count_tokens=None,
+        intent=None,
+    ) -> str:
         """
         alpha = peso del dense. (1-alpha) = peso del BM25.
+
+        filters: dict opcional con universidad, ciclo, tipo, creditos_min y
+        creditos_max (ver records.FILTER_KEYS). Se resuelven a un conjunto de
+        ids y se aplican dentro de FAISS (IDSelector) y de BM25 (máscara):
+        los documentos fuera del alcance no se puntúan.
+
+        max_tokens / count_tokens: presupuesto de contexto del LLM y función
+        que cuenta tokens de una lista de textos. Si se dan, solo se devuelven
+        los registros (en orden) que caben en el presupuesto; el resto de un
+        listado nunca llegaría al modelo.
+
+        intent: QueryIntent del router (código, ciclo, electivos ya
+        detectados); sin él la query se parsea acá.
         """
-        query_norm = normalize_text(query)
+        scope = self.records.filter_ids(filters)
+        if scope is not None and scope.size == 0:
+            return "No encontré documentos que cumplan los filtros."
+        budget = self._budget(max_tokens, count_tokens)
 
-        # Exact match por código si aparece en la query
-        code = self._extract_code_from_query(query)
-        if code:
-            exact = [d for d in self.documents if f"({code})" in d]
-            if exact:
-                return "\n\n".join(exact[:k])
+        with tracing.span("rag.shortcut"):
+            shortcut = self._shortcut(query, k, scope, budget, intent)
+        if shortcut is not None:
+            return shortcut
 
-        # Atajos tipo “filtro” para listados por ciclo/electivos
-        cycle_map = {
-            "primer ciclo": "Primer ciclo",
-            "segundo ciclo": "Segundo ciclo",
-            "tercer ciclo": "Tercer ciclo",
-            "cuarto ciclo": "Cuarto ciclo",
-            "quinto ciclo": "Quinto ciclo",
-            "sexto ciclo": "Sexto ciclo",
-            "setimo ciclo": "Sétimo ciclo",
-            "septimo ciclo": "Sétimo ciclo",
-            "octavo ciclo": "Octavo ciclo",
-            "noveno ciclo": "Noveno ciclo",
-            "decimo ciclo": "Décimo ciclo",
-        }
-
-        wants_list = any(
-            x in query_norm
-            for x in [
-                "que cursos hay",
-                "cuales cursos",
-                "cuáles cursos",
-                "lista",
-                "listame",
-                "muéstrame",
-                "mostrar",
-            ]
-        )
-        for key, pretty in cycle_map.items():
-            if key in query_norm and (wants_list or "ciclo" in query_norm):
-                hits = [d for d in self.documents if f"Ubicación: {pretty}" in d]
-                # Devuelve varios (no solo top-k), ajusta si quieres
-                return (
-                    "\n".join(hits[:60])
-                    if hits
-                    else "No encontré cursos para ese ciclo."
+        # Híbrido: Dense + BM25
+        q_tokens = tokenize(query)
+        mask = self._scope_mask(scope)
+        if alpha == 0.0 and self.bm25.all_idf_positive:
+            # Solo sparse: el min-max no cambia el orden, basta el top-k de BM25
+            with tracing.span("rag.bm25"):
+                top_indices = self._sparse_top_k(q_tokens, k, scope, mask)
+        else:
+            with tracing.span("rag.encode"):
+                q_vec = self.embedding_cache.encode_query(query)
+            with tracing.span("rag.bm25"):
+                sparse_hits = self.bm25.score_postings(q_tokens, mask)
+            # La fusión incluye las búsquedas FAISS (spans rag.faiss)
+            with tracing.span("rag.fusion"):
+                top_indices = self._hybrid_top_k(
+                    q_vec, sparse_hits, k, alpha, scope, mask
                 )
 
-        if "electivos de especialidad" in query_norm and wants_list:
-            hits = [d for d in self.documents if "Tipo: Electivo de Especialidad" in d]
-            return (
-                "\n".join(hits[:80])
-                if hits
-                else "No encontré electivos de especialidad."
-            )
-
-        if "electivos complementarios" in query_norm and wants_list:
-            hits = [d for d in self.documents if "Tipo: Electivo Complementario" in d]
-            return (
-                "\n".join(hits[:80])
-                if hits
-                else "No encontré electivos complementarios."
+        with tracing.span("rag.format"):
+            return self._format_hits(query, top_indices, filters, scope, budget)
+
+    def run_batch(
+        self,
+        queries,
+        k=3,
+        alpha=0.45,
+        filters=None,
+        max_tokens=None,
+        count_tokens=None,
+    ):
+        """
+        Igual que [self.run(q, k, alpha, filters) for q in queries], pero la
+        parte híbrida se hace en bloque: un solo forward pass del embedder
+        para las queries no cacheadas, una búsqueda FAISS matricial para la
+        primera ronda de candidatos y el scoring BM25 de todas las queries en
+        una sola pasada sobre los postings. Los atajos (código, ciclo,
+        electivos) se resuelven por query como en run.
+        """
+        queries = list(queries)
+        scope = self.records.filter_ids(filters)
+        if scope is not None and scope.size == 0:
+            return ["No encontré documentos que cumplan los filtros."] * len(queries)
+        budget = self._budget(max_tokens, count_tokens)
+
+        results = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            results[i] = self._shortcut(query, k, scope, budget)
+            if results[i] is None:
+                pending.append(i)
+        if not pending:
+            return results
+
+        tokens = [tokenize(queries[i]) for i in pending]
+        mask = self._scope_mask(scope)
+        if alpha == 0.0 and self.bm25.all_idf_positive:
+            with tracing.span("rag.bm25", queries=len(pending)):
+                tops = [self._sparse_top_k(t, k, scope, mask) for t in tokens]
+        else:
+            with tracing.span("rag.encode", queries=len(pending)):
+                q_vecs = self.embedding_cache.encode_queries(
+                    [queries[i] for i in pending]
+                )
+            with tracing.span("rag.bm25", queries=len(pending)):
+                sparse_hits = self.bm25.score_postings_batch(tokens, mask)
+            prefetched = self._dense_prefetch(q_vecs, k, scope, mask)
+            with tracing.span("rag.fusion", queries=len(pending)):
+                tops = [
+                    self._hybrid_top_k(
+                        q_vecs[j : j + 1],
+                        sparse_hits[j],
+                        k,
+                        alpha,
+                        scope,
+                        mask,
+                        prefetched=prefetched[j],
+                    )
+                    for j in range(len(pending))
+                ]
+
+        for i, top_indices in zip(pending, tops):
+            results[i] = self._format_hits(
+                queries[i], top_indices, filters, scope, budget
             )
+        return results
 
-        # Híbrido: Dense + BM25
-        q_vec = self.embedder.encode([query], convert_to_numpy=True)
-        faiss.normalize_L2(q_vec)
-        d_scores, d_idx = self.index.search(q_vec, len(self.documents))
+    def _shortcut(self, query, k, scope, budget=None, intent=None):
+        """
+        Respuestas que no pasan por el ranking híbrido: match exacto por código
+        y listados por ciclo/electivos. None si la query no aplica.
+        """
+        if intent is None:
+            intent = extract_intent(query)
 
-        dense_vec = np.zeros(len(self.documents), dtype="float32")
-        for idx, score in zip(d_idx[0], d_scores[0]):
-            if idx != -1:
-                dense_vec[idx] = float(score)
+        # Exact match por el primer código de la query que está en el plan
+        for code in intent.code_candidates:
+            exact = self._in_scope(self.records.select(code=code), scope)
+            if exact.size:
+                hits = self._fit([self.documents[i] for i in exact[:k]], budget)
+                return "\n\n".join(hits)
 
-        s_scores = self.bm25.get_scores(tokenize(query))
+        # Atajos tipo “filtro” para listados por ciclo/electivos
+        if intent.cycle is not None:
+            ids = self._in_scope(self.records.select(ciclo=intent.cycle), scope)[:60]
+            hits = self._fit([self.documents[i] for i in ids], budget)
+            # Devuelve varios (no solo top-k), ajusta si quieres
+            return "\n".join(hits) if hits else "No encontré cursos para ese ciclo."
 
-        norm_dense = self._normalize_scores(dense_vec)
-        norm_sparse = self._normalize_scores(s_scores)
+        if intent.elective_type is not None and intent.wants_list:
+            ids = self.records.select(tipo=intent.elective_type)
+            ids = self._in_scope(ids, scope)[:80]
+            hits = self._fit([self.documents[i] for i in ids], budget)
+            return "\n".join(hits) if hits else NO_ELECTIVES[intent.elective_type]
 
-        hybrid_scores = (alpha * norm_dense) + ((1 - alpha) * norm_sparse)
-        top_indices = np.argsort(hybrid_scores)[::-1][:k]
+        return None
 
+    def _format_hits(self, query, top_indices, filters, scope, budget=None):
         print(f"\n[RAG DEBUG] Recuperado para: '{query}'")
-        results = []
-        for i in top_indices:
-            doc = self.documents[i]
+        if scope is not None:
+            print(f"[RAG DEBUG] Filtros {filters}: {scope.size} documentos en alcance")
+        results = self._fit([self.documents[i] for i in top_indices], budget)
+        for doc in results:
             print(f" -> {doc[:140]}...")
-            results.append(doc)
 
         return "\n\n".join(results)
+
+    def _budget(self, max_tokens, count_tokens):
+        if max_tokens is None:
+            return None
+        # Sin contador del tokenizer: aproximación por palabras
+        return max_tokens, count_tokens or count_words
+
+    def _fit(self, docs, budget):
+        """Prefijo de `docs` que cabe en el presupuesto de tokens (si hay)."""
+        if budget is None or not docs:
+            return docs
+        max_tokens, count_tokens = budget
+        return docs[: take_within_budget(count_tokens(docs), max_tokens)]
+
+    def _scope_mask(self, scope):
+        if scope is None:
+            return None
+        mask = np.zeros(len(self.documents), dtype=bool)
+        mask[scope] = True
+        return mask
+
+    def _in_scope(self, ids, scope):
+        """Ids (ordenados) que además están en el alcance de los filtros."""
+        if scope is None:
+            return ids
+        return np.intersect1d(ids, scope, assume_unique=True)
+
+    def _sparse_top_k(self, q_tokens, k, scope=None, mask=None):
+        """
+        Top-k con alpha = 0. Los documentos sin términos de la query tienen
+        score 0 y, como todos los idf son positivos, van al final en orden
+        del corpus (igual que el desempate del ranking híbrido).
+        """
+        pool = range(len(self.documents)) if scope is None else scope
+        k = min(k, len(pool))
+        top, _scores = self.bm25.top_k(q_tokens, k, mask)
+        top = list(top)
+        if len(top) < k:
+            seen = set(top)
+            for i in pool:
+                if len(top) == k:
+                    break
+                if i not in seen:
+                    top.append(i)
+        return top
+
+    def _hybrid_top_k(
+        self, q_vec, sparse_hits, k, alpha, scope=None, mask=None, prefetched=None
+    ):
+        """
+        Top-k de alpha * minmax(dense) + (1 - alpha) * minmax(sparse) sin ordenar
+        todo el corpus: se fusionan solo los top-N de cada lado.
+
+        `sparse_hits` = (doc_ids ordenados, scores) de BM25Index.score_postings;
+        los documentos que no aparecen tienen score sparse 0.
+
+        Los extremos de la normalización son globales (el máximo dense es el
+        top-1 y el mínimo es el top-1 de -q), así los scores de los candidatos
+        son los mismos que con la normalización sobre todo el corpus. Un
+        documento fuera de la unión no puede superar
+        alpha * dense_N + (1 - alpha) * sparse_N; si el k-ésimo candidato no
+        supera esa cota, se duplica N (como mucho hasta el corpus completo).
+        Empates: se respeta el orden del corpus (argsort no es estable, así que
+        antes el orden entre empates era arbitrario).
+
+        Con filtros (`scope` = ids en alcance, `mask` = la misma selección como
+        máscara) todo lo anterior se hace dentro del alcance: la búsqueda FAISS
+        lleva un IDSelector y la normalización usa los extremos del alcance.
+        Si el alcance cabe en los N candidatos se puntúa completo y de forma
+        exacta, sin pasar por FAISS.
+
+        `prefetched` = resultado de _dense_prefetch para esta query (run_batch
+        hace esa primera búsqueda FAISS para todas las queries a la vez).
+        """
+        n_docs = len(self.documents) if scope is None else scope.size
+        k = min(k, n_docs)
+        if k <= 0:
+            return []
+
+        s_docs, s_vals = sparse_hits
+        s_vals = np.asarray(s_vals, dtype="float32")
+        untouched = s_docs.size < n_docs
+        s_all = np.append(s_vals, np.float32(0.0)) if untouched else s_vals
+        s_min, s_max = s_all.min(), s_all.max()
+
+        n_cand = self._n_candidates(k, scope)
+        if scope is not None and scope.size <= n_cand:
+            dense = self.embeddings[scope] @ q_vec[0]
+            sparse = self._sparse_for(scope, s_docs, s_vals)
+            hybrid = alpha * self._min_max(dense, dense.min(), dense.max()) + (
+                1 - alpha
+            ) * self._min_max(sparse, s_min, s_max)
+            order = np.lexsort((scope, -hybrid))[:k]
+            return scope[order]
+
+        # FAISS solo propone candidatos: los scores dense se recalculan desde
+        # los embeddings (con IVF-PQ las distancias de FAISS son aproximadas y
+        # así el score de un documento no depende de cómo se buscó).
+        exact = is_exact(self.index)
+        params = None if mask is None else search_params(self.index, mask)
+        if prefetched is None:
+            prefetched = self._dense_prefetch(q_vec, k, scope, mask)[0]
+        extremes, d_scores, d_idx = prefetched
+        extreme_scores = self.embeddings[extremes] @ q_vec[0]
+        d_max, d_min = extreme_scores.max(), extreme_scores.min()
+
+        while True:
+            if d_idx is None:
+                with tracing.span("rag.faiss", n=n_cand):
+                    d_scores, d_idx = self.index.search(q_vec, n_cand, params=params)
+                d_scores, d_idx = d_scores[0], d_idx[0]
+            valid = d_idx != -1
+            d_scores, d_idx = d_scores[valid], d_idx[valid]
+
+            if s_docs.size > n_cand:
+                sel = np.argpartition(-s_vals, n_cand - 1)[:n_cand]
+                s_idx, s_nth = s_docs[sel], s_vals[sel].min()
+            else:
+                s_idx, s_nth = s_docs, -np.inf
+            if untouched:
+                s_nth = max(s_nth, 0.0)
+            cand = np.union1d(d_idx, s_idx)
+
+            dense = self.embeddings[cand] @ q_vec[0]
+            sparse = self._sparse_for(cand, s_docs, s_vals)
+
+            hybrid = alpha * self._min_max(dense, d_min, d_max) + (
+                1 - alpha
+            ) * self._min_max(sparse, s_min, s_max)
+
+            kth = np.partition(hybrid, hybrid.size - k)[hybrid.size - k]
+            # Con un índice ANN el top-N dense ya es aproximado: no se expande
+            if n_cand >= n_docs or cand.size == n_docs or not exact:
+                break
+            d_nth = d_scores.min() if d_scores.size else d_min
+            bound = alpha * self._min_max(d_nth, d_min, d_max) + (
+                1 - alpha
+            ) * self._min_max(s_nth, s_min, s_max)
+            if kth > bound:
+                break
+            n_cand = min(n_docs, n_cand * 2)
+            d_idx = None
+
+        top = np.flatnonzero(hybrid >= kth)
+        order = np.lexsort((cand[top], -hybrid[top]))[:k]
+        return cand[top[order]]
+
+    def _n_candidates(self, k, scope):
+        n_docs = len(self.documents) if scope is None else scope.size
+        return min(n_docs, max(k, Config.HYBRID_CANDIDATES))
+
+    def _dense_prefetch(self, q_vecs, k, scope=None, mask=None):
+        """
+        Primera ronda dense de _hybrid_top_k para una matriz de queries: ids de
+        los extremos (top-1 de q y de -q) y top-N, con una búsqueda FAISS
+        matricial por cada una. Devuelve por query (extremos, scores, ids), o
+        None si el alcance se puntúa completo sin FAISS.
+        """
+        n_cand = self._n_candidates(k, scope)
+        if scope is not None and scope.size <= n_cand:
+            return [None] * len(q_vecs)
+
+        params = None if mask is None else search_params(self.index, mask)
+        with tracing.span("rag.faiss", n=n_cand, queries=len(q_vecs)):
+            _s, top1 = self.index.search(q_vecs, 1, params=params)
+            _s, bottom1 = self.index.search(-q_vecs, 1, params=params)
+            d_scores, d_idx = self.index.search(q_vecs, n_cand, params=params)
+        out = []
+        for j in range(len(q_vecs)):
+            extremes = np.concatenate([top1[j], bottom1[j]])
+            out.append((extremes[extremes != -1], d_scores[j], d_idx[j]))
+        return out
+
+    def _sparse_for(self, ids, s_docs, s_vals):
+        """Scores sparse de `ids` (ordenados); 0 si no están en s_docs."""
+        sparse = np.zeros(ids.size, dtype="float32")
+        if s_docs.size:
+            pos = np.searchsorted(s_docs, ids)
+            pos_ok = np.minimum(pos, s_docs.size - 1)
+            hit = (pos < s_docs.size) & (s_docs[pos_ok] == ids)
+            sparse[hit] = s_vals[pos[hit]]
+        return sparse
+
+    def _min_max(self, arr, mn, mx):
+        """Normalización min-max con extremos dados (globales)."""
+        arr = np.asarray(arr, dtype="float32")
+        if mx == mn:
+            return np.ones_like(arr)
+        return (arr - mn) / (mx - mn)
@@ -0,0 +1,167 @@
+import re
+
+import numpy as np
+
+from src.tools.text import normalize_text
+
+COURSE_RE = re.compile(
+    r"^(?P<tag>\[[^\]]*\]) Curso: (?P<nombre>.*) \((?P<codigo>[^()]*)\) \| "
+    r"Ubicación: (?P<ciclo>.*?) \| "
+    r"Tipo: (?P<tipo>.*?) \| "
+    r"Créditos: (?P<creditos>.*?) \| "
+    r"Pre-requisito: (?P<requisito>.*)$"
+)
+TAG_RE = re.compile(r"^\[[^\]]*\]")
+PAREN_RE = re.compile(r"\(([^()]+)\)")
+
+FIELDS = ("tag", "codigo", "nombre", "ciclo", "tipo", "creditos", "requisito")
+
+# Filtros estructurados que acepta RAGTool.run(filters=...)
+FILTER_KEYS = ("universidad", "ciclo", "tipo", "creditos_min", "creditos_max")
+
+
+def format_course_record(tag, nombre, codigo, ciclo, tipo, creditos, requisito):
+    """Texto canónico de un curso (lo que se indexa en FAISS/BM25)."""
+    return (
+        f"{tag} Curso: {nombre} ({codigo}) | "
+        f"Ubicación: {ciclo} | "
+        f"Tipo: {tipo} | "
+        f"Créditos: {creditos} | "
+        f"Pre-requisito: {requisito}"
+    )
+
+
+def parse_course_record(text: str):
+    """Inverso de format_course_record; None si el chunk no es un curso."""
+    m = COURSE_RE.match(text or "")
+    return m.groupdict() if m else None
+
+
+class RecordStore:
+    """
+    Almacén columnar de los campos de cada chunk (una fila por documento, en
+    el mismo orden que RAGTool.documents) con índices hash:
+
+    - código: todo "(XXX)" que aparece en el texto, igual que el antiguo
+      `f"({code})" in doc`
+    - ciclo, tipo y universidad (tag), normalizados con normalize_text
+
+    Cada índice guarda los ids ordenados, así que un filtro cuesta O(1) más el
+    tamaño del resultado y varios filtros se combinan por intersección.
+    """
+
+    def __init__(self, documents):
+        self.n_docs = len(documents)
+        self.columns = {f: [None] * self.n_docs for f in FIELDS}
+        self.creditos = np.full(self.n_docs, np.nan)
+
+        by_code, by_cycle, by_type, by_tag = {}, {}, {}, {}
+        for i, doc in enumerate(documents):
+            rec = parse_course_record(doc)
+            if rec:
+                for f in FIELDS:
+                    self.columns[f][i] = rec[f]
+                if rec["creditos"].isdigit():
+                    self.creditos[i] = float(rec["creditos"])
+                by_cycle.setdefault(normalize_text(rec["ciclo"]), []).append(i)
+                by_type.setdefault(normalize_text(rec["tipo"]), []).append(i)
+            else:
+                m = TAG_RE.match(doc or "")
+                self.columns["tag"][i] = m.group(0) if m else None
+
+            if self.columns["tag"][i]:
+                by_tag.setdefault(self.columns["tag"][i], []).append(i)
+            for code in dict.fromkeys(PAREN_RE.findall(doc or "")):
+                by_code.setdefault(code, []).append(i)
+
+        def freeze(index):
+            return {k: np.asarray(v, dtype="int64") for k, v in index.items()}
+
+        self.by_code = freeze(by_code)
+        self.by_cycle = freeze(by_cycle)
+        self.by_type = freeze(by_type)
+        self.by_tag = freeze(by_tag)
+
+    def record(self, i):
+        return {f: self.columns[f][i] for f in FIELDS}
+
+    def tags(self):
+        return list(self.by_tag)
+
+    def match_tags(self, universidad):
+        """
+        Tags cuya universidad coincide con el alias: todas las palabras del
+        alias deben aparecer en el tag ("UNI", "San Marcos", "unmsm").
+        """
+        alias = set(normalize_text(universidad).split())
+        if not alias:
+            return []
+        return [t for t in self.by_tag if alias <= set(normalize_text(t).split())]
+
+    def filter_ids(self, filters):
+        """
+        Ids en el alcance de `filters` (dict con claves de FILTER_KEYS), o None
+        si no hay ningún filtro activo.
+        """
+        active = {k: v for k, v in (filters or {}).items() if v is not None}
+        unknown = set(active) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(
+                f"Filtros desconocidos: {sorted(unknown)} (opciones: {FILTER_KEYS})"
+            )
+        if not active:
+            return None
+        return self.select(**active)
+
+    def select(
+        self,
+        code=None,
+        ciclo=None,
+        tipo=None,
+        tag=None,
+        universidad=None,
+        creditos_min=None,
+        creditos_max=None,
+    ):
+        """
+        Ids (ordenados) de los documentos que cumplen todos los filtros dados.
+        `code` es sensible a mayúsculas (como el texto); ciclo y tipo se
+        comparan normalizados; `tag` puede ser un tag o una lista de tags y
+        `universidad` un alias (ver match_tags). El rango de créditos es
+        inclusivo y excluye los cursos sin créditos conocidos.
+        """
+        empty = np.zeros(0, dtype="int64")
+        parts = []
+        if code is not None:
+            parts.append(self.by_code.get(code, empty))
+        if ciclo is not None:
+            parts.append(self.by_cycle.get(normalize_text(ciclo), empty))
+        if tipo is not None:
+            parts.append(self.by_type.get(normalize_text(tipo), empty))
+        if tag is not None:
+            tags = [tag] if isinstance(tag, str) else list(tag)
+            parts.append(self._union_tags(tags))
+        if universidad is not None:
+            parts.append(self._union_tags(self.match_tags(universidad)))
+        if creditos_min is not None or creditos_max is not None:
+            lo = -np.inf if creditos_min is None else float(creditos_min)
+            hi = np.inf if creditos_max is None else float(creditos_max)
+            # NaN (sin créditos) nunca cumple la comparación
+            in_range = (self.creditos >= lo) & (self.creditos <= hi)
+            parts.append(np.flatnonzero(in_range).astype("int64"))
+
+        if not parts:
+            return np.arange(self.n_docs, dtype="int64")
+        parts.sort(key=len)
+        ids = parts[0]
+        for other in parts[1:]:
+            if ids.size == 0:
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def _union_tags(self, tags):
+        empty = np.zeros(0, dtype="int64")
+        if not tags:
+            return empty
+        return np.unique(np.concatenate([self.by_tag.get(t, empty) for t in tags]))
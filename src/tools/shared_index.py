@@ -0,0 +1,68 @@
+"""
+Artefactos del RAG compartidos entre procesos (servidor en modo pre-fork).
+
+El proceso padre carga el snapshot una sola vez sin importar torch: textos,
+embeddings y arreglos BM25 quedan mapeados desde INDEX_DIR y el índice FAISS
+y el RecordStore se heredan por copy-on-write. Cada worker los adopta con
+RAGTool(snapshot=...) y solo carga su propio embedder para las queries.
+"""
+
+import gc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config import Config
+from src.tools.dense_index import configure_search, dense_index_spec
+from src.tools.index_store import (
+    hash_pdf_files,
+    is_snapshot_valid,
+    load_manifest,
+    load_snapshot,
+)
+from src.tools.records import RecordStore
+
+
+def snapshot_is_current() -> bool:
+    """El snapshot de INDEX_DIR corresponde a los PDFs, modelo e índice actuales."""
+    manifest = load_manifest(Config.INDEX_DIR)
+    return (
+        manifest is not None
+        and is_snapshot_valid(
+            manifest, Config.EMBEDDING_MODEL_ID, hash_pdf_files(Config.DATA_PATH)
+        )
+        and manifest.get("dense_index") == dense_index_spec()
+    )
+
+
+def _build_snapshot():
+    from src.tools.rag import RAGTool
+
+    RAGTool()
+
+
+def load_shared_index():
+    """
+    Snapshot listo para RAGTool(snapshot=...). Si falta o está desactualizado
+    se construye en un proceso aparte (spawn), para que el padre no cargue
+    torch ni arranque hilos antes de hacer fork.
+    """
+    if not Config.USE_INDEX_SNAPSHOT:
+        raise RuntimeError("El modo multi-proceso necesita Config.USE_INDEX_SNAPSHOT")
+
+    if not snapshot_is_current():
+        print("[RAG] Construyendo el snapshot en un proceso aparte...")
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            ex.submit(_build_snapshot).result()
+
+    snapshot = load_snapshot(Config.INDEX_DIR)
+    if snapshot is None:
+        raise RuntimeError(f"No se pudo cargar el snapshot de {Config.INDEX_DIR}")
+    snapshot["index"] = configure_search(snapshot["index"])
+    snapshot["records"] = RecordStore(snapshot["documents"])
+
+    # Lo cargado hasta aquí no se libera: sacarlo del GC evita que los
+    # workers escriban (y copien) esas páginas al recorrer los objetos
+    gc.collect()
+    gc.freeze()
+    return snapshot
@@ -0,0 +1,196 @@
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Una fila por alumno con sus cursos separados por espacios: las cohortes se
+# leen con un recorrido de N filas y no de N x cursos aprobados
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS students ("
+    " student_id TEXT PRIMARY KEY, courses TEXT NOT NULL DEFAULT '')"
+    " WITHOUT ROWID",
+)
+# Límite de parámetros por sentencia en versiones viejas de SQLite
+MAX_PARAMS = 900
+
+
+class StudentStore:
+    """
+    Historial de cursos aprobados por alumno en un archivo SQLite.
+
+    - Pool de hasta `pool_size` conexiones (se abren al primer uso; tras un
+      fork el proceso hijo abre las suyas).
+    - LRU en memoria de `cache_size` historiales calientes (frozenset); se
+      invalida por alumno al escribir.
+    - cohorts() recorre la tabla en bloques de alumnos sin pasar por el LRU,
+      para evaluar elegibilidad de miles de alumnos sin desalojar los
+      historiales calientes.
+    """
+
+    def __init__(self, path, pool_size=4, cache_size=4096):
+        self.path = path
+        self.pool_size = pool_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+        # Sube con cada escritura: una lectura que empezó antes no cachea
+        self._generation = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._reset_pool()
+        with self._connection() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    # Pool de conexiones
+
+    def _reset_pool(self):
+        self._pid = os.getpid()
+        self._pool = queue.LifoQueue()
+        self._opened = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Conexión del pool (una transacción: commit al salir sin error)."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Las conexiones heredadas del padre no se usan en el hijo
+                self._reset_pool()
+            pool = self._pool
+            create = pool.empty() and self._opened < self.pool_size
+            if create:
+                self._opened += 1
+        conn = self._connect() if create else pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            pool.put(conn)
+
+    def close(self):
+        with self._lock:
+            pool, self._pool, self._opened = self._pool, queue.LifoQueue(), 0
+        while not pool.empty():
+            pool.get_nowait().close()
+
+    # Escritura
+
+    def add(self, student_id, courses=()):
+        """Registra al alumno y los cursos que aprobó."""
+        self.add_many([(student_id, courses)])
+
+    def add_many(self, histories):
+        """Carga en bloque: [(student_id, cursos aprobados), ...]."""
+        merged = {}
+        for sid, courses in histories:
+            merged.setdefault(sid, set()).update(courses)
+        with self._connection() as conn:
+            # Lectura y escritura en la misma transacción (de escritura desde
+            # el inicio, para no perder cursos con dos add concurrentes)
+            conn.execute("BEGIN IMMEDIATE")
+            for sid, courses in self._select(conn, list(merged)).items():
+                merged[sid] |= courses
+            conn.executemany(
+                "INSERT OR REPLACE INTO students VALUES (?, ?)",
+                [(sid, " ".join(sorted(c))) for sid, c in merged.items()],
+            )
+        with self._lock:
+            self._generation += 1
+            for sid in merged:
+                self._cache.pop(sid, None)
+
+    # Lectura
+
+    def history(self, student_id) -> frozenset:
+        """Cursos aprobados del alumno (vacío si no existe)."""
+        return self.histories([student_id])[0]
+
+    def histories(self, student_ids) -> list:
+        """Historiales de varios alumnos, en el mismo orden; un solo SELECT
+        por bloque para los que no están en el LRU."""
+        student_ids = list(student_ids)
+        out = [None] * len(student_ids)
+        missing = {}
+        with self._lock:
+            generation = self._generation
+            for i, sid in enumerate(student_ids):
+                hist = self._cache.get(sid)
+                if hist is not None:
+                    self._cache.move_to_end(sid)
+                    self.counters["hits"] += 1
+                    out[i] = hist
+                else:
+                    self.counters["misses"] += 1
+                    missing.setdefault(sid, []).append(i)
+
+        if missing:
+            found = self._fetch(list(missing))
+            with self._lock:
+                for sid, positions in missing.items():
+                    hist = found.get(sid, frozenset())
+                    for i in positions:
+                        out[i] = hist
+                    if generation != self._generation:
+                        continue
+                    self._cache[sid] = hist
+                    self._cache.move_to_end(sid)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return out
+
+    def _fetch(self, student_ids) -> dict:
+        with self._connection() as conn:
+            found = self._select(conn, student_ids)
+        return {sid: frozenset(courses) for sid, courses in found.items()}
+
+    def _select(self, conn, student_ids) -> dict:
+        found = {}
+        for start in range(0, len(student_ids), MAX_PARAMS):
+            chunk = student_ids[start : start + MAX_PARAMS]
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT student_id, courses FROM students "
+                f"WHERE student_id IN ({marks})",
+                chunk,
+            )
+            for sid, courses in rows:
+                found[sid] = set(courses.split())
+        return found
+
+    def student_ids(self) -> list:
+        with self._connection() as conn:
+            rows = conn.execute("SELECT student_id FROM students ORDER BY student_id")
+            return [sid for (sid,) in rows]
+
+    def cohorts(self, batch_size=5000):
+        """
+        Todos los alumnos en bloques de `batch_size`: genera
+        (ids, historiales) con un solo recorrido ordenado de la tabla.
+        """
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT student_id, courses FROM students ORDER BY student_id"
+            )
+            while True:
+                batch = rows.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield [sid for sid, _ in batch], [set(c.split()) for _, c in batch]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "cached": len(self._cache),
+                "connections": self._opened,
+            }
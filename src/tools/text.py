@@ -0,0 +1,83 @@
+import re
+import unicodedata
+
+STOPWORDS_ES = {
+    "que",
+    "de",
+    "la",
+    "el",
+    "en",
+    "y",
+    "a",
+    "los",
+    "las",
+    "un",
+    "una",
+    "es",
+    "del",
+    "al",
+    "por",
+    "para",
+    "cual",
+    "cuales",
+    "cuál",
+    "cuáles",
+    "qué",
+    "hay",
+    "son",
+    "donde",
+    "dónde",
+    "pertenece",
+    "pertenecen",
+    "curso",
+    "cursos",
+    "uni",
+    "obligatorio",
+    "electivo",
+    "electivos",
+    "obligatoria",
+    "obligatorios",
+}
+
+
+def normalize_text(s: str) -> str:
+    """Lowercase + sin tildes + sin puntuación (mantiene letras/números)."""
+    s = (s or "").lower()
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")  # quita tildes
+    s = re.sub(r"[^a-z0-9]+", " ", s)  # quita puntuación
+    return s.strip()
+
+
+def tokenize(s: str):
+    """Tokens para BM25: normaliza y filtra stopwords."""
+    toks = normalize_text(s).split()
+    return [t for t in toks if t and t not in STOPWORDS_ES]
+
+
+def split_records(context: str):
+    """
+    Registros de la salida de una herramienta, en orden de relevancia:
+    bloques separados por línea en blanco (top-k del RAG) o líneas (listados).
+    Devuelve (registros, separador).
+    """
+    sep = "\n\n" if "\n\n" in (context or "") else "\n"
+    return [r for r in (context or "").split(sep) if r.strip()], sep
+
+
+def count_words(texts):
+    """Conteo aproximado de tokens (palabras) cuando no hay tokenizer."""
+    return [len(t.split()) for t in texts]
+
+
+def take_within_budget(lengths, budget):
+    """
+    Cuántos registros (en orden) caben enteros en `budget` tokens. Si ni el
+    primero cabe se devuelve 1: quien arma el prompt lo trunca.
+    """
+    used = 0
+    for n, length in enumerate(lengths):
+        used += length
+        if used > budget:
+            return max(n, 1)
+    return len(lengths)
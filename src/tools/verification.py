@@ -1,9 +1,17 @@
-import re
+from src.config import Config
+from src.query import find_code_candidates, find_course_code
 from src.tools.base import BaseTool
+from src.tools.prereq_graph import PrereqGraph
 
 
 class VerificationTool(BaseTool):
-    def __init__(self):
+    def __init__(self, graph=None, student_history=None, store=None):
+        """
+        `graph`: PrereqGraph con el plan de estudios (p. ej.
+        PrereqGraph.from_records(rag.records)). Sin él se usa el catálogo mock.
+        `store`: StudentStore con el historial de cada alumno; sin él (o sin
+        `student_id`) se usa `student_history`.
+        """
         super().__init__(name="verification")
 
         # Mock Database: Simulamos el catálogo de cursos y sus requisitos
@@ -14,38 +22,94 @@ class VerificationTool(BaseTool):
             "MA101": {"name": "Cálculo I", "prereqs": []},
             "AI301": {"name": "Inteligencia Artificial", "prereqs": ["CS202", "MA101"]},
         }
+        self.graph = graph or PrereqGraph.from_catalog(self.course_catalog)
 
         # Cursos aprobados
-        self.student_history = {"CS101", "MA101"}
+        if student_history is None:
+            student_history = {"CS101", "MA101"}
+        self.student_history = set(student_history)
+        self.store = store
 
-    def run(self, input_text: str) -> str:
+    def run(self, input_text: str, intent=None, student_id=None) -> str:
         """
         Analiza el texto buscando códigos de curso (ej. CS102) y verifica elegibilidad.
         """
-        # Normalización y extracción mediante Regex
-        target_course = re.search(r"\b[A-Z]{2}\d{3}\b", input_text.upper())
+        # Normalización y extracción mediante Regex (o el código que ya
+        # detectó el router)
+        if intent is not None:
+            course_code = intent.course_code
+            candidates = intent.code_candidates
+        else:
+            course_code = find_course_code(input_text)
+            candidates = find_code_candidates(input_text)
+        if not course_code:
+            # Códigos del plan con otra forma (BMA02, CC3M2)
+            course_code = self._find_graph_code(candidates)
 
-        if not target_course:
+        if not course_code:
             return "Error: No se detectó un código de curso (ejemplo: CS101)."
 
-        course_code = target_course.group(0)
-
         # Verificar existencia del curso
-        if course_code not in self.course_catalog:
+        if course_code not in self.graph:
             return f"Error: Curso {course_code} no encontrado en el catálogo."
 
+        # Historial cerrado bajo prerrequisitos, el mismo de las consultas en
+        # bloque (eligible_courses, eligible_students)
+        history = self._history(student_id)
+        passed = set(self.graph.decode(self.graph.encode([history])[0]))
+
         # Verificar si ya lo aprobó
-        if course_code in self.student_history:
+        if course_code in passed:
             return f"Status: Ya aprobaste {course_code}."
 
         # Verificar prerrequisitos
-        requirements = self.course_catalog[course_code]["prereqs"]
-        missing_reqs = [req for req in requirements if req not in self.student_history]
-
-        if missing_reqs:
+        if not self.graph.can_take(course_code, [history])[0]:
+            requirements = self.graph.prereqs[course_code]
+            missing_reqs = [req for req in requirements if req not in passed]
             return (
                 f"REJECTED: No puedes llevar {course_code}. "
                 f"Missing prerequisites: {', '.join(missing_reqs)}"
             )
 
-        return f"APPROVED: Puedes matricularte en {course_code} ({self.course_catalog[course_code]['name']})."
+        name = self.graph.names.get(course_code, course_code)
+        return f"APPROVED: Puedes matricularte en {course_code} ({name})."
+
+    def eligible_courses(self, histories=None):
+        """Cursos que puede llevar ya cada alumno (por defecto, el actual)."""
+        return self.graph.eligible_courses(self._histories(histories))
+
+    def missing_chain(self, course_code, histories=None):
+        """Todo lo que falta aprobar antes de `course_code`, por alumno."""
+        return self.graph.missing_chain(course_code, self._histories(histories))
+
+    def path_to(self, course_code, histories=None):
+        """Ciclos mínimos (cursos por ciclo) hasta `course_code`, por alumno."""
+        return self.graph.path_to(course_code, self._histories(histories))
+
+    def eligible_students(self, course_code, batch_size=None):
+        """
+        Alumnos del store que pueden llevar `course_code` ya (p. ej. todos los
+        habilitados para CC202 el próximo ciclo), evaluados por cohortes de
+        `batch_size`. Requiere un StudentStore (STUDENT_STORE = True).
+        """
+        if self.store is None:
+            raise ValueError(
+                "eligible_students necesita un StudentStore (STUDENT_STORE = True)"
+            )
+        eligible = []
+        batch_size = batch_size or Config.STUDENT_BATCH_SIZE
+        for ids, histories in self.store.cohorts(batch_size):
+            mask = self.graph.can_take(course_code, histories)
+            eligible.extend(sid for sid, ok in zip(ids, mask) if ok)
+        return eligible
+
+    def _history(self, student_id):
+        if self.store is None or student_id is None:
+            return self.student_history
+        return self.store.history(student_id)
+
+    def _histories(self, histories):
+        return [self.student_history] if histories is None else histories
+
+    def _find_graph_code(self, candidates):
+        return next((code for code in candidates if code in self.graph), None)
@@ -1,23 +1,260 @@
+import atexit
+import glob
+import gzip
 import json
 import os
+import queue
+import shutil
+import threading
 import time
 from datetime import datetime
 from src.config import Config
+from src.utils.filelock import file_lock
+
+LOG_FILE = "execution.jsonl"
+
+
+class LogWriter:
+    """
+    Escritor en segundo plano de un archivo JSONL. `write` solo encola la
+    línea (no bloquea: si la cola está llena se descarta y se cuenta); un
+    hilo la escribe junto con las demás pendientes en un único write de
+    bytes UTF-8 cuando el lote llega a LOG_BATCH_SIZE o pasa
+    LOG_FLUSH_INTERVAL_S. El archivo queda abierto en modo append.
+
+    Rotación: al pasar LOG_MAX_BYTES o LOG_ROTATE_INTERVAL_S el archivo se
+    renombra a `execution-<fecha>.jsonl` (gzip si LOG_COMPRESS) y se
+    conservan los LOG_BACKUP_COUNT más recientes.
+
+    Varios procesos (los workers del servidor pre-fork) pueden escribir el
+    mismo archivo: cada lote se escribe con un lock de archivo
+    (`<archivo>.lock`) y, si otro proceso ya rotó (cambió el inode), se
+    reabre antes de escribir, así ningún lote va a un archivo rotado.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        self.batch_size = Config.LOG_BATCH_SIZE
+        self.flush_interval = Config.LOG_FLUSH_INTERVAL_S
+        self.max_bytes = Config.LOG_MAX_BYTES
+        self.rotate_interval = Config.LOG_ROTATE_INTERVAL_S
+        self.compress = Config.LOG_COMPRESS
+        self.backup_count = Config.LOG_BACKUP_COUNT
+
+        self.metrics = {"written": 0, "dropped": 0, "batches": 0, "rotations": 0}
+        self._file = None
+        self._opened_at = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._loop, name="log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, line: bytes) -> bool:
+        try:
+            self.queue.put_nowait(line)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.metrics["dropped"] += 1
+            return False
+
+    def flush(self, timeout=None) -> bool:
+        """Espera a que todo lo encolado hasta ahora esté en el archivo."""
+        if self._closed:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = threading.Event()
+        # Con la cola llena y el disco atascado no se espera más que `timeout`
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(None if deadline is None else deadline - time.monotonic())
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return  # el hilo (daemon) sigue atascado: no se espera
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.metrics)
+        out["queue_depth"] = self.queue.qsize()
+        return out
+
+    def _loop(self):
+        batch, waiters = [], []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # venció el intervalo de flush
+
+            if isinstance(item, bytes):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.time() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+
+            if batch:
+                self._write_batch(batch)
+                batch = []
+            deadline = None
+            for done in waiters:
+                done.set()
+            waiters = []
+            if item is None:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+    def _write_batch(self, batch):
+        try:
+            with file_lock(self.path + ".lock"):
+                self._reopen_if_rotated()
+                self._maybe_rotate()
+                if self._file is None:
+                    self._file = open(self.path, "ab")
+                    self._opened_at = time.time()
+                self._file.write(b"".join(batch))
+                self._file.flush()
+        except OSError as e:
+            print(f"[Logger] No se pudo escribir {self.path}: {e}")
+            # El lote se pierde; el siguiente vuelve a abrir el archivo
+            self._reset_file()
+            with self._lock:
+                self.metrics["dropped"] += len(batch)
+            return
+        with self._lock:
+            self.metrics["written"] += len(batch)
+            self.metrics["batches"] += 1
+
+    def _reset_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _reopen_if_rotated(self):
+        """Otro proceso rotó el archivo: el handle apunta al viejo."""
+        if self._file is None:
+            return
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self._file.fileno()).st_ino:
+            self._reset_file()
+
+    def _maybe_rotate(self):
+        if not os.path.exists(self.path):
+            return
+        by_size = self.max_bytes and os.path.getsize(self.path) >= self.max_bytes
+        by_time = (
+            self.rotate_interval
+            and self._opened_at is not None
+            and time.time() - self._opened_at >= self.rotate_interval
+        )
+        if by_size or by_time:
+            self._rotate()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        root, ext = os.path.splitext(self.path)
+        rotated = f"{root}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{ext}"
+        os.replace(self.path, rotated)
+        if self.compress:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+
+        # Las más viejas primero (el nombre lleva la fecha)
+        backups = sorted(glob.glob(f"{glob.escape(root)}-*{ext}*"))
+        for old in backups[: max(0, len(backups) - self.backup_count)]:
+            os.remove(old)
+        with self._lock:
+            self.metrics["rotations"] += 1
+
+
+# Un solo escritor por archivo, compartido por todos los AgentLogger
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path) -> LogWriter:
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None or writer._closed:
+            writer = _writers[path] = LogWriter(path)
+        return writer
+
+
+def _reset_after_fork():
+    # El hilo escritor no sobrevive al fork (server --processes): cada worker
+    # crea el suyo al primer log
+    global _writers_lock
+    _writers.clear()
+    _writers_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@atexit.register
+def close_all_writers():
+    """Al salir del proceso no se pierde lo que quedó en cola."""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
 
 
 class AgentLogger:
     def __init__(self):
         os.makedirs(Config.LOG_DIR, exist_ok=True)
-        self.log_file = os.path.join(Config.LOG_DIR, "execution.jsonl")
+        self.log_file = os.path.join(Config.LOG_DIR, LOG_FILE)
+        self.writer = get_writer(self.log_file)
 
-    def log_interaction(self, query, steps, response, latency):
+    def log_interaction(self, query, steps, response, latency, ttft=None, cache=None):
         entry = {
             "timestamp": datetime.now().isoformat(),
             "query": query,
             "steps_trace": steps,  # Lista de herramientas usadas y sus outputs
             "final_response": response,
             "latency_seconds": round(latency, 4),
+            # Tiempo hasta el primer fragmento de la respuesta (streaming)
+            "ttft_seconds": None if ttft is None else round(ttft, 4),
         }
+        if cache is not None:
+            # hit ("exact" | "semantic" | None), latencia ahorrada, hit rate
+            entry["cache"] = cache
+
+        # json.dumps escapa los saltos de línea: una entrada = una línea
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        self.writer.write(line.encode("utf-8"))
+
+    def flush(self, timeout=None) -> bool:
+        """Bloquea hasta que las entradas encoladas estén escritas."""
+        return self.writer.flush(timeout)
 
-        with open(self.log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    def stats(self) -> dict:
+        return self.writer.stats()
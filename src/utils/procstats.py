@@ -0,0 +1,39 @@
+import os
+
+# Campos de /proc/<pid>/smaps_rollup que se reportan (en MB)
+SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+}
+
+
+def memory_stats(pid="self") -> dict:
+    """
+    Memoria de un proceso según /proc/<pid>/smaps_rollup (Linux): RSS, PSS
+    (la parte proporcional de las páginas compartidas) y memoria compartida
+    vs privada. Con N workers que mapean el mismo índice, `shared_mb` crece y
+    el PSS de cada uno es ~1/N de lo compartido. Dict vacío si no hay /proc.
+    """
+    path = os.path.join("/proc", str(pid), "smaps_rollup")
+    try:
+        with open(path, "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+
+    out = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 3 and parts[0].rstrip(":") in SMAPS_FIELDS:
+            out[SMAPS_FIELDS[parts[0].rstrip(":")]] = round(int(parts[1]) / 1024, 1)
+    out["shared_mb"] = round(
+        out.get("shared_clean_mb", 0.0) + out.get("shared_dirty_mb", 0.0), 1
+    )
+    out["private_mb"] = round(
+        out.get("private_clean_mb", 0.0) + out.get("private_dirty_mb", 0.0), 1
+    )
+    return out
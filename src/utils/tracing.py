@@ -0,0 +1,194 @@
+import argparse
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Span activo del contexto actual (por hilo / por tarea). Sin traza activa
+# todos los `span(...)` son no-ops, así que instrumentar cuesta casi nada.
+_current = contextvars.ContextVar("tracing_span", default=None)
+
+
+class Span:
+    """
+    Etapa con nombre, inicio/fin (perf_counter), atributos y sub-etapas.
+    Se serializa con to_dict en tiempos relativos al inicio de la traza.
+    """
+
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name, start=None, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.children = []
+
+    def finish(self, end=None):
+        self.end = time.perf_counter() if end is None else end
+        return self
+
+    @property
+    def duration(self):
+        end = time.perf_counter() if self.end is None else self.end
+        return end - self.start
+
+    def to_dict(self, origin=None):
+        origin = self.start if origin is None else origin
+        out = {
+            "name": self.name,
+            "start_ms": round(1000 * (self.start - origin), 3),
+            "duration_ms": round(1000 * self.duration, 3),
+        }
+        out.update(self.attrs)
+        if self.children:
+            out["children"] = [c.to_dict(origin) for c in list(self.children)]
+        return out
+
+
+class Trace(Span):
+    """Span raíz de una consulta: guarda además la hora y el hilo."""
+
+    __slots__ = ("ts", "thread")
+
+    def __init__(self, name, **attrs):
+        super().__init__(name, **attrs)
+        self.ts = time.time()
+        self.thread = threading.current_thread().name
+
+    def to_dict(self, origin=None):
+        out = super().to_dict(origin)
+        out["ts"] = round(self.ts, 6)
+        out["thread"] = self.thread
+        return out
+
+
+def current_span():
+    return _current.get()
+
+
+@contextmanager
+def activate(span):
+    """Hace de `span` el padre de los spans que se abran dentro del bloque."""
+    token = _current.set(span)
+    try:
+        yield span
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Sub-etapa del span activo. Sin traza activa no registra nada (devuelve
+    None). No usar alrededor de un `yield`: para eso está child().
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    s = Span(name, **attrs)
+    parent.children.append(s)
+    token = _current.set(s)
+    try:
+        yield s
+    finally:
+        s.finish()
+        _current.reset(token)
+
+
+def child(name, **attrs):
+    """
+    Span hijo del activo que no se activa (el llamador hace finish()). Para
+    etapas que atraviesan un generador. Si no hay traza queda suelto.
+    """
+    s = Span(name, **attrs)
+    parent = _current.get()
+    if parent is not None:
+        parent.children.append(s)
+    return s
+
+
+def traced_iter(parent, iterable):
+    """
+    Consume `iterable` con `parent` activo solo mientras se calcula cada
+    elemento (no mientras el consumidor lo procesa): los spans de un
+    generador quedan dentro de `parent` aunque se consuma de a poco.
+    """
+    it = iter(iterable)
+    while True:
+        with activate(parent):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+# Exportación a Chrome trace (chrome://tracing, ui.perfetto.dev)
+
+
+def chrome_events(trace: dict, pid=0):
+    """Eventos "X" (completos) de una traza serializada con Trace.to_dict."""
+    base_us = trace.get("ts", 0.0) * 1e6
+    tid = trace.get("thread", "main")
+    events = []
+
+    def walk(node):
+        args = {
+            k: v
+            for k, v in node.items()
+            if k not in ("name", "start_ms", "duration_ms", "children")
+        }
+        events.append(
+            {
+                "name": node["name"],
+                "ph": "X",
+                "ts": base_us + 1000 * node["start_ms"],
+                "dur": 1000 * node["duration_ms"],
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+        )
+        for c in node.get("children", []):
+            walk(c)
+
+    walk(trace)
+    return events
+
+
+def traces_from_log(log_path):
+    """Trazas guardadas en el steps_trace de cada entrada del log JSONL."""
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for step in json.loads(line).get("steps_trace", []):
+                if "trace" in step:
+                    yield step["trace"]
+
+
+def write_chrome_trace(traces, out_path):
+    events = []
+    for trace in traces:
+        events.extend(chrome_events(trace))
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convierte las trazas de logs/execution.jsonl a Chrome trace"
+    )
+    parser.add_argument("log", help="archivo execution.jsonl")
+    parser.add_argument("-o", "--output", default="trace.json")
+    args = parser.parse_args()
+    n = write_chrome_trace(traces_from_log(args.log), args.output)
+    print(f"{n} spans -> {args.output} (abrir en chrome://tracing o Perfetto)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from src.config import Config
+from src.tools.prereq_graph import PrereqGraph
+from src.tools.rag import RAGTool
+from src.tools.student_store import StudentStore
+from src.tools.verification import VerificationTool
+
+# Benchmark de elegibilidad por cohortes: STUDENTS alumnos sintéticos sobre
+# el plan de estudios que extrae el RAG, guardados en un StudentStore
+# temporal. Mide la carga en bloque, la consulta "todos los habilitados para
+# COURSE" (alumnos/s) y las lecturas por alumno en frío y desde el LRU.
+#
+# Uso: STUDENTS=50000 COURSE=CC202 make bench-eligibility
+
+STUDENTS = int(os.environ.get("STUDENTS", "20000"))
+COURSE = os.environ.get("COURSE", "CC202")
+BATCH_SIZE = int(os.environ.get("BATCH_SIZE", str(Config.STUDENT_BATCH_SIZE)))
+LOOKUPS = int(os.environ.get("LOOKUPS", "2000"))
+SEED = 42
+
+
+def synthetic_histories(graph, n, rng):
+    """Cada alumno avanzó un prefijo del orden topológico y aprobó ~85%."""
+    order = [graph.codes[i] for i in graph.order]
+    for s in range(n):
+        progress = rng.randint(0, len(order))
+        passed = [c for c in order[:progress] if rng.random() < 0.85]
+        yield f"s{s:07d}", passed
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        rag = RAGTool()
+    graph = PrereqGraph.from_records(
+        rag.records, universidad=Config.VERIFICATION_UNIVERSIDAD
+    )
+    if COURSE not in graph:
+        sys.exit(f"El curso {COURSE} no está en el plan ({len(graph)} cursos).")
+    rng = random.Random(SEED)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StudentStore(
+            os.path.join(tmp, "students.sqlite3"),
+            pool_size=Config.STUDENT_DB_POOL_SIZE,
+            cache_size=Config.STUDENT_CACHE_SIZE,
+        )
+        tool = VerificationTool(graph=graph, store=store)
+
+        rows = list(synthetic_histories(graph, STUDENTS, rng))
+        _, load_s = timed(lambda: store.add_many(rows))
+        n_passed = sum(len(p) for _, p in rows)
+
+        eligible, cohort_s = timed(
+            lambda: tool.eligible_students(COURSE, batch_size=BATCH_SIZE)
+        )
+        _, scan_s = timed(lambda: sum(len(ids) for ids, _ in store.cohorts(BATCH_SIZE)))
+
+        ids = [rng.choice(rows)[0] for _ in range(LOOKUPS)]
+        _, cold_s = timed(lambda: [store.history(sid) for sid in ids])
+        _, hot_s = timed(lambda: [store.history(sid) for sid in ids])
+        store.close()
+
+    print(f"Plan: {len(graph)} cursos | Alumnos: {STUDENTS} ({n_passed} aprobados)")
+    print(f"Carga en bloque:       {load_s:.3f}s ({STUDENTS / load_s:,.0f} alumnos/s)")
+    print(
+        f"Habilitados {COURSE}:    {len(eligible)} en {cohort_s:.3f}s "
+        f"({STUDENTS / cohort_s:,.0f} alumnos/s, bloques de {BATCH_SIZE})"
+    )
+    print(f"  solo lectura SQLite: {scan_s:.3f}s")
+    print(
+        f"Lecturas por alumno:   frío {1e6 * cold_s / LOOKUPS:.1f}us | "
+        f"LRU {1e6 * hot_s / LOOKUPS:.1f}us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -117,6 +117,8 @@ def evaluate_cases(agent: AgentEngine, cases, section_name: str):
         dt = time.time() - t0
         latencies.append(dt)
 
+        # el logger escribe en segundo plano
+        agent.logger.flush()
         entry = read_last_log_entry()
         tool_used, tool_output = tool_called_from_entry(entry)
 
@@ -160,6 +162,110 @@ def evaluate_cases(agent: AgentEngine, cases, section_name: str):
     }
 
 
+# CASOS POR TOOL
+# Calculator: el agente detecta "calcular" o expresión tipo "20 + 5"
+CALCULATOR_CASES = [
+    {
+        "query": "calcular 20 + 5",
+        "expected_tool": "calculator",
+        "check_type": "float",
+        "expected": 25.0,
+    },
+    {
+        "query": "¿Cuánto es 10/4?",
+        "expected_tool": "calculator",
+        "check_type": "float",
+        "expected": 2.5,
+    },
+    {
+        "query": "calcular (3*3) + 1",
+        "expected_tool": "calculator",
+        "check_type": "float",
+        "expected": 10.0,
+    },
+    {
+        "query": "15 - 7",
+        "expected_tool": "calculator",
+        "check_type": "float",
+        "expected": 8.0,
+    },
+    {
+        "query": "calcular 2.5 * 4",
+        "expected_tool": "calculator",
+        "check_type": "float",
+        "expected": 10.0,
+    },
+]
+
+# Verification
+VERIFICATION_CASES = [
+    {
+        "query": "¿Puedo llevar CS102?",
+        "expected_tool": "verification",
+        "check_type": "contains",
+        "expected": "APPROVED",
+    },
+    {
+        "query": "¿Puedo llevar CS202?",
+        "expected_tool": "verification",
+        "check_type": "contains",
+        "expected": "REJECTED",
+    },
+    {
+        "query": "¿Soy elegible para AI301?",
+        "expected_tool": "verification",
+        "check_type": "contains",
+        "expected": "REJECTED",
+    },
+    {
+        "query": "¿Puedo llevar CS101 otra vez?",
+        "expected_tool": "verification",
+        "check_type": "contains",
+        "expected": "Status",
+    },
+    {
+        "query": "¿Puedo llevar MA101?",
+        "expected_tool": "verification",
+        "check_type": "contains",
+        "expected": "Status",
+    },
+]
+
+# RAG: evitar queries que contengan códigos tipo CC202 o códigos que estén en verificación
+RAG_CASES = [
+    {
+        "query": "¿A qué ciclo pertenece Cálculo Integral?",
+        "expected_tool": "rag",
+        "check_type": "contains",
+        "expected": "(BMA02)",
+    },
+    {
+        "query": "¿Cuántos créditos tiene Física I?",
+        "expected_tool": "rag",
+        "check_type": "contains",
+        "expected": "(BFI01)",
+    },
+    {
+        "query": "¿Física I es obligatorio o electivo en la UNI?",
+        "expected_tool": "rag",
+        "check_type": "contains",
+        "expected": "(BFI01)",
+    },
+    {
+        "query": "¿Cuál es el pre-requisito de Base de Datos Avanzadas?",
+        "expected_tool": "rag",
+        "check_type": "contains",
+        "expected": "Pre-requisito: CC202",
+    },
+    {
+        "query": "Qué cursos hay en el segundo ciclo",
+        "expected_tool": "rag",
+        "check_type": "contains",
+        "expected": "Ubicación: Segundo ciclo",
+    },
+]
+
+
 def main():
     print("Iniciando Evaluación del Agente (flujo explícito)")
 
@@ -181,113 +287,10 @@ def main():
     # core Agente
     agent = AgentEngine(llm, tools)
 
-    # CASOS POR TOOL
-    # Calculator: el agente detecta "calcular" o expresión tipo "20 + 5"
-    calculator_cases = [
-        {
-            "query": "calcular 20 + 5",
-            "expected_tool": "calculator",
-            "check_type": "float",
-            "expected": 25.0,
-        },
-        {
-            "query": "¿Cuánto es 10/4?",
-            "expected_tool": "calculator",
-            "check_type": "float",
-            "expected": 2.5,
-        },
-        {
-            "query": "calcular (3*3) + 1",
-            "expected_tool": "calculator",
-            "check_type": "float",
-            "expected": 10.0,
-        },
-        {
-            "query": "15 - 7",
-            "expected_tool": "calculator",
-            "check_type": "float",
-            "expected": 8.0,
-        },
-        {
-            "query": "calcular 2.5 * 4",
-            "expected_tool": "calculator",
-            "check_type": "float",
-            "expected": 10.0,
-        },
-    ]
-
-    # Verification
-    verification_cases = [
-        {
-            "query": "¿Puedo llevar CS102?",
-            "expected_tool": "verification",
-            "check_type": "contains",
-            "expected": "APPROVED",
-        },
-        {
-            "query": "¿Puedo llevar CS202?",
-            "expected_tool": "verification",
-            "check_type": "contains",
-            "expected": "REJECTED",
-        },
-        {
-            "query": "¿Soy elegible para AI301?",
-            "expected_tool": "verification",
-            "check_type": "contains",
-            "expected": "REJECTED",
-        },
-        {
-            "query": "¿Puedo llevar CS101 otra vez?",
-            "expected_tool": "verification",
-            "check_type": "contains",
-            "expected": "Status",
-        },
-        {
-            "query": "¿Puedo llevar MA101?",
-            "expected_tool": "verification",
-            "check_type": "contains",
-            "expected": "Status",
-        },
-    ]
-
-    # RAG: evitar queries que contengan códigos tipo CC202 o códigos que estén en verificación
-    rag_cases = [
-        {
-            "query": "¿A qué ciclo pertenece Cálculo Integral?",
-            "expected_tool": "rag",
-            "check_type": "contains",
-            "expected": "(BMA02)",
-        },
-        {
-            "query": "¿Cuántos créditos tiene Física I?",
-            "expected_tool": "rag",
-            "check_type": "contains",
-            "expected": "(BFI01)",
-        },
-        {
-            "query": "¿Física I es obligatorio o electivo en la UNI?",
-            "expected_tool": "rag",
-            "check_type": "contains",
-            "expected": "(BFI01)",
-        },
-        {
-            "query": "¿Cuál es el pre-requisito de Base de Datos Avanzadas?",
-            "expected_tool": "rag",
-            "check_type": "contains",
-            "expected": "Pre-requisito: CC202",
-        },
-        {
-            "query": "Qué cursos hay en el segundo ciclo",
-            "expected_tool": "rag",
-            "check_type": "contains",
-            "expected": "Ubicación: Segundo ciclo",
-        },
-    ]
-
     results = []
-    results.append(evaluate_cases(agent, calculator_cases, "Calculator"))
-    results.append(evaluate_cases(agent, verification_cases, "Verification"))
-    results.append(evaluate_cases(agent, rag_cases, "RAG"))
+    results.append(evaluate_cases(agent, CALCULATOR_CASES, "Calculator"))
+    results.append(evaluate_cases(agent, VERIFICATION_CASES, "Verification"))
+    results.append(evaluate_cases(agent, RAG_CASES, "RAG"))
 
     print("\nResumen Global")
     print("-" * 70)
@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from src.config import Config
+from src.agent.core import AgentEngine
+from src.tools.rag import RAGTool
+from src.tools.calculator import CalculatorTool
+from src.tools.verification import VerificationTool
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from evaluate_agent import CALCULATOR_CASES, VERIFICATION_CASES, RAG_CASES
+
+# Paridad de backends del LLM: genera las respuestas de los casos de
+# evaluate_agent.py con el modelo fp32 ("torch") y con el backend a probar
+# (LLM_BACKEND=int8 | onnx) sobre exactamente los mismos contextos, y reporta
+# coincidencia exacta, similitud por tokens, latencia y memoria residente.
+# Cada backend corre en su propio proceso para que la RSS sea comparable.
+#
+# Uso: LLM_BACKEND=int8 python test/experiments/llm_backend_parity.py
+
+BACKEND = os.environ.get("LLM_BACKEND", "int8")
+MIN_EXACT_MATCH = float(os.environ.get("MIN_EXACT_MATCH", "0.8"))
+
+
+class ContextRecorder:
+    """LLM falso que solo guarda (query, contexto) de cada llamada del agente."""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate_response(self, query: str, context: str) -> str:
+        self.calls.append((query, context))
+        return ""
+
+
+def rss_mb():
+    """Memoria residente actual del proceso (Linux)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def token_f1(a: str, b: str) -> float:
+    ta, tb = a.split(), b.split()
+    if not ta and not tb:
+        return 1.0
+    common = sum(min(ta.count(t), tb.count(t)) for t in set(ta))
+    if common == 0:
+        return 0.0
+    p, r = common / len(ta), common / len(tb)
+    return 2 * p * r / (p + r)
+
+
+def collect_contexts():
+    recorder = ContextRecorder()
+    agent = AgentEngine(recorder, [RAGTool(), CalculatorTool(), VerificationTool()])
+    for case in CALCULATOR_CASES + VERIFICATION_CASES + RAG_CASES:
+        agent.run(case["query"])
+    return recorder.calls
+
+
+def run_backend(backend, calls):
+    from src.llm.model_loader import LLMService
+
+    # Una generación a la vez: se mide la latencia por pregunta
+    Config.LLM_BATCHING = False
+
+    rss_before = rss_mb()
+    llm = LLMService(backend=backend)
+    rss_model = rss_mb() - rss_before
+
+    outputs, latencies = [], []
+    for query, context in calls:
+        t0 = time.time()
+        outputs.append(llm.generate_response(query, context))
+        latencies.append(time.time() - t0)
+
+    return outputs, latencies, rss_model
+
+
+def run_isolated(backend, calls):
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+        return ex.submit(run_backend, backend, calls).result()
+
+
+def main():
+    print(f"Paridad LLM: torch (fp32) vs {BACKEND}")
+    calls = collect_contexts()
+
+    ref, ref_lat, ref_rss = run_isolated("torch", calls)
+    got, got_lat, got_rss = run_isolated(BACKEND, calls)
+
+    print("-" * 95)
+    print(f"{'Query':<45} | {'Exacta':<6} | {'F1':<5} | {'fp32 t(s)':<9} | {'t(s)':<6}")
+    print("-" * 95)
+    exact = 0
+    f1s = []
+    for (query, _ctx), a, b, ta, tb in zip(calls, ref, got, ref_lat, got_lat):
+        same = a.strip() == b.strip()
+        exact += same
+        f1s.append(token_f1(a, b))
+        print(
+            f"{query[:43]:<45} | {str(same):<6} | {f1s[-1]:<5.2f} | {ta:<9.2f} | {tb:<6.2f}"
+        )
+        if not same:
+            print(f"    fp32: {a[:80]!r}")
+            print(f"    {BACKEND}: {b[:80]!r}")
+
+    n = len(calls)
+    exact_rate = exact / n if n else 0.0
+    print("-" * 95)
+    print(f"Casos: {n}")
+    print(f"Coincidencia exacta: {exact_rate:.2%} | F1 medio: {sum(f1s) / n:.3f}")
+    print(
+        f"Latencia media: fp32 {sum(ref_lat) / n:.3f}s | {BACKEND} {sum(got_lat) / n:.3f}s"
+    )
+    print(f"RSS del modelo: fp32 {ref_rss:.0f} MB | {BACKEND} {got_rss:.0f} MB")
+
+    if exact_rate < MIN_EXACT_MATCH:
+        print(f"FALLA: coincidencia exacta por debajo de {MIN_EXACT_MATCH:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from evaluate_agent import CALCULATOR_CASES, VERIFICATION_CASES, RAG_CASES
+
+# Prueba de carga contra el servidor HTTP (src/server.py): CONCURRENCY
+# clientes con conexión keep-alive envían REQUESTS consultas en total (los
+# casos de evaluate_agent.py en ronda) y se reporta throughput, percentiles de
+# latencia y códigos de respuesta (503 = back-pressure, 504 = timeout).
+#
+# Uso: make serve   (en otra terminal)
+#      SERVER_URL=http://127.0.0.1:8000 CONCURRENCY=8 REQUESTS=200 make load-test
+
+SERVER_URL = os.environ.get("SERVER_URL", "http://127.0.0.1:8000")
+CONCURRENCY = int(os.environ.get("CONCURRENCY", "8"))
+REQUESTS = int(os.environ.get("REQUESTS", "100"))
+READY_TIMEOUT_S = float(os.environ.get("READY_TIMEOUT_S", "600"))
+MAX_ERROR_RATE = float(os.environ.get("MAX_ERROR_RATE", "0.01"))
+
+QUERIES = [c["query"] for c in CALCULATOR_CASES + VERIFICATION_CASES + RAG_CASES]
+
+
+def connect():
+    url = urlparse(SERVER_URL)
+    return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=300)
+
+
+def get_json(path):
+    conn = connect()
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def wait_ready():
+    """Espera a que /ready devuelva 200 (LLM e índice cargados)."""
+    deadline = time.time() + READY_TIMEOUT_S
+    while time.time() < deadline:
+        try:
+            status, data = get_json("/ready")
+            if status == 200:
+                return True
+        except OSError:
+            pass  # el servidor todavía no escucha
+        time.sleep(1)
+    return False
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def client(next_index, results, lock):
+    conn = connect()
+    while True:
+        with lock:
+            i = next(next_index, None)
+        if i is None:
+            break
+        body = json.dumps({"query": QUERIES[i % len(QUERIES)]})
+        t0 = time.perf_counter()
+        try:
+            conn.request(
+                "POST",
+                "/query",
+                body=body,
+                headers={"Content-Type": "application/json"},
+            )
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            status = "conn_error"
+            conn.close()
+            conn = connect()
+        elapsed = time.perf_counter() - t0
+        with lock:
+            results.append((status, elapsed))
+    conn.close()
+
+
+def main():
+    print(
+        f"Prueba de carga: {SERVER_URL} | {CONCURRENCY} clientes | {REQUESTS} consultas"
+    )
+    if not wait_ready():
+        print(f"FALLA: el servidor no estuvo listo en {READY_TIMEOUT_S:.0f}s")
+        sys.exit(1)
+
+    results = []
+    lock = threading.Lock()
+    next_index = iter(range(REQUESTS))
+    threads = [
+        threading.Thread(target=client, args=(next_index, results, lock))
+        for _ in range(CONCURRENCY)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    codes = Counter(status for status, _ in results)
+    ok = [elapsed for status, elapsed in results if status == 200]
+    errors = len(results) - len(ok)
+
+    print("-" * 60)
+    print(f"Tiempo total: {wall:.2f}s | Throughput: {len(ok) / wall:.2f} req/s")
+    print(
+        f"Latencia OK (s): p50 {percentile(ok, 50):.3f} | "
+        f"p90 {percentile(ok, 90):.3f} | p99 {percentile(ok, 99):.3f} | "
+        f"max {max(ok, default=float('nan')):.3f}"
+    )
+    print(f"Códigos: {dict(codes)}")
+
+    _status, health = get_json("/health")
+    print(f"Servidor: {json.dumps(health, ensure_ascii=False)}")
+
+    error_rate = errors / len(results) if results else 1.0
+    if error_rate > MAX_ERROR_RATE:
+        print(f"FALLA: {error_rate:.1%} de errores (máximo {MAX_ERROR_RATE:.0%})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
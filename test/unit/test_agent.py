@@ -0,0 +1,152 @@
+import json
+import os
+import time
+
+import pytest
+from src.agent.core import AgentEngine
+from src.config import Config
+from src.tools.calculator import CalculatorTool
+from src.tools.prereq_graph import PrereqGraph
+from src.tools.records import RecordStore, format_course_record
+from src.tools.verification import VerificationTool
+
+
+class EchoLLM:
+    def generate_response(self, query, context):
+        return f"Respuesta: {context}"
+
+
+class StreamingLLM(EchoLLM):
+    def stream_response(self, query, context):
+        yield "Respuesta: "
+        yield context
+
+
+class TestAgentStreaming:
+    @pytest.fixture
+    def log_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+        return tmp_path
+
+    def last_entry(self, agent, log_dir):
+        agent.logger.flush()
+        with open(os.path.join(log_dir, "execution.jsonl"), encoding="utf-8") as f:
+            return json.loads(f.readlines()[-1])
+
+    @pytest.mark.parametrize("llm", [EchoLLM(), StreamingLLM()])
+    def test_stream_igual_a_run(self, llm, log_dir):
+        agent = AgentEngine(llm, [CalculatorTool()])
+        response, _latency = agent.run("calcular 20 + 5")
+        deltas = list(agent.run_stream("calcular 20 + 5"))
+        assert "".join(deltas) == response
+
+    def test_log_registra_ttft(self, log_dir):
+        agent = AgentEngine(StreamingLLM(), [CalculatorTool()])
+        deltas = list(agent.run_stream("calcular 2 * 3"))
+        assert len(deltas) == 2
+        entry = self.last_entry(agent, log_dir)
+        assert entry["final_response"] == "".join(deltas)
+        assert entry["steps_trace"][0]["tool"] == "calculator"
+        assert 0 <= entry["ttft_seconds"] <= entry["latency_seconds"]
+        assert agent.last_ttft <= agent.last_latency
+
+
+class SlowTool:
+    def __init__(self, name, delay, output):
+        self.name = name
+        self.delay = delay
+        self.output = output
+
+    def run(self, query, intent=None, **kwargs):
+        time.sleep(self.delay)
+        return self.output
+
+
+class TestToolPlan:
+    QUERY = "¿Puedo llevar CS202 y cuántos créditos tiene?"
+
+    @pytest.fixture(autouse=True)
+    def log_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+        monkeypatch.setattr(Config, "RESPONSE_CACHE", False)
+
+    def test_pregunta_compuesta_corre_herramientas_en_paralelo(self):
+        tools = [
+            SlowTool("verification", 0.3, "APPROVED: CS202"),
+            SlowTool("rag", 0.3, "Créditos: 4"),
+        ]
+        agent = AgentEngine(EchoLLM(), tools)
+        response, latency = agent.run(self.QUERY)
+
+        # Las dos salidas en el contexto, en el orden del plan
+        assert response == "Respuesta: APPROVED: CS202\nCréditos: 4"
+        # Cuesta lo que la más lenta, no la suma
+        assert latency < 0.5
+
+    def test_timeout_de_una_herramienta_no_tumba_a_las_demas(self, monkeypatch):
+        monkeypatch.setattr(Config, "TOOL_TIMEOUTS_S", {"rag": 0.1})
+        tools = [
+            SlowTool("verification", 0.0, "APPROVED: CS202"),
+            SlowTool("rag", 1.0, "Créditos: 4"),
+        ]
+        agent = AgentEngine(EchoLLM(), tools)
+        context, steps = agent._call_tools(self.QUERY)
+
+        assert context == "APPROVED: CS202"
+        assert steps[0] == {"tool": "verification", "output": "APPROVED: CS202"}
+        assert steps[1]["tool"] == "rag" and steps[1]["timeout"]
+
+    def test_rag_deja_lugar_a_las_otras_herramientas(self):
+        class BudgetLLM(EchoLLM):
+            def context_budget(self, query):
+                return 200
+
+            def count_tokens(self, texts):
+                return [len(t.split()) for t in texts]
+
+        class BudgetTool(SlowTool):
+            def run(self, query, intent=None, **kwargs):
+                budgets.append(kwargs.get("max_tokens"))
+                return self.output
+
+        budgets = []
+        tools = [
+            SlowTool("verification", 0.0, "APPROVED: CS202"),
+            BudgetTool("rag", 0.0, "Créditos: 4"),
+        ]
+        agent = AgentEngine(BudgetLLM(), tools)
+        agent.run(self.QUERY)
+        agent.run("Que cursos hay en el primer ciclo")
+        assert budgets == [200 - Config.TOOL_CONTEXT_RESERVE_TOKENS, 200]
+
+
+class TestVerificationRouting:
+    @pytest.fixture(autouse=True)
+    def log_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+        monkeypatch.setattr(Config, "RESPONSE_CACHE", False)
+
+    def test_codigo_del_plan_va_a_la_verificacion(self):
+        # Plan cargado de los PDFs (VERIFICATION_SOURCE="records")
+        tag = "[UNI Universidad Nacional de Ingenieria]"
+        docs = [
+            format_course_record(
+                tag, "Cálculo I", "BMA01", "Primer ciclo", "Obligatorio", "5", "Ninguno"
+            ),
+            format_course_record(
+                tag, "Cálculo II", "BMA02", "Segundo ciclo", "Obligatorio", "5", "BMA01"
+            ),
+        ]
+        graph = PrereqGraph.from_records(RecordStore(docs))
+        tool = VerificationTool(graph=graph, student_history={"BMA01"})
+        agent = AgentEngine(EchoLLM(), [tool])
+
+        intent = agent.router.route("¿Puedo llevar BMA02?")
+        assert (intent.plan, intent.course_code) == (("verification",), "BMA02")
+        response, _ = agent.run("¿Puedo llevar BMA02?")
+        assert (
+            response
+            == "Respuesta: APPROVED: Puedes matricularte en BMA02 (Cálculo II)."
+        )
+        # Un código que el plan no conoce sigue yendo al RAG
+        assert agent.router.route("¿Puedo llevar XYZ99?").plan == ("rag",)
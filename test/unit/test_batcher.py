@@ -0,0 +1,59 @@
+import threading
+import time
+
+import pytest
+from src.llm.batcher import GenerationBatcher
+
+
+class TestGenerationBatcher:
+    @pytest.fixture
+    def calls(self):
+        return []
+
+    @pytest.fixture
+    def batcher(self, calls):
+        def generate_batch(prompts):
+            calls.append(list(prompts))
+            time.sleep(0.01)
+            return [p.upper() for p in prompts]
+
+        b = GenerationBatcher(generate_batch, max_batch_size=4, max_wait_ms=50)
+        yield b
+        b.close()
+
+    def test_cada_caller_recibe_su_salida(self, batcher):
+        assert batcher.generate("hola") == "HOLA"
+
+    def test_llamadas_concurrentes_se_agrupan(self, batcher, calls):
+        prompts = [f"p{i}" for i in range(8)]
+        results = {}
+
+        def worker(p):
+            results[p] = batcher.generate(p)
+
+        threads = [threading.Thread(target=worker, args=(p,)) for p in prompts]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == {p: p.upper() for p in prompts}
+        assert max(len(c) for c in calls) > 1
+        assert all(len(c) <= 4 for c in calls)
+        stats = batcher.stats()
+        assert stats["requests"] == 8
+        assert stats["batches"] == len(calls)
+        assert stats["max_batch_size"] <= 4
+        assert stats["queue_depth"] == 0
+
+    def test_error_se_propaga_a_todo_el_lote(self):
+        def failing(prompts):
+            raise ValueError("sin memoria")
+
+        b = GenerationBatcher(failing, max_batch_size=2, max_wait_ms=1)
+        with pytest.raises(ValueError):
+            b.generate("x")
+        assert b.stats()["errors"] == 1
+        b.close()
+        with pytest.raises(RuntimeError):
+            b.submit("y")
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+from src.tools.bm25 import BM25Index
+from src.tools.rag import tokenize
+
+
+class TestBM25Index:
+    @pytest.fixture
+    def corpus(self):
+        docs = [
+            "[UCSP] En la Universidad San Pablo el curso de Algoritmos requiere CS101.",
+            "[UNMSM] En la Universidad San Marcos el curso de Algoritmos requiere Matematicas Basicas.",
+            "[UNI] La nota minima para aprobar en la UNI es 10.",
+            "[UCSP] La nota minima para aprobar en San Pablo es 12.",
+            "[GENERAL] La inteligencia artificial es el futuro.",
+            "[UNI] Curso: Fisica I (BFI01) | Ubicación: Primer ciclo | Créditos: 5",
+        ]
+        return [tokenize(d) for d in docs]
+
+    @pytest.fixture
+    def big_corpus(self):
+        rng = np.random.default_rng(0)
+        vocab = [f"t{i}" for i in range(400)]
+        return [list(rng.choice(vocab, size=rng.integers(3, 20))) for _ in range(3000)]
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "requisito algoritmos san marcos",
+            "nota minima aprobar uni",
+            "san san pablo",  # términos repetidos
+            "palabra_inexistente",
+        ],
+    )
+    def test_scores_iguales_a_rank_bm25(self, corpus, query):
+        ref = BM25Okapi(corpus).get_scores(tokenize(query))
+        got = BM25Index(corpus).get_scores(tokenize(query))
+        assert np.allclose(got, ref, atol=1e-9)
+
+    def test_top_k_con_poda_es_exacto(self, big_corpus):
+        index = BM25Index(big_corpus)
+        ref_engine = BM25Okapi(big_corpus)
+        assert index.all_idf_positive
+        rng = np.random.default_rng(1)
+        for _ in range(30):
+            query = [f"t{i}" for i in rng.integers(0, 400, size=rng.integers(1, 6))]
+            ref = ref_engine.get_scores(query)
+            docs, scores = index.top_k(query, 10)
+            expected = np.lexsort((np.arange(len(ref)), -ref))[: len(docs)]
+            assert np.allclose(scores, ref[expected], atol=1e-9)
+            assert np.allclose(ref[docs], scores, atol=1e-9)
+
+    def test_top_k_con_mascara_solo_puntua_el_alcance(self, big_corpus):
+        index = BM25Index(big_corpus)
+        ref = BM25Okapi(big_corpus)
+        rng = np.random.default_rng(2)
+        mask = rng.random(len(big_corpus)) < 0.1
+        for _ in range(20):
+            query = [f"t{i}" for i in rng.integers(0, 400, size=rng.integers(1, 6))]
+            full = np.where(mask, ref.get_scores(query), -np.inf)
+            docs, scores = index.top_k(query, 5, mask)
+            assert mask[docs].all()
+            expected = np.lexsort((np.arange(len(full)), -full))[: len(docs)]
+            assert np.allclose(scores, full[expected], atol=1e-9)
+
+    def test_score_postings_batch_igual_a_una_por_una(self, big_corpus, monkeypatch):
+        index = BM25Index(big_corpus)
+        rng = np.random.default_rng(3)
+        queries = [
+            [f"t{i}" for i in rng.integers(0, 400, size=rng.integers(0, 6))]
+            for _ in range(40)
+        ]
+        mask = rng.random(len(big_corpus)) < 0.5
+        # Bloques pequeños para cubrir también el acumulador por sort
+        monkeypatch.setattr("src.tools.bm25.ACCUMULATOR_CELLS", 7000)
+        for m in (None, mask):
+            batch = index.score_postings_batch(queries, m)
+            for query, (docs, scores) in zip(queries, batch):
+                ref_docs, ref_scores = index.score_postings(query, m)
+                assert np.array_equal(docs, ref_docs)
+                assert np.array_equal(scores, ref_scores)
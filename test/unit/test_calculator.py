@@ -33,3 +33,21 @@ class TestCalculatorTool:
 
     def test_sin_calculo(self, tool):
         assert tool.run("Hola mundo") == "No calculation found."
+
+    def test_potencias_acotadas(self, tool):
+        assert tool.run("2 ** 10") == "1024"
+        assert tool.run("2 ** -2") == "0.25"
+        # Antes esto dejaba la CPU ocupada calculando el entero
+        assert tool.run("9 ** 9 ** 9") == "Error in calculation: exponent too large"
+        assert "too large" in tool.run("7 ** 9999")
+
+    def test_lote_igual_que_una_por_una(self, tool):
+        inputs = [f"calcular {i} * 3 + 0.5" for i in range(20)] + [
+            "20 / 2",
+            "10 / 0",
+            "1.2.3",
+            "Hola mundo",
+            "2 ** 8",
+            "9007199254740993 * 3",
+        ]
+        assert tool.run_batch(inputs) == [tool.run(text) for text in inputs]
@@ -0,0 +1,36 @@
+import faiss
+import numpy as np
+import pytest
+from src.config import Config
+from src.tools.dense_index import build_dense_index, is_exact
+
+
+class TestDenseIndex:
+    @pytest.fixture
+    def embeddings(self):
+        rng = np.random.default_rng(0)
+        emb = rng.normal(size=(400, 16)).astype("float32")
+        faiss.normalize_L2(emb)
+        return emb
+
+    def test_corpus_chico_usa_flat(self, embeddings, monkeypatch):
+        monkeypatch.setattr(Config, "FAISS_INDEX_TYPE", "hnsw")
+        monkeypatch.setattr(Config, "FAISS_ANN_MIN_DOCS", 1000)
+        index = build_dense_index(embeddings)
+        assert is_exact(index)
+        assert index.ntotal == len(embeddings)
+
+    @pytest.mark.parametrize("kind", ["ivf_flat", "hnsw"])
+    def test_ann_encuentra_el_vecino_exacto(self, embeddings, monkeypatch, kind):
+        monkeypatch.setattr(Config, "FAISS_INDEX_TYPE", kind)
+        monkeypatch.setattr(Config, "FAISS_ANN_MIN_DOCS", 0)
+        monkeypatch.setattr(Config, "FAISS_NPROBE", 64)
+        index = build_dense_index(embeddings)
+        assert not is_exact(index)
+        _, idx = index.search(embeddings[:20], 1)
+        assert (idx[:, 0] == np.arange(20)).mean() >= 0.9
+
+    def test_tipo_desconocido(self, embeddings, monkeypatch):
+        monkeypatch.setattr(Config, "FAISS_INDEX_TYPE", "lsh")
+        with pytest.raises(ValueError):
+            build_dense_index(embeddings)
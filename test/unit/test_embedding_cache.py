@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+import pytest
+from src.tools.embedding_cache import EmbeddingCache
+
+
+class CountingEmbedder:
+    """Embedder determinista que cuenta los textos que pasan por el modelo."""
+
+    def __init__(self):
+        self.seen = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.seen.extend(texts)
+        return np.array(
+            [[len(t), sum(map(ord, t)) % 97, 1.0] for t in texts], dtype="float32"
+        )
+
+
+class TestEmbeddingCache:
+    @pytest.fixture
+    def embedder(self):
+        return CountingEmbedder()
+
+    def test_lru_de_queries(self, embedder):
+        cache = EmbeddingCache(embedder, "modelo", query_capacity=2)
+        v1 = cache.encode_query("creditos de fisica")
+        v2 = cache.encode_query("creditos  de fisica ")  # misma llave normalizada
+        assert np.allclose(v1, v2)
+        assert np.isclose(np.linalg.norm(v1), 1.0)
+        assert embedder.seen == ["creditos de fisica"]
+
+        cache.encode_query("b")
+        cache.encode_query("c")  # expulsa la query más antigua
+        cache.encode_query("creditos de fisica")
+        stats = cache.stats()
+        assert stats["query_hits"] == 1
+        assert stats["query_misses"] == 4
+        assert stats["query_entries"] == 2
+
+    def test_documentos_en_disco_se_reutilizan(self, embedder, tmp_path):
+        docs = ["[UNI] Fisica I", "[UNI] Calculo", "[UNI] Fisica I"]
+        cache = EmbeddingCache(embedder, "modelo", cache_dir=str(tmp_path))
+        first = cache.encode_documents(docs)
+        assert first.shape == (3, 3)
+        assert embedder.seen == ["[UNI] Fisica I", "[UNI] Calculo"]
+
+        # Otro proceso (nueva instancia) lee los vectores del memmap
+        other = CountingEmbedder()
+        reopened = EmbeddingCache(other, "modelo", cache_dir=str(tmp_path))
+        again = reopened.encode_documents(docs + ["[UNMSM] Algoritmos"])
+        assert np.allclose(again[:3], first)
+        assert other.seen == ["[UNMSM] Algoritmos"]
+        assert reopened.stats()["doc_hits"] == 3
+
+    def test_dos_instancias_escriben_alineadas(self, embedder, tmp_path):
+        a = EmbeddingCache(embedder, "modelo", cache_dir=str(tmp_path))
+        b = EmbeddingCache(CountingEmbedder(), "modelo", cache_dir=str(tmp_path))
+        a.encode_documents(["uno", "dos"])
+        # b no vio lo que escribió a: lo relee antes de agregar y no duplica
+        b.encode_documents(["dos", "tres"])
+        a.encode_documents(["cuatro"])
+
+        reopened = EmbeddingCache(CountingEmbedder(), "modelo", cache_dir=str(tmp_path))
+        docs = ["uno", "dos", "tres", "cuatro"]
+        assert reopened.stats()["doc_entries"] == 4
+        assert np.allclose(reopened.encode_documents(docs), a.encode_documents(docs))
+
+    def test_queries_no_esperan_al_build(self, tmp_path):
+        started, release = threading.Event(), threading.Event()
+
+        class SlowEmbedder(CountingEmbedder):
+            def encode(self, texts, convert_to_numpy=True):
+                if texts[0].startswith("[DOC]"):
+                    started.set()
+                    release.wait(5)
+                return super().encode(texts)
+
+        cache = EmbeddingCache(SlowEmbedder(), "modelo", cache_dir=str(tmp_path))
+        build = threading.Thread(target=cache.encode_documents, args=(["[DOC] a"],))
+        build.start()
+        assert started.wait(5)
+        # Con el build a mitad del forward pass, la query se resuelve igual
+        assert cache.encode_query("creditos").shape == (1, 3)
+        release.set()
+        build.join()
+        assert cache.stats()["doc_entries"] == 1
@@ -0,0 +1,50 @@
+import pytest
+from src.tools.expression import (
+    ExpressionError,
+    compile_expression,
+    evaluate,
+    evaluate_batch,
+)
+
+
+class TestExpression:
+    @pytest.mark.parametrize(
+        "expr",
+        [
+            "-2 ** 2",
+            "2 ** -1",
+            "2 ** 3 ** 2",
+            "8 // 3 // 2",
+            "7 // -2",
+            "- - 3",
+            ".5 + 5.",
+        ],
+    )
+    def test_mismo_resultado_que_python(self, expr):
+        assert evaluate(expr) == eval(expr)
+        assert type(evaluate(expr)) is type(eval(expr))
+
+    def test_errores_de_sintaxis_como_eval(self):
+        for expr in ("1.2.3", "007", "2 * * 3"):
+            with pytest.raises(SyntaxError) as ours:
+                evaluate(expr)
+            with pytest.raises(SyntaxError) as python:
+                eval(expr)
+            assert str(ours.value) == str(python.value)
+
+    def test_nodos_no_permitidos(self):
+        with pytest.raises(ExpressionError, match="Call"):
+            evaluate("(1)(2)")
+        with pytest.raises(ExpressionError, match="too complex"):
+            evaluate(" + ".join(["1"] * 500))
+
+    def test_cache_por_texto_y_misma_forma(self):
+        assert compile_expression("20 + 5") is compile_expression("20 + 5")
+        assert compile_expression("20 + 5").ops == compile_expression("3 + 4").ops
+
+    def test_lote_vectorizado(self):
+        exprs = [f"{i} * 2 / 4" for i in range(10)] + ["1 / 0", "2 ** 3"]
+        out = evaluate_batch(exprs)
+        assert out[:10] == [i * 2 / 4 for i in range(10)]
+        assert isinstance(out[10], ZeroDivisionError)
+        assert out[11] == 8
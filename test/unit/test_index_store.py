@@ -0,0 +1,98 @@
+import faiss
+import numpy as np
+import pytest
+from src.tools.bm25 import BM25Index
+from src.tools.index_store import (
+    diff_file_hashes,
+    hash_pdf_files,
+    index_fingerprint,
+    CURRENT_FILE,
+    is_snapshot_valid,
+    load_snapshot,
+    save_snapshot,
+)
+
+
+class TestIndexStore:
+    @pytest.fixture
+    def data_dir(self, tmp_path):
+        d = tmp_path / "data"
+        d.mkdir()
+        (d / "plan-a.pdf").write_bytes(b"%PDF-1.4 plan a")
+        (d / "notas.txt").write_text("no es pdf")
+        return d
+
+    def test_hash_solo_pdfs(self, data_dir):
+        hashes = hash_pdf_files(str(data_dir))
+        assert list(hashes) == ["plan-a.pdf"]
+
+    def test_fingerprint_cambia_con_modelo_y_contenido(self, data_dir):
+        hashes = hash_pdf_files(str(data_dir))
+        base = index_fingerprint("modelo-a", hashes)
+        assert index_fingerprint("modelo-b", hashes) != base
+
+        (data_dir / "plan-a.pdf").write_bytes(b"%PDF-1.4 plan a editado")
+        assert index_fingerprint("modelo-a", hash_pdf_files(str(data_dir))) != base
+
+    def test_roundtrip_snapshot(self, tmp_path, data_dir):
+        docs = ["[UNI] Curso: Fisica I (BFI01)", "[UNI] Curso: Calculo (BMA01)"]
+        emb = np.eye(2, 4, dtype="float32")
+        index = faiss.IndexFlatIP(4)
+        index.add(emb)
+        hashes = hash_pdf_files(str(data_dir))
+        index_dir = str(tmp_path / "index")
+        bm25 = BM25Index([["fisica", "bfi01"], ["calculo", "bma01"]])
+
+        save_snapshot(
+            index_dir, "modelo-a", hashes, docs, ["plan-a.pdf"] * 2, emb, index, bm25
+        )
+        snap = load_snapshot(index_dir)
+
+        # Textos y arreglos BM25 quedan mapeados (solo lectura), no en el heap
+        assert list(snap["documents"]) == docs
+        assert snap["documents"][-1] == docs[-1] and snap["sources"][0] == "plan-a.pdf"
+        assert isinstance(snap["bm25"].impacts, np.memmap)
+        assert np.array_equal(
+            snap["bm25"].get_scores(["fisica"]), bm25.get_scores(["fisica"])
+        )
+        assert snap["index"].ntotal == 2
+        assert np.allclose(snap["embeddings"], emb)
+        assert is_snapshot_valid(snap["manifest"], "modelo-a", hashes)
+        assert not is_snapshot_valid(snap["manifest"], "modelo-b", hashes)
+
+    def test_publicacion_por_versiones(self, tmp_path):
+        def save(docs):
+            emb = np.eye(len(docs), 4, dtype="float32")
+            index = faiss.IndexFlatIP(4)
+            index.add(emb)
+            bm25 = BM25Index([d.split() for d in docs])
+            hashes = {"plan.pdf": str(len(docs))}
+            save_snapshot(
+                index_dir, "m", hashes, docs, ["plan.pdf"] * len(docs), emb, index, bm25
+            )
+
+        index_dir = str(tmp_path / "index")
+        save(["uno"])
+        first = load_snapshot(index_dir)
+        save(["uno", "dos"])
+        save(["uno", "dos", "tres"])
+
+        # El lector que ya cargó sigue leyendo su versión
+        assert list(first["documents"]) == ["uno"]
+        assert list(load_snapshot(index_dir)["documents"]) == ["uno", "dos", "tres"]
+        # Quedan la versión vigente y la anterior, sin temporales
+        names = sorted(p.name for p in (tmp_path / "index").iterdir())
+        versions = [n for n in names if n.startswith("v-")]
+        assert len(versions) == 2
+        assert (tmp_path / "index" / CURRENT_FILE).read_text() in versions
+        assert not [n for n in names if n.startswith(".tmp-")]
+
+    def test_diff_incremental(self):
+        old = {"a.pdf": "h1", "b.pdf": "h2", "c.pdf": "h3"}
+        new = {"a.pdf": "h1", "b.pdf": "h2-editado", "d.pdf": "h4"}
+        to_extract, stale = diff_file_hashes(old, new)
+        assert to_extract == ["b.pdf", "d.pdf"]
+        assert stale == {"b.pdf", "c.pdf"}
+
+    def test_snapshot_inexistente(self, tmp_path):
+        assert load_snapshot(str(tmp_path / "no-existe")) is None
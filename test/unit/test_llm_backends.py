@@ -0,0 +1,33 @@
+import pytest
+import torch
+from transformers import T5Config, T5ForConditionalGeneration
+from src.llm.backends import load_seq2seq_model
+
+
+class TestLLMBackends:
+    @pytest.fixture
+    def tiny_t5(self, tmp_path):
+        cfg = T5Config(
+            vocab_size=64,
+            d_model=32,
+            d_ff=64,
+            num_layers=1,
+            num_heads=2,
+            d_kv=16,
+            decoder_start_token_id=0,
+            pad_token_id=0,
+            eos_token_id=1,
+        )
+        T5ForConditionalGeneration(cfg).save_pretrained(tmp_path)
+        return str(tmp_path)
+
+    def test_backend_desconocido(self, tiny_t5):
+        with pytest.raises(ValueError):
+            load_seq2seq_model(tiny_t5, "tensorrt")
+
+    def test_int8_cuantiza_las_lineales(self, tiny_t5):
+        model = load_seq2seq_model(tiny_t5, "int8")
+        linears = [m for m in model.modules() if type(m) is torch.nn.Linear]
+        assert not linears
+        out = model.generate(input_ids=torch.tensor([[5, 6, 7]]), max_new_tokens=3)
+        assert out.shape[0] == 1
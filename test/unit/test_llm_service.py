@@ -0,0 +1,50 @@
+import pytest
+from src.config import Config
+from src.llm.model_loader import LLMService
+from src.tools.text import take_within_budget
+
+
+class WordTokenizer:
+    """Tokenizer de juguete: un token por palabra."""
+
+    def __call__(self, texts, add_special_tokens=True):
+        single = isinstance(texts, str)
+        ids = [list(range(len(t.split()))) for t in ([texts] if single else texts)]
+        return {"input_ids": ids[0] if single else ids}
+
+    def decode(self, ids, **kwargs):
+        return " ".join(f"w{i}" for i in ids)
+
+
+class TestPromptPacking:
+    @pytest.fixture
+    def llm(self):
+        service = LLMService.__new__(LLMService)
+        service.tokenizer = WordTokenizer()
+        service.batcher = None
+        return service
+
+    def test_take_within_budget(self):
+        assert take_within_budget([3, 3, 3], 7) == 2
+        assert take_within_budget([3, 3, 3], 9) == 3
+        assert take_within_budget([10, 1], 5) == 1  # el primero se trunca
+        assert take_within_budget([], 5) == 0
+
+    def test_empaqueta_registros_enteros_por_relevancia(self, llm):
+        listing = "\n".join(f"curso {i} uno dos" for i in range(10))
+        packed = llm.pack_context(listing, 9)
+        assert packed == "curso 0 uno dos\ncurso 1 uno dos"
+
+        top_k = "a b c d\n\ne f\n\ng h i"
+        assert llm.pack_context(top_k, 6) == "a b c d\n\ne f"
+
+    def test_trunca_solo_si_el_primero_no_cabe(self, llm):
+        assert llm.pack_context("a b c d e f\n\ng", 3) == "w0 w1 w2"
+
+    def test_prompt_respeta_el_limite_del_encoder(self, llm, monkeypatch):
+        monkeypatch.setattr(Config, "LLM_MAX_INPUT_TOKENS", 40)
+        query = "¿Qué cursos hay en el segundo ciclo?"
+        context = "\n".join(f"[UNI] Curso: C{i} | Créditos: 4" for i in range(50))
+        prompt = llm.build_prompt(query, context)
+        assert llm.count_tokens([prompt])[0] + 1 <= 40
+        assert "C0 " in prompt and "C49" not in prompt
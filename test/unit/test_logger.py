@@ -0,0 +1,140 @@
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+
+import pytest
+from src.agent.core import AgentEngine
+from src.config import Config
+from src.tools.calculator import CalculatorTool
+from src.utils.logger import AgentLogger, LogWriter
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestAgentLogger:
+    @pytest.fixture
+    def log_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+        return tmp_path
+
+    def test_flush_escribe_todas_las_entradas(self, log_dir):
+        logger = AgentLogger()
+        for i in range(150):
+            logger.log_interaction(f"q{i}", [], "ñandú", 0.5)
+        assert logger.flush(timeout=5)
+
+        entries = read_lines(logger.log_file)
+        assert [e["query"] for e in entries] == [f"q{i}" for i in range(150)]
+        assert entries[0]["final_response"] == "ñandú"
+        stats = logger.stats()
+        assert stats["written"] == 150 and stats["dropped"] == 0
+
+    def test_una_entrada_por_consulta_con_latencia_real(self, log_dir):
+        class EchoLLM:
+            def generate_response(self, query, context):
+                return f"Respuesta: {context}"
+
+        agent = AgentEngine(EchoLLM(), [CalculatorTool()])
+        _response, latency = agent.run("calcular 20 + 5")
+        agent.logger.flush()
+
+        entries = read_lines(agent.logger.log_file)
+        assert len(entries) == 1
+        assert entries[0]["latency_seconds"] == round(latency, 4)
+
+    def test_cola_llena_descarta_sin_bloquear(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_QUEUE_SIZE", 1)
+        writer = LogWriter(str(tmp_path / "execution.jsonl"))
+        # El hilo escritor consume a lo más una; el resto no entra
+        accepted = sum(writer.write(b"{}\n") for _ in range(200))
+        writer.close()
+        stats = writer.stats()
+        assert accepted + stats["dropped"] == 200
+        assert stats["dropped"] > 0
+        assert stats["written"] == accepted
+
+    def test_error_de_escritura_cuenta_como_descartado(self, tmp_path):
+        blocker = tmp_path / "logs"
+        blocker.write_text("no es un directorio")
+        writer = LogWriter(str(blocker / "execution.jsonl"))
+        for _ in range(3):
+            writer.write(b"{}\n")
+        assert writer.flush(timeout=5)
+        assert writer.stats()["dropped"] == 3
+
+        # Se reabre el archivo en el siguiente lote
+        blocker.unlink()
+        writer.write(b"{}\n")
+        writer.close()
+        stats = writer.stats()
+        assert (stats["written"], stats["dropped"]) == (1, 3)
+
+    def test_flush_y_close_respetan_el_timeout(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_QUEUE_SIZE", 1)
+        writer = LogWriter(str(tmp_path / "execution.jsonl"))
+        stuck = threading.Event()
+        # Disco atascado: el hilo escritor no vuelve del primer lote
+        monkeypatch.setattr(writer, "_write_batch", lambda batch: stuck.wait(5))
+        for _ in range(3):
+            writer.write(b"{}\n")
+
+        t0 = time.monotonic()
+        assert writer.flush(timeout=0.2) is False
+        writer.close(timeout=0.2)
+        assert time.monotonic() - t0 < 2
+        stuck.set()
+
+
+class TestRotation:
+    @pytest.mark.parametrize("compress", [True, False])
+    def test_rotacion_por_tamano(self, tmp_path, monkeypatch, compress):
+        monkeypatch.setattr(Config, "LOG_MAX_BYTES", 100)
+        monkeypatch.setattr(Config, "LOG_BATCH_SIZE", 1)
+        monkeypatch.setattr(Config, "LOG_COMPRESS", compress)
+        monkeypatch.setattr(Config, "LOG_BACKUP_COUNT", 2)
+        path = str(tmp_path / "execution.jsonl")
+        writer = LogWriter(path)
+        for i in range(10):
+            writer.write(json.dumps({"i": i, "pad": "x" * 60}).encode() + b"\n")
+            writer.flush()
+        writer.close()
+
+        backups = sorted(glob.glob(str(tmp_path / "execution-*")))
+        assert len(backups) == 2
+        assert writer.stats()["rotations"] > 2
+        assert all(b.endswith(".gz") == compress for b in backups)
+
+        # Lo último queda en el archivo activo y el backup más nuevo sigue
+        # justo antes, sin entradas perdidas entre ambos
+        active = read_lines(path)
+        assert active[-1]["i"] == 9
+        opener = gzip.open if compress else open
+        with opener(backups[-1], "rt", encoding="utf-8") as f:
+            assert json.loads(f.readlines()[-1])["i"] == active[0]["i"] - 1
+        assert os.path.getsize(path) < 200
+
+    def test_varios_procesos_rotan_sin_perder_entradas(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_MAX_BYTES", 200)
+        monkeypatch.setattr(Config, "LOG_BATCH_SIZE", 1)
+        monkeypatch.setattr(Config, "LOG_BACKUP_COUNT", 100)
+        path = str(tmp_path / "execution.jsonl")
+        # Dos escritores sobre el mismo archivo, como dos workers del pre-fork
+        writers = [LogWriter(path), LogWriter(path)]
+        for i in range(40):
+            writer = writers[i % 2]
+            writer.write(json.dumps({"i": i, "pad": "x" * 60}).encode() + b"\n")
+            writer.flush()
+        for writer in writers:
+            writer.close()
+
+        seen = [e["i"] for e in read_lines(path)]
+        for backup in glob.glob(str(tmp_path / "execution-*.gz")):
+            with gzip.open(backup, "rt", encoding="utf-8") as f:
+                seen.extend(json.loads(line)["i"] for line in f)
+        assert sorted(seen) == list(range(40))
@@ -0,0 +1,88 @@
+import pytest
+from src.tools.prereq_graph import PrereqCycleError, PrereqGraph
+from src.tools.records import RecordStore, format_course_record
+
+
+class TestPrereqGraph:
+    @pytest.fixture
+    def graph(self):
+        # MA1 -> MA2 -> MA3 -> FI3 <- FI1 ; LE1 suelto
+        return PrereqGraph(
+            {
+                "MA3": ["MA2"],
+                "MA2": ["MA1"],
+                "MA1": [],
+                "FI1": [],
+                "FI3": ["MA3", "FI1"],
+                "LE1": [],
+            }
+        )
+
+    def test_orden_topologico(self, graph):
+        order = [graph.codes[i] for i in graph.order]
+        for code, reqs in graph.prereqs.items():
+            assert all(order.index(r) < order.index(code) for r in reqs)
+
+    def test_ciclo_es_error_de_carga(self):
+        with pytest.raises(PrereqCycleError, match="A, B"):
+            PrereqGraph({"A": ["B"], "B": ["A"], "C": []})
+
+    def test_cadena_faltante_transitiva(self, graph):
+        chains = graph.missing_chain("FI3", [set(), {"MA2"}, {"MA3", "FI1"}])
+        assert chains == [["MA1", "FI1", "MA2", "MA3"], ["FI1", "MA3"], []]
+
+    def test_elegibles_en_bloque(self, graph):
+        histories = [set(), {"MA1", "FI1"}, {"MA1", "MA2", "MA3", "FI1"}]
+        assert graph.eligible_courses(histories) == [
+            ["MA1", "FI1", "LE1"],
+            ["LE1", "MA2"],
+            ["LE1", "FI3"],
+        ]
+        assert graph.eligible(histories).shape == (3, len(graph))
+
+    def test_ruta_por_ciclos(self, graph):
+        paths = graph.path_to("FI3", [set(), {"MA1", "MA2"}, {"FI3"}])
+        assert paths[0] == [["MA1", "FI1"], ["MA2"], ["MA3"], ["FI3"]]
+        assert paths[1] == [["FI1", "MA3"], ["FI3"]]
+        assert paths[2] == []
+
+    def test_mas_de_64_cursos(self):
+        prereqs = {f"C{i}": [f"C{i - 1}"] if i else [] for i in range(100)}
+        graph = PrereqGraph(prereqs)
+        assert graph.n_words == 2
+        passed = {f"C{i}" for i in range(70)}
+        assert graph.eligible_courses([passed]) == [["C70"]]
+        assert graph.missing_chain("C72", [passed]) == [["C70", "C71"]]
+
+    def test_desde_records(self):
+        docs = [
+            format_course_record(
+                "[UNI Universidad Nacional de Ingenieria]",
+                "Cálculo I",
+                "BMA01",
+                "Primer ciclo",
+                "Obligatorio",
+                "5",
+                "Ninguno",
+            ),
+            format_course_record(
+                "[UNI Universidad Nacional de Ingenieria]",
+                "Cálculo II",
+                "BMA02",
+                "Segundo ciclo",
+                "Obligatorio",
+                "5",
+                "BMA01",
+            ),
+            "[GENERAL] La inteligencia artificial es el futuro.",
+        ]
+        graph = PrereqGraph.from_records(RecordStore(docs))
+        assert graph.codes == ["BMA01", "BMA02"]
+        assert graph.prereqs["BMA02"] == ["BMA01"]
+        assert graph.names["BMA02"] == "Cálculo II"
+
+        # Alias de universidad como en los filtros del RAG
+        by_alias = PrereqGraph.from_records(RecordStore(docs), universidad="UNI")
+        assert by_alias.codes == ["BMA01", "BMA02"]
+        with pytest.raises(ValueError, match="UPC"):
+            PrereqGraph.from_records(RecordStore(docs), universidad="UPC")
@@ -1,5 +1,13 @@
+import numpy as np
 import pytest
-from src.tools.rag import RAGTool, tokenize, normalize_text
+from src.config import Config
+from src.tools.index_store import (
+    MappedStrings,
+    load_manifest,
+    load_snapshot,
+    save_snapshot,
+)
+from src.tools.rag import ERROR_SOURCE, RAGTool, tokenize, normalize_text
 
 
 class TestRAGTool:
@@ -45,6 +53,8 @@ class TestRAGTool:
         res = rag.run("¿Cuantos creditos tiene BFI01?", k=1, alpha=0.45)
         assert "(BFI01)" in res
         assert ("Créditos: 5" in res) or ("Creditos: 5" in res)
+        # "Cuantos" y "tiene" no son códigos: sale solo el registro exacto
+        assert rag.run("¿Cuantos creditos tiene BFI01?", k=3) == mock_knowledge_base[5]
 
     def test_modo_lista_por_ciclo_no_revienta(self, mock_knowledge_base):
         rag = RAGTool(preloaded_docs=mock_knowledge_base)
@@ -56,3 +66,179 @@ class TestRAGTool:
         res = rag.run("palabra_inexistente_xyz_123", k=3, alpha=0.45)
         assert isinstance(res, str)
         assert len(res) > 0
+
+    def test_cabecera_de_ciclo_se_mantiene_entre_paginas(self, mock_knowledge_base):
+        rag = RAGTool(preloaded_docs=mock_knowledge_base)
+        # Filas tal como llegan de varias páginas ya reensambladas en orden
+        rows = [
+            ["Primer ciclo", "", "", ""],
+            ["Código", "Nombre del curso", "Créditos", "Pre requisitos"],
+            ["BFI01", "Física I", "5", ""],
+            ["BMA01", "Cálculo Diferencial", "5", ""],
+            ["Segundo ciclo", "", "", ""],
+            ["BMA02", "Cálculo Integral", "5", "BMA01"],
+        ]
+        chunks = rag._rows_to_chunks(rows, "[UNI Universidad Nacional de Ingenieria]")
+        assert len(chunks) == 3
+        assert "(BMA01) | Ubicación: Primer ciclo | Tipo: Obligatorio" in chunks[1]
+        assert "Ubicación: Segundo ciclo" in chunks[2]
+        assert "Pre-requisito: BMA01" in chunks[2]
+
+    def test_top_k_hibrido_igual_a_ranking_completo(
+        self, mock_knowledge_base, monkeypatch
+    ):
+        # Con pocos candidatos por lado se fuerza la expansión de la unión
+        monkeypatch.setattr(Config, "HYBRID_CANDIDATES", 1)
+        rag = RAGTool(preloaded_docs=mock_knowledge_base)
+        n = len(mock_knowledge_base)
+        for query in ["requisito algoritmos san marcos", "nota minima uni"]:
+            q_vec = rag.embedding_cache.encode_query(query)
+            sparse_hits = rag.bm25.score_postings(tokenize(query))
+            s_scores = rag.bm25.get_scores(tokenize(query))
+            d_scores, d_idx = rag.index.search(q_vec, n)
+            dense = np.zeros(n, dtype="float32")
+            dense[d_idx[0]] = d_scores[0]
+            for alpha in (0.0, 0.45, 1.0):
+                full = alpha * rag._normalize_scores(dense) + (
+                    1 - alpha
+                ) * rag._normalize_scores(s_scores)
+                expected = np.lexsort((np.arange(n), -full))[:3]
+                got = rag._hybrid_top_k(q_vec, sparse_hits, 3, alpha)
+                assert np.allclose(full[got], full[expected], atol=1e-6)
+
+    def test_filtro_por_universidad(self, mock_knowledge_base):
+        rag = RAGTool(preloaded_docs=mock_knowledge_base)
+        res = rag.run(
+            "requisito algoritmos", k=1, alpha=0.0, filters={"universidad": "UCSP"}
+        )
+        assert res.startswith("[UCSP]")
+        res = rag.run("nota minima", k=5, alpha=0.45, filters={"universidad": "UNI"})
+        assert all(doc.startswith("[UNI]") for doc in res.split("\n\n"))
+
+    def test_filtros_sin_resultados_y_desconocidos(self, mock_knowledge_base):
+        rag = RAGTool(preloaded_docs=mock_knowledge_base)
+        res = rag.run("fisica", filters={"universidad": "UNI", "creditos_min": 6})
+        assert res == "No encontré documentos que cumplan los filtros."
+        # El atajo por código también respeta los filtros
+        res = rag.run("BFI01", filters={"ciclo": "Segundo ciclo"})
+        assert "(BFI01)" not in res
+        with pytest.raises(ValueError):
+            rag.run("fisica", filters={"facultad": "FIIS"})
+
+    def test_top_k_hibrido_filtrado_igual_a_ranking_en_alcance(
+        self, mock_knowledge_base, monkeypatch
+    ):
+        monkeypatch.setattr(Config, "HYBRID_CANDIDATES", 1)
+        rag = RAGTool(preloaded_docs=mock_knowledge_base * 3)
+        n = len(rag.documents)
+        scope = np.arange(1, n, 2)
+        mask = np.zeros(n, dtype=bool)
+        mask[scope] = True
+        query = "nota minima san marcos"
+        q_vec = rag.embedding_cache.encode_query(query)
+        dense = rag.embeddings[scope] @ q_vec[0]
+        sparse = rag.bm25.get_scores(tokenize(query))[scope]
+        hits = rag.bm25.score_postings(tokenize(query), mask)
+        for alpha in (0.0, 0.45, 1.0):
+            full = alpha * rag._normalize_scores(dense) + (
+                1 - alpha
+            ) * rag._normalize_scores(sparse)
+            expected = np.sort(full)[::-1][:4]
+            got = rag._hybrid_top_k(q_vec, hits, 4, alpha, scope, mask)
+            assert mask[got].all()
+            assert np.allclose(full[np.searchsorted(scope, got)], expected, atol=1e-6)
+
+    def test_run_batch_igual_a_run_en_loop(self, mock_knowledge_base, monkeypatch):
+        monkeypatch.setattr(Config, "HYBRID_CANDIDATES", 2)
+        rag = RAGTool(preloaded_docs=mock_knowledge_base)
+        queries = [
+            "requisito algoritmos san marcos",
+            "¿Cuantos creditos tiene BFI01?",
+            "nota minima aprobar",
+            "Que cursos hay en el primer ciclo",
+            "palabra_inexistente_xyz_123",
+            "nota minima aprobar",
+        ]
+        for filters in (None, {"universidad": "UCSP"}):
+            for alpha in (0.0, 0.45, 1.0):
+                expected = [
+                    rag.run(q, k=2, alpha=alpha, filters=filters) for q in queries
+                ]
+                got = rag.run_batch(queries, k=2, alpha=alpha, filters=filters)
+                assert got == expected
+
+    def test_presupuesto_de_tokens_corta_listados(self, mock_knowledge_base):
+        docs = mock_knowledge_base + [
+            f"[UNI] Curso: Curso {i} (CC{i:03d}) | Ubicación: Segundo ciclo | "
+            f"Tipo: Obligatorio | Créditos: 4 | Pre-requisito: Ninguno"
+            for i in range(20)
+        ]
+        rag = RAGTool(preloaded_docs=docs)
+        full = rag.run("Que cursos hay en el segundo ciclo")
+        assert len(full.split("\n")) == 20
+        cut = rag.run("Que cursos hay en el segundo ciclo", max_tokens=40)
+        # Cada registro tiene 17 palabras: caben 2 enteros
+        assert cut.split("\n") == full.split("\n")[:2]
+
+    def test_snapshot_mapeado_igual_a_indice_en_memoria(
+        self, mock_knowledge_base, tmp_path
+    ):
+        rag = RAGTool(preloaded_docs=mock_knowledge_base)
+        save_snapshot(
+            str(tmp_path),
+            Config.EMBEDDING_MODEL_ID,
+            {},
+            rag.documents,
+            rag.sources,
+            rag.embeddings,
+            rag.index,
+            rag.bm25,
+        )
+        # Lo que adopta cada worker del servidor pre-fork
+        shared = RAGTool(snapshot=load_snapshot(str(tmp_path)))
+        assert isinstance(shared.documents, MappedStrings)
+        for query in (
+            "requisito algoritmos san marcos",
+            "¿Cuantos creditos tiene BFI01?",
+            "Que cursos hay en el primer ciclo",
+        ):
+            for alpha in (0.0, 0.45):
+                assert shared.run(query, k=2, alpha=alpha) == rag.run(
+                    query, k=2, alpha=alpha
+                )
+
+    def test_eliminar_todos_los_pdfs_actualiza_el_snapshot(self, monkeypatch, tmp_path):
+        data_dir, index_dir = tmp_path / "data", tmp_path / "index"
+        data_dir.mkdir()
+        monkeypatch.setattr(Config, "DATA_PATH", str(data_dir))
+        monkeypatch.setattr(Config, "INDEX_DIR", str(index_dir))
+        monkeypatch.setattr(Config, "USE_EMBEDDING_CACHE", False)
+        # Sin parsear PDFs: un chunk por archivo
+        monkeypatch.setattr(
+            RAGTool,
+            "_load_files",
+            lambda self, names: ([f"[UNI] Curso de {n}" for n in names], list(names)),
+        )
+        update_index = RAGTool._update_index
+
+        (data_dir / "plan-a.pdf").write_bytes(b"%PDF-1.4 plan a")
+        assert RAGTool().sources == ["plan-a.pdf"]
+
+        # Sin PDFs: el snapshot se guarda igual, con files == {}
+        (data_dir / "plan-a.pdf").unlink()
+        assert RAGTool().sources == [ERROR_SOURCE]
+        assert load_manifest(str(index_dir))["files"] == {}
+
+        # El siguiente arranque lo carga sin recalcular el diff
+        def no_update(self, snapshot, file_hashes):
+            raise AssertionError("actualización incremental innecesaria")
+
+        monkeypatch.setattr(RAGTool, "_update_index", no_update)
+        assert list(RAGTool().sources) == [ERROR_SOURCE]
+
+        # Al volver a agregar un PDF el documento de error no se conserva
+        monkeypatch.setattr(RAGTool, "_update_index", update_index)
+        (data_dir / "plan-b.pdf").write_bytes(b"%PDF-1.4 plan b")
+        rag = RAGTool()
+        assert list(rag.documents) == ["[UNI] Curso de plan-b.pdf"]
+        assert list(rag.sources) == ["plan-b.pdf"]
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from src.tools.records import RecordStore, format_course_record, parse_course_record
+
+
+class TestRecordStore:
+    @pytest.fixture
+    def docs(self):
+        uni = "[UNI Universidad Nacional de Ingenieria]"
+        return [
+            format_course_record(
+                uni, "Física I", "BFI01", "Primer ciclo", "Obligatorio", "5", "Ninguno"
+            ),
+            format_course_record(
+                uni,
+                "Cálculo Integral",
+                "BMA02",
+                "Segundo ciclo",
+                "Obligatorio",
+                "5",
+                "BMA01",
+            ),
+            format_course_record(
+                uni,
+                "Visión (Computacional)",
+                "CC0V1",
+                "Electivos",
+                "Electivo de Especialidad",
+                "4",
+                "CC202",
+            ),
+            format_course_record(
+                "[UNMSM San Marcos]",
+                "Física I",
+                "FI101",
+                "Primer ciclo",
+                "Obligatorio",
+                "N/A",
+                "Ninguno",
+            ),
+            "[UCSP] En la Universidad San Pablo el curso de Algoritmos (CS101) es base.",
+        ]
+
+    def test_parse_es_inverso_de_format(self, docs):
+        rec = parse_course_record(docs[2])
+        assert rec["nombre"] == "Visión (Computacional)"
+        assert rec["codigo"] == "CC0V1"
+        assert format_course_record(**rec) == docs[2]
+        assert parse_course_record(docs[4]) is None
+
+    def test_indice_por_codigo_incluye_texto_libre(self, docs):
+        store = RecordStore(docs)
+        assert list(store.select(code="BMA02")) == [1]
+        assert list(store.select(code="CS101")) == [4]
+        assert store.select(code="XX999").size == 0
+
+    def test_filtros_combinados(self, docs):
+        store = RecordStore(docs)
+        assert list(store.select(ciclo="primer ciclo")) == [0, 3]
+        assert list(store.select(ciclo="Primer ciclo", tag="[UNMSM San Marcos]")) == [3]
+        assert list(store.select(tipo="Electivo de Especialidad")) == [2]
+        assert list(store.select(tag="[UCSP]")) == [4]
+        assert store.select().size == len(docs)
+
+    def test_columnas(self, docs):
+        store = RecordStore(docs)
+        assert store.record(1)["requisito"] == "BMA01"
+        assert store.creditos[0] == 5.0
+        assert np.isnan(store.creditos[3])
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+from src.agent.core import AgentEngine
+from src.agent.registry import ToolRegistry
+from src.config import Config
+from src.tools.calculator import CalculatorTool
+
+
+class EchoLLM:
+    def generate_response(self, query, context):
+        return f"Respuesta: {context}"
+
+
+class TestToolRegistry:
+    def test_carga_una_sola_vez_y_en_el_primer_uso(self):
+        calls = []
+        registry = ToolRegistry()
+        registry.register("calculator", lambda: calls.append(1) or CalculatorTool())
+
+        assert "calculator" in registry and calls == []
+        assert registry.status()["calculator"]["state"] == "pending"
+        assert registry["calculator"] is registry["calculator"]
+        assert calls == [1]
+        assert registry.status()["calculator"]["state"] == "ready"
+
+    def test_error_de_carga_se_propaga(self):
+        def broken():
+            raise OSError("modelo no encontrado")
+
+        registry = ToolRegistry()
+        registry.register("llm", broken)
+        registry.start()
+        with pytest.raises(RuntimeError, match="modelo no encontrado"):
+            registry.proxy("llm").generate_response("q", "c")
+        assert registry.wait()["llm"]["state"] == "error"
+
+    def test_calculadora_no_espera_al_rag(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+        release = threading.Event()
+
+        def slow_rag():
+            release.wait(5)
+            raise AssertionError("el RAG no debería construirse")
+
+        registry = ToolRegistry([CalculatorTool()])
+        registry.register("llm", EchoLLM)
+        registry.register("rag", slow_rag)
+        registry.start(["llm", "rag"])
+
+        agent = AgentEngine(registry.proxy("llm"), registry)
+        response, _latency = agent.run("calcular 20 + 5")
+        assert response == "Respuesta: El resultado es: 25"
+        assert registry.status()["rag"]["state"] == "loading"
+        release.set()
@@ -0,0 +1,120 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from src.agent.cache import ResponseCache
+from src.agent.core import AgentEngine
+from src.config import Config
+from src.tools.calculator import CalculatorTool
+from src.tools.verification import VerificationTool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fake_embed(query):
+    # Dos "temas": créditos y ciclo; el resto es ortogonal
+    q = query.lower()
+    vec = np.array(
+        [
+            "credito" in q or "créditos" in q,
+            "ciclo" in q,
+            len(q) % 7 == 0 and "ciclo" not in q and "credito" not in q,
+        ],
+        dtype="float32",
+    )
+    return vec + 1e-3
+
+
+class TestResponseCache:
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def cache(self, clock):
+        return ResponseCache(capacity=3, ttl=60, embed=fake_embed, clock=clock)
+
+    def test_hit_exacto_con_query_normalizada(self, cache):
+        cache.store("¿Cuántos créditos tiene Física I?", "rag", "5", [], 2.0)
+        hit = cache.lookup("cuantos creditos tiene fisica i", "rag")
+        assert hit.kind == "exact"
+        assert hit.entry.response == "5"
+
+    def test_operadores_distinguen_la_llave(self, cache):
+        cache.store("calcular 20 + 5", "calculator", "25", [], 1.0)
+        assert cache.lookup("calcular 20 - 5", "calculator") is None
+        assert cache.lookup("calcular 2.0 + 5", "calculator") is None
+        assert cache.lookup("Calcular 20 + 5?", "calculator").entry.response == "25"
+
+    def test_hit_semantico_solo_rag_mismo_contexto_y_literales(self, cache):
+        ctx = "Curso: Física I (BFI01) | Créditos: 5"
+        cache.store("créditos de Física I", "rag", "5 créditos", [], 2.0, ctx)
+        query = "cuantos creditos tiene fisica I?"
+        assert cache.lookup(query, "rag") is None  # el tier exacto no basta
+        hit = cache.lookup_semantic(query, "rag", ctx)
+        assert hit is not None and hit.kind == "semantic"
+        assert hit.similarity >= cache.threshold
+        # Otro contexto recuperado, otra herramienta u otros números: nunca
+        assert cache.lookup_semantic(query, "rag", "Curso: Física II") is None
+        assert cache.lookup_semantic(query, "calculator", ctx) is None
+        cache.store("creditos de BMA02", "rag", "4", [], 2.0, ctx)
+        assert cache.lookup_semantic("cuantos creditos tiene BMA03", "rag", ctx) is None
+        assert cache.lookup_semantic("en qué ciclo está física", "rag", ctx) is None
+
+    def test_ttl_lru_y_version(self, cache, clock):
+        cache.check_version("v1")
+        for i in range(4):
+            cache.store(f"pregunta {i}", "rag", str(i), [], 1.0)
+        assert len(cache) == 3
+        assert cache.lookup("pregunta 0", "calculator") is None  # LRU
+
+        clock.now = 61
+        assert cache.lookup("pregunta 3", "calculator") is None  # TTL
+        cache.store("pregunta 3", "rag", "3", [], 1.0)
+
+        cache.check_version("v2")
+        assert len(cache) == 0
+        assert cache.stats()["invalidations"] == 1
+
+    def test_agente_registra_hit_y_latencia_ahorrada(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+
+        class SlowLLM:
+            def generate_response(self, query, context):
+                return f"Respuesta: {context}"
+
+        agent = AgentEngine(SlowLLM(), [CalculatorTool()])
+        first, _ = agent.run("calcular 20 + 5")
+        second, _ = agent.run("Calcular 20 + 5!")
+        assert first == second
+
+        agent.logger.flush()
+        with open(os.path.join(tmp_path, "execution.jsonl"), encoding="utf-8") as f:
+            entry = json.loads(f.readlines()[-1])
+        assert entry["cache"]["hit"] == "exact"
+        assert entry["cache"]["hit_rate"] == 0.5
+        assert entry["steps_trace"][0]["tool"] == "calculator"
+        assert agent.cache.stats()["exact_hits"] == 1
+
+    def test_verificacion_no_se_cachea(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+
+        class EchoLLM:
+            def generate_response(self, query, context):
+                return context
+
+        tool = VerificationTool(student_history={"CS101", "CS102"})
+        agent = AgentEngine(EchoLLM(), [tool])
+        assert agent.run("¿Puedo llevar CS202?")[0].startswith("REJECTED")
+        # Cambia el historial, no la pregunta: la respuesta no puede ser la vieja
+        tool.student_history.add("MA101")
+        assert agent.run("¿Puedo llevar CS202?")[0].startswith("APPROVED")
+        assert len(agent.cache) == 0
+        assert agent.cache.lookup("¿Puedo llevar CS202?", "verification") is None
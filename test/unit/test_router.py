@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from src.agent.router import IntentClassifier, Router, parse_query
+from src.tools.calculator import CalculatorTool
+from src.tools.verification import VerificationTool
+
+
+class TestParseQuery:
+    @pytest.mark.parametrize(
+        "query, route",
+        [
+            ("¿Puedo llevar cs202?", "verification"),
+            ("calcular 20 + 5 para AI301", "verification"),
+            ("Calcular 3*3", "calculator"),
+            ("20 / 2", "calculator"),
+            ("¿Cuántos créditos tiene Física I?", "rag"),
+            ("créditos de BMA02", "rag"),
+        ],
+    )
+    def test_reglas(self, query, route):
+        assert parse_query(query).route == route
+
+    @pytest.mark.parametrize(
+        "query, plan",
+        [
+            ("¿Puedo llevar CS202 y cuántos créditos tiene?", ("verification", "rag")),
+            ("¿Cumplo los prerrequisitos de AI301?", ("verification",)),
+            ("calcular 20 + 5 para AI301", ("verification", "calculator")),
+            ("algoritmos", ("rag",)),
+        ],
+    )
+    def test_plan_con_varias_herramientas(self, query, plan):
+        intent = parse_query(query)
+        assert intent.plan == plan
+        assert intent.route == plan[0]
+
+    def test_campos_del_intent(self):
+        intent = parse_query("Lista los electivos de especialidad del sexto ciclo UNI")
+        assert intent.cycle == "Sexto ciclo"
+        assert intent.wants_list
+        assert intent.elective_type == "Electivo de Especialidad"
+        assert intent.universidad == "UNI"
+        assert intent.filters() == {
+            "universidad": "UNI",
+            "ciclo": "Sexto ciclo",
+            "tipo": "Electivo de Especialidad",
+        }
+
+        calc = parse_query("calcular (20 + 5) * 2 por favor")
+        assert calc.expression == "(20 + 5) * 2"
+        assert parse_query("créditos de BMA02").code_candidates == ("BMA02",)
+        # Las palabras sin dígitos no son candidatos ("PUEDO", "TIENE")
+        assert parse_query("¿Puedo llevar BMA02?").code_candidates == ("BMA02",)
+        assert parse_query(
+            "¿Cuántos créditos tiene cc0a1 o BMA02?"
+        ).code_candidates == (
+            "CC0A1",
+            "BMA02",
+        )
+
+    @pytest.mark.parametrize(
+        "query", ["calcular 20 / 2", "1.2.3", "calcular", "¿Puedo llevar CS202?"]
+    )
+    def test_herramientas_con_intent_igual_que_sin_intent(self, query):
+        intent = parse_query(query)
+        for tool in (CalculatorTool(), VerificationTool()):
+            assert tool.run(query, intent=intent) == tool.run(query)
+
+
+def fake_embed(text):
+    t = text.lower()
+    return np.array(
+        ["suma" in t or "multiplica" in t, "matricular" in t, "creditos" in t],
+        dtype="float32",
+    )
+
+
+class TestRouter:
+    @pytest.fixture
+    def router(self):
+        examples = {
+            "calculator": ["suma 2 y 2", "multiplica 3 por 3"],
+            "verification": ["puedo matricularme"],
+            "rag": ["creditos de fisica"],
+        }
+        return Router(IntentClassifier(fake_embed, examples, threshold=0.5))
+
+    def test_clasificador_decide_lo_que_las_reglas_no_toman(self, router):
+        # "(3)*(3)" no calza con la regla aritmética ("3 *"), pero es una cuenta
+        intent = router.route("multiplica (3)*(3)")
+        assert (intent.route, intent.source) == ("calculator", "classifier")
+        assert CalculatorTool().run(intent.query, intent=intent) == "9"
+        # Las reglas tienen prioridad: no se consulta al clasificador
+        assert router.route("calcular 3 * 3").source == "rules"
+
+    def test_clasificador_no_elige_ruta_sin_su_campo(self, router):
+        # "matricular" apunta a verificación, pero no hay código de curso, y
+        # "multiplica 3 por 3" no tiene ninguna operación que calcular
+        assert router.route("quiero matricularme").route == "rag"
+        assert router.route("multiplica 3 por 3").route == "rag"
+        stats = router.stats()
+        assert stats["queries"] == 2 and stats["classified"] == 0
+        assert stats["routes"] == {"rag": 2}
@@ -0,0 +1,131 @@
+import asyncio
+import http.client
+import json
+import threading
+
+import pytest
+from src.agent.core import AgentEngine
+from src.agent.registry import ToolRegistry
+from src.config import Config
+from src.server import AgentServer
+from src.tools.calculator import CalculatorTool
+from src.tools.verification import VerificationTool
+
+
+class BlockingLLM:
+    """Responde con el contexto; se bloquea mientras `gate` esté cerrado."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def generate_response(self, query, context):
+        self.gate.wait(5)
+        return f"Respuesta: {context}"
+
+
+class ServerThread:
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.started = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(self.app.start("127.0.0.1", 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started.set()
+        self.loop.run_forever()
+
+    def __enter__(self):
+        self.thread.start()
+        self.started.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+        self.app.close()
+
+    async def _shutdown(self):
+        self.server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def request(self, method, path, payload=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        body = None if payload is None else json.dumps(payload)
+        conn.request(method, path, body=body)
+        resp = conn.getresponse()
+        data = json.loads(resp.read())
+        conn.close()
+        return resp.status, data
+
+
+class TestAgentServer:
+    @pytest.fixture
+    def llm(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+        monkeypatch.setattr(Config, "RESPONSE_CACHE", False)
+        return BlockingLLM()
+
+    def test_query_health_y_errores(self, llm):
+        agent = AgentEngine(llm, [CalculatorTool()])
+        with ServerThread(AgentServer(agent, workers=2)) as srv:
+            status, data = srv.request("POST", "/query", {"query": "calcular 20 + 5"})
+            assert status == 200
+            assert data["response"] == "Respuesta: El resultado es: 25"
+
+            assert srv.request("POST", "/query", {"pregunta": "x"})[0] == 400
+            assert srv.request("GET", "/query")[0] == 405
+            assert srv.request("GET", "/nada")[0] == 404
+            status, health = srv.request("GET", "/health")
+            assert status == 200 and health["completed"] == 1
+
+    def test_query_con_student_id(self, llm):
+        class Store:
+            def history(self, student_id):
+                return {"a002": {"CS101", "CS102", "MA101"}}.get(student_id, set())
+
+        agent = AgentEngine(llm, [VerificationTool(store=Store())])
+        with ServerThread(AgentServer(agent, workers=1)) as srv:
+            query = {"query": "¿Puedo llevar CS202?"}
+            _, data = srv.request("POST", "/query", {**query, "student_id": "a002"})
+            assert data["response"].startswith("Respuesta: APPROVED")
+            _, data = srv.request("POST", "/query", {**query, "student_id": "a003"})
+            assert data["response"].startswith("Respuesta: REJECTED")
+            status, _ = srv.request("POST", "/query", {**query, "student_id": 7})
+            assert status == 400
+
+    def test_ready_espera_al_warmup(self, llm):
+        release = threading.Event()
+        registry = ToolRegistry([CalculatorTool()])
+        registry.register("llm", lambda: release.wait(5) and llm)
+        registry.start(["llm"])
+        agent = AgentEngine(registry.proxy("llm"), registry)
+
+        with ServerThread(AgentServer(agent, registry, warmup=["llm"])) as srv:
+            status, data = srv.request("GET", "/ready")
+            assert status == 503
+            assert data["components"]["llm"]["state"] == "loading"
+            release.set()
+            registry.wait(["llm"], timeout=5)
+            assert srv.request("GET", "/ready")[0] == 200
+
+    def test_cola_llena_y_timeout(self, llm):
+        llm.gate.clear()
+        agent = AgentEngine(llm, [CalculatorTool()])
+        app = AgentServer(agent, workers=1, max_queue=0, timeout_s=0.3)
+        with ServerThread(app) as srv:
+            # La primera consulta ocupa el único worker hasta vencer su timeout
+            status, _ = srv.request("POST", "/query", {"query": "calcular 1 + 1"})
+            assert status == 504
+            status, _ = srv.request("POST", "/query", {"query": "calcular 2 + 2"})
+            assert status == 503
+            llm.gate.set()
+        assert app.metrics["timeouts"] == 1 and app.metrics["rejected"] == 1
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+from src.agent.core import AgentEngine
+from src.config import Config
+from src.tools.student_store import StudentStore
+from src.tools.verification import VerificationTool
+
+
+class TestStudentStore:
+    @pytest.fixture
+    def store(self, tmp_path):
+        store = StudentStore(str(tmp_path / "students.sqlite3"), cache_size=2)
+        store.add_many(
+            [
+                ("a001", ["CS101", "MA101"]),
+                ("a002", ["CS101", "CS102", "MA101"]),
+                ("a003", []),
+            ]
+        )
+        yield store
+        store.close()
+
+    def test_historial_y_lru(self, store):
+        assert store.history("a001") == {"CS101", "MA101"}
+        assert store.history("a001") == {"CS101", "MA101"}
+        assert store.history("nadie") == frozenset()
+        stats = store.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 2)
+
+        # cache_size=2: "a001" es el más antiguo y sale del LRU
+        store.histories(["a002", "a003"])
+        assert store.stats()["cached"] == 2
+        store.history("a001")
+        assert store.stats()["misses"] == 5
+
+    def test_escribir_invalida_el_lru(self, store):
+        assert "CS102" not in store.history("a001")
+        store.add("a001", ["CS102"])
+        assert "CS102" in store.history("a001")
+
+    def test_cohortes_incluyen_alumnos_sin_cursos(self, store):
+        batches = list(store.cohorts(batch_size=2))
+        assert [ids for ids, _ in batches] == [["a001", "a002"], ["a003"]]
+        assert batches[1][1] == [set()]
+        # Las cohortes no pasan por el LRU
+        assert store.stats()["cached"] == 0
+
+    def test_pool_con_varios_hilos(self, store):
+        results = []
+
+        def worker(sid):
+            for _ in range(20):
+                results.append(store.histories([sid, "a003"])[0])
+
+        threads = [threading.Thread(target=worker, args=(s,)) for s in ("a001", "a002")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(results) == 40
+        assert store.stats()["connections"] <= store.pool_size
+
+    def test_verificacion_por_alumno(self, store):
+        tool = VerificationTool(store=store)
+        assert tool.run("¿Puedo llevar CS202?", student_id="a002").startswith(
+            "APPROVED"
+        )
+        assert tool.run("¿Puedo llevar CS202?", student_id="a003") == (
+            "REJECTED: No puedes llevar CS202. Missing prerequisites: CS102, MA101"
+        )
+        # Sin student_id se usa el historial por defecto
+        assert tool.run("¿Puedo llevar CS202?").startswith("REJECTED")
+
+        assert tool.eligible_students("CS102", batch_size=2) == ["a001"]
+        assert tool.eligible_students("CS101") == ["a003"]
+
+    def test_agente_pasa_el_alumno(self, store, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+
+        class EchoLLM:
+            def generate_response(self, query, context):
+                return context
+
+        agent = AgentEngine(EchoLLM(), [VerificationTool(store=store)])
+        query = "¿Puedo llevar CS202?"
+        assert agent.run(query, student_id="a002")[0].startswith("APPROVED")
+        assert agent.run(query, student_id="a003")[0].startswith("REJECTED")
+        assert "".join(agent.run_stream(query, student_id="a002")).startswith(
+            "APPROVED"
+        )
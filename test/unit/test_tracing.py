@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+from src.agent.core import AgentEngine
+from src.config import Config
+from src.llm.batcher import GenerationBatcher
+from src.tools.calculator import CalculatorTool
+from src.tools.rag import RAGTool
+from src.utils import tracing
+
+
+def names(node):
+    return [c["name"] for c in node.get("children", [])]
+
+
+class TestSpans:
+    def test_spans_anidados(self):
+        trace = tracing.Trace("raiz")
+        with tracing.activate(trace):
+            with tracing.span("a", n=3):
+                with tracing.span("a.1"):
+                    pass
+            with tracing.span("b"):
+                pass
+        out = trace.finish().to_dict()
+
+        assert names(out) == ["a", "b"]
+        assert out["children"][0]["n"] == 3
+        assert names(out["children"][0]) == ["a.1"]
+        assert out["start_ms"] == 0.0 and "ts" in out and "thread" in out
+        a, b = out["children"]
+        assert a["start_ms"] + a["duration_ms"] <= b["start_ms"] + 1e-3
+
+    def test_sin_traza_no_registra(self):
+        with tracing.span("suelto") as s:
+            assert s is None
+        assert tracing.current_span() is None
+
+    def test_batcher_agrega_espera_y_lote_al_caller(self):
+        def generate_batch(prompts):
+            with tracing.span("llm.generate"):
+                return [p.upper() for p in prompts]
+
+        batcher = GenerationBatcher(generate_batch, max_wait_ms=1)
+        trace = tracing.Trace("raiz")
+        with tracing.activate(trace):
+            assert batcher.generate("hola") == "HOLA"
+        batcher.close()
+
+        out = trace.to_dict()
+        assert names(out) == ["llm.queue_wait", "llm.batch"]
+        assert names(out["children"][1]) == ["llm.generate"]
+
+    def test_export_chrome_trace(self, tmp_path):
+        trace = tracing.Trace("raiz")
+        with tracing.activate(trace):
+            with tracing.span("hijo"):
+                pass
+        log = tmp_path / "execution.jsonl"
+        entry = {"steps_trace": [{"tool": "x"}, {"trace": trace.to_dict()}]}
+        log.write_text(json.dumps(entry) + "\n", encoding="utf-8")
+
+        out = tmp_path / "trace.json"
+        assert tracing.write_chrome_trace(tracing.traces_from_log(log), out) == 2
+        events = json.loads(out.read_text())["traceEvents"]
+        assert [e["name"] for e in events] == ["raiz", "hijo"]
+        assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+
+
+class TestAgentTrace:
+    @pytest.fixture
+    def log_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "LOG_DIR", str(tmp_path))
+        return tmp_path
+
+    def last_entry(self, agent, log_dir):
+        agent.logger.flush()
+        with open(os.path.join(log_dir, "execution.jsonl"), encoding="utf-8") as f:
+            return json.loads(f.readlines()[-1])
+
+    def test_traza_en_steps_trace(self, log_dir):
+        class EchoLLM:
+            def generate_response(self, query, context):
+                return f"Respuesta: {context}"
+
+        agent = AgentEngine(EchoLLM(), [CalculatorTool()])
+        agent.run("calcular 20 + 5")
+        steps = self.last_entry(agent, log_dir)["steps_trace"]
+
+        # La herramienta sigue siendo el primer paso (evaluate_agent.py)
+        assert steps[0]["tool"] == "calculator"
+        trace = steps[-1]["trace"]
+        assert trace["name"] == "agent.run"
+        assert names(trace) == [
+            "router",
+            "cache.lookup",
+            "tool.calculator",
+            "cache.semantic",
+            "llm",
+            "cache.store",
+        ]
+
+    def test_etapas_del_rag(self, log_dir):
+        docs = [
+            "[UNI] La nota minima para aprobar en la UNI es 10.",
+            "[UCSP] La nota minima para aprobar en San Pablo es 12.",
+            "[GENERAL] La inteligencia artificial es el futuro.",
+        ]
+        rag = RAGTool(preloaded_docs=docs)
+        trace = tracing.Trace("raiz")
+        with tracing.activate(trace):
+            rag.run("nota minima uni", k=2)
+        out = trace.to_dict()
+
+        assert names(out) == [
+            "rag.shortcut",
+            "rag.encode",
+            "rag.bm25",
+            "rag.fusion",
+            "rag.format",
+        ]
+        assert "rag.faiss" in names(out["children"][3])
@@ -1,4 +1,5 @@
 import pytest
+from src.tools.prereq_graph import PrereqGraph
 from src.tools.verification import VerificationTool
 
 
@@ -33,3 +34,35 @@ class TestVerificationTool:
         res = tool.run("Puedo llevar CS101 de nuevo?")
         assert "status" in res.lower()
         assert ("ya aprobaste" in res.lower()) or ("already passed" in res.lower())
+
+    def test_consultas_del_grafo(self, tool):
+        # Historial por defecto: CS101 y MA101
+        assert tool.eligible_courses() == [["CS102"]]
+        assert tool.missing_chain("AI301") == [["CS102", "CS202"]]
+        assert tool.path_to("AI301", [set()]) == [
+            [["CS101", "MA101"], ["CS102"], ["CS202"], ["AI301"]]
+        ]
+
+    def test_codigos_del_plan_de_estudios(self):
+        graph = PrereqGraph(
+            {"BMA01": [], "BMA02": ["BMA01"]}, names={"BMA02": "Cálculo II"}
+        )
+        tool = VerificationTool(graph=graph, student_history={"BMA01"})
+        assert tool.run("¿Puedo llevar BMA02?") == (
+            "APPROVED: Puedes matricularte en BMA02 (Cálculo II)."
+        )
+
+    def test_verificacion_y_consulta_en_bloque_coinciden(self):
+        # Aprobó CS202: se asume que también aprobó CS102, CS101 y MA101
+        tool = VerificationTool(student_history={"CS202"})
+        assert tool.run("¿Puedo llevar AI301?").startswith("APPROVED")
+        assert tool.run("¿Puedo llevar MA101?") == "Status: Ya aprobaste MA101."
+
+        eligible = set(tool.eligible_courses()[0])
+        for code in tool.course_catalog:
+            approved = tool.run(f"¿Puedo llevar {code}?").startswith("APPROVED")
+            assert approved == (code in eligible)
+
+    def test_alumnos_habilitados_sin_store(self, tool):
+        with pytest.raises(ValueError, match="StudentStore"):
+            tool.eligible_students("CS102")